@@ -1,92 +1,62 @@
 import sys
 import os
+import time
+import argparse
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                              QHBoxLayout, QLabel, QComboBox, QLineEdit,
-                             QPushButton, QTextEdit, QGroupBox, QSpinBox, QCheckBox)
-from PySide6.QtCore import QSize, QThread, Signal, QObject, Qt, QSettings
+                             QPushButton, QTextEdit, QGroupBox, QSpinBox, QCheckBox, QListWidget, QListWidgetItem)
+from PySide6.QtCore import QSize, QThread, Signal, QObject, Qt, QSettings, QTimer
 import webbrowser
-import http.server
-import socketserver
-import functools
 
 # 添加项目根目录到系统路径
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(current_dir)
 sys.path.append(project_root)
 
-from logic.zsxq_crawler import run_crawler
-from logic.process_with_ai import run_ai_processing
-from logic.build_html import run_html_generation
+# 抓取、AI处理和网页生成在作业子进程中运行（见 logic/job_runner.py），界面进程不导入这些模块；
+# 预览服务器模块在首次启动预览时才导入。它们依赖 requests、bs4、openai、Jinja2 等较重的库，放在这里会让窗口晚一秒以上才出现
+from logic import job_runner
 
-# --- 抓取工作线程 ---
-class CrawlerWorker(QObject):
-    finished = Signal()
-    log_message = Signal(str)
-
-    def __init__(self, crawl_mode, search_keyword, post_id, debug_num, group_id, token):
-        super().__init__()
-        self.crawl_mode = crawl_mode
-        self.search_keyword = search_keyword
-        self.post_id = post_id
-        self.debug_num = debug_num
-        self.group_id = group_id
-        self.token = token
-
-    def run(self):
-        """执行爬虫任务"""
-        try:
-            run_crawler(
-                crawl_mode=self.crawl_mode,
-                search_keyword=self.search_keyword,
-                post_id=self.post_id,
-                debug_num=self.debug_num,
-                group_id=self.group_id,
-                token=self.token,
-                log_callback=self.log_message.emit
-            )
-        except Exception as e:
-            self.log_message.emit(f"发生未捕获的异常: {e}")
-        finally:
-            self.finished.emit()
+# --- 启动性能 ---
+STARTUP_TARGET_SEC = 1.0            # 从启动进程到窗口首次显示的目标耗时（秒），见 --startup-benchmark
+STARTUP_T0_ENV = 'ZSXQ_STARTUP_T0'  # 基准测试时父进程记录的启动时间戳
 
+# --- 作业 ---
+JOB_POLL_INTERVAL_MS = 100          # 读取作业子进程日志和进度的间隔（毫秒）
+STAGE_NAMES = {'crawl': '抓取', 'ai': 'AI处理', 'build': '生成网页', 'archive': '导出检索库'}
+JOB_STATE_NAMES = {job_runner.RUNNING: '运行中', job_runner.PAUSED: '已暂停', job_runner.SUCCEEDED: '已完成',
+                   job_runner.FAILED: '失败', job_runner.CANCELLED: '已取消'}
 
-# --- AI处理工作线程 ---
-class AiWorker(QObject):
-    finished = Signal()
-    log_message = Signal(str)
+# --- 数据源扫描工作线程：扫描 output 目录，不阻塞界面 ---
+class FolderScanWorker(QObject):
+    finished = Signal(dict, str)  # ({数据集目录名: (可生成网页, 可预览)}, 错误信息)
 
-    def __init__(self, source_folder_name: str, base_url: str, api_key: str, concurrency: int):
+    def __init__(self, output_path: str):
         super().__init__()
-        self.source_folder_name = source_folder_name
-        self.base_url = base_url
-        self.api_key = api_key
-        self.concurrency = concurrency
+        self.output_path = output_path
 
     def run(self):
+        folders = {}
+        error = ""
         try:
-            run_ai_processing(self.source_folder_name, self.base_url, self.api_key, self.concurrency, self.log_message.emit)
+            os.makedirs(self.output_path, exist_ok=True)
+            with os.scandir(self.output_path) as entries:
+                raw_folders = sorted(entry.name for entry in entries if entry.name.startswith('raw_md') and entry.is_dir())
+            for name in raw_folders:
+                folders[name] = (self.has_files(os.path.join(self.output_path, name.replace('raw_', 'processed_'))),
+                                 os.path.exists(os.path.join(self.output_path, name.replace('raw_', 'web_'), 'index.html')))
         except Exception as e:
-            self.log_message.emit(f"发生未捕获的异常: {e}")
-        finally:
-            self.finished.emit()
-
-
-# --- HTML 生成工作线程 ---
-class HtmlWorker(QObject):
-    finished = Signal()
-    log_message = Signal(str)
-
-    def __init__(self, source_folder_name: str):
-        super().__init__()
-        self.source_folder_name = source_folder_name
+            error = str(e)
+        self.finished.emit(folders, error)
 
-    def run(self):
+    @staticmethod
+    def has_files(path: str) -> bool:
+        """目录存在且不为空（读到第一项即返回，不列出整个目录）"""
         try:
-            run_html_generation(self.source_folder_name, self.log_message.emit)
-        except Exception as e:
-            self.log_message.emit(f"发生未捕t捕的异常: {e}")
-        finally:
-            self.finished.emit()
+            with os.scandir(path) as entries:
+                return any(True for _ in entries)
+        except OSError:
+            return False
 
 
 # --- 新增：HTTP服务器工作线程 ---
@@ -102,12 +72,16 @@ class ServerWorker(QObject):
         self.httpd = None
 
     def run(self):
-        # --- 核心修复：使用 functools.partial 来为 Handler 预设 directory 参数 ---
-        Handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=self.directory)
-
+        # 多线程服务器：支持预压缩、条件请求和 Range 请求，局域网内可多人同时访问
         try:
-            self.httpd = socketserver.TCPServer(("", self.port), Handler)
+            from logic.preview_server import SEARCH_API_PATH, create_preview_server, find_search_db, lan_addresses
+            search_db = find_search_db(self.directory)
+            self.httpd = create_preview_server(self.directory, self.port, log_callback=self.log_message.emit, search_db=search_db)
             self.log_message.emit(f"本地预览服务器已在 http://localhost:{self.port} 启动")
+            for url in lan_addresses(self.port):
+                self.log_message.emit(f"局域网访问地址: {url}")
+            if search_db:
+                self.log_message.emit(f"检索接口: http://localhost:{self.port}{SEARCH_API_PATH}?q=关键词")
             self.log_message.emit(f"服务目录: {self.directory}")
             self.server_started.emit(f"http://localhost:{self.port}")
             self.httpd.serve_forever()
@@ -134,7 +108,13 @@ class MainWindow(QMainWindow):
         # --- 初始化线程变量 ---
         self.server_thread = None
         self.server_worker = None
-        self.worker_thread = None # 用于抓取、AI、HTML的通用线程
+
+        # --- 作业：抓取、AI处理、网页生成各在独立的子进程中运行，可同时处理不同的数据集 ---
+        self.job_runner = job_runner.JobRunner()
+        self.job_rows = {} # 作业ID -> 在任务列表中的行号（条目归列表所有，不在Python中另存引用）
+        self.job_timer = QTimer(self)
+        self.job_timer.setInterval(JOB_POLL_INTERVAL_MS)
+        self.job_timer.timeout.connect(self.poll_jobs)
 
         # --- 中心部件 ---
         central_widget = QWidget()
@@ -153,7 +133,7 @@ class MainWindow(QMainWindow):
         # 抓取模式
         mode_label = QLabel("抓取模式:")
         self.mode_combo = QComboBox()
-        self.mode_combo.addItems(["全部帖子", "仅精华", "关键词搜索", "单个帖子"])
+        self.mode_combo.addItems(["全部帖子", "全部帖子(分片并行)", "刷新互动数据", "仅精华", "关键词搜索", "单个帖子"])
         self.mode_combo.currentTextChanged.connect(self.on_mode_changed)
         row1_layout.addWidget(mode_label)
         row1_layout.addWidget(self.mode_combo)
@@ -180,7 +160,7 @@ class MainWindow(QMainWindow):
         keyword_layout.setContentsMargins(0, 5, 0, 5) # 调整边距
         keyword_label = QLabel("搜索关键词:")
         self.keyword_input = QLineEdit()
-        self.keyword_input.setPlaceholderText("请输入搜索关键词")
+        self.keyword_input.setPlaceholderText("请输入搜索关键词，多个关键词用逗号分隔")
         keyword_layout.addWidget(keyword_label)
         keyword_layout.addWidget(self.keyword_input)
         settings_layout.addWidget(self.keyword_layout_widget)
@@ -271,15 +251,47 @@ class MainWindow(QMainWindow):
         self.preview_button = QPushButton("在浏览器中预览")
         self.preview_button.clicked.connect(self.on_preview_clicked)
 
+        self.export_archive_button = QPushButton("导出检索库")
+        self.export_archive_button.setToolTip("把已处理的帖子增量导出到 SQLite 全文检索库，供命令行查询和预览服务器的检索接口使用")
+        self.export_archive_button.clicked.connect(self.on_export_archive_clicked)
+
         buttons_layout.addWidget(self.process_ai_button)
         buttons_layout.addWidget(self.build_html_button)
+        buttons_layout.addWidget(self.export_archive_button)
         buttons_layout.addWidget(self.preview_button)
         buttons_layout.addStretch()
+
+        # 性能分析：对抓取、AI处理和网页生成均有效，报告写入 output/profiles
+        self.profile_checkbox = QCheckBox("性能分析")
+        self.profile_checkbox.setToolTip("记录各阶段耗时、函数调用统计和内存峰值，任务结束后写出报告到 output/profiles")
+        buttons_layout.addWidget(self.profile_checkbox)
         
         processing_layout.addLayout(buttons_layout)
         
         main_layout.addWidget(processing_group)
 
+        # --- 任务组：正在运行和已结束的作业 ---
+        jobs_group = QGroupBox("任务")
+        jobs_layout = QHBoxLayout(jobs_group)
+        self.job_list = QListWidget()
+        self.job_list.setMaximumHeight(100)
+        self.job_list.currentItemChanged.connect(self.update_job_buttons)
+        jobs_buttons_layout = QVBoxLayout()
+        self.pause_job_button = QPushButton("暂停")
+        self.pause_job_button.clicked.connect(self.on_pause_job_clicked)
+        self.resume_job_button = QPushButton("继续")
+        self.resume_job_button.clicked.connect(self.on_resume_job_clicked)
+        self.cancel_job_button = QPushButton("取消")
+        self.cancel_job_button.clicked.connect(self.on_cancel_job_clicked)
+        jobs_buttons_layout.addWidget(self.pause_job_button)
+        jobs_buttons_layout.addWidget(self.resume_job_button)
+        jobs_buttons_layout.addWidget(self.cancel_job_button)
+        jobs_buttons_layout.addStretch()
+        jobs_layout.addWidget(self.job_list, 1)
+        jobs_layout.addLayout(jobs_buttons_layout)
+        main_layout.addWidget(jobs_group)
+        self.update_job_buttons()
+
         # --- 运行日志组 ---
         log_group = QGroupBox("运行日志")
         log_layout = QVBoxLayout()
@@ -289,10 +301,9 @@ class MainWindow(QMainWindow):
         log_group.setLayout(log_layout)
         main_layout.addWidget(log_group, stretch=1) # 让日志区域占据更多空间
 
-        self.ai_thread = None
-        self.ai_worker = None
-        self.html_thread = None
-        self.html_worker = None
+        self.scan_thread = None
+        self.scan_worker = None
+        self.folder_states = {} # 数据集目录名 -> (可生成网页, 可预览)，由后台扫描得到
         
         # 加载设置
         self.load_settings()
@@ -313,7 +324,7 @@ class MainWindow(QMainWindow):
     def on_start_clicked(self):
         # 从GUI获取参数
         crawl_mode_text = self.mode_combo.currentText()
-        mode_map = {"全部帖子": "all", "仅精华": "digests", "关键词搜索": "search", "单个帖子": "single_post"}
+        mode_map = {"全部帖子": "all", "全部帖子(分片并行)": "sharded", "刷新互动数据": "refresh", "仅精华": "digests", "关键词搜索": "search", "单个帖子": "single_post"}
         crawl_mode = mode_map.get(crawl_mode_text)
         
         search_keyword = self.keyword_input.text() if crawl_mode == "search" else ""
@@ -335,51 +346,122 @@ class MainWindow(QMainWindow):
             self.append_log("错误：请输入帖子ID！")
             return
             
-        self.set_controls_enabled(False)
-        self.append_log("="*20 + " 任务开始 " + "="*20)
-
-        self.thread = QThread(self)
-        self.crawler_worker = CrawlerWorker(crawl_mode, search_keyword, post_id, debug_num, group_id, token)
-        self.crawler_worker.moveToThread(self.thread)
-
-        self.thread.started.connect(self.crawler_worker.run)
-        self.crawler_worker.finished.connect(self.thread.quit)
-        self.crawler_worker.finished.connect(self.crawler_worker.deleteLater)
-        self.thread.finished.connect(self.thread.deleteLater)
-        self.crawler_worker.log_message.connect(self.append_log)
-        self.crawler_worker.finished.connect(self.on_task_finished)
-        
-        self.thread.start()
-
-    def on_task_finished(self):
-        self.append_log("="*20 + " 抓取任务结束 " + "="*20)
-        self.set_controls_enabled(True)
-        self.thread = None 
-        self.crawler_worker = None
-        # 抓取结束后，重新扫描文件夹并更新按钮状态
+        self.submit_job('crawl', crawl_mode_text, crawl_mode=crawl_mode, search_keyword=search_keyword, post_id=post_id,
+                        debug_num=debug_num, group_id=group_id, token=token)
+
+    def submit_job(self, stage, label, **kwargs):
+        """在子进程中启动一个作业；作业运行期间界面保持可用，可以继续对其他数据集启动作业"""
+        for job in self.job_runner.active_jobs():
+            if (job.stage, job.label) == (stage, label):
+                self.append_log(f"错误：任务 #{job.id} ({STAGE_NAMES[stage]} - {label}) 尚未结束，请等待其结束或先取消。")
+                return
+        job = self.job_runner.submit(stage, label, profile=self.profile_checkbox.isChecked(), **kwargs)
+        self.append_log("\n" + "="*20 + f" 任务 #{job.id} {STAGE_NAMES[stage]}开始 ({label}) " + "="*20)
+        item = QListWidgetItem()
+        item.setData(Qt.ItemDataRole.UserRole, job.id)
+        self.job_rows[job.id] = self.job_list.count()
+        self.job_list.addItem(item)
+        self.job_list.setCurrentRow(self.job_rows[job.id])
+        self.update_job_item(job)
+        self.job_timer.start()
+
+    def poll_jobs(self):
+        """定时读取各作业子进程发回的日志、进度和结果"""
+        for job, event in self.job_runner.poll():
+            if event['type'] == 'log':
+                self.append_log(f"[#{job.id}] {event['message']}")
+            elif event['type'] == 'result':
+                self.on_job_finished(job, event)
+            self.update_job_item(job)
+        if not self.job_runner.active_jobs():
+            self.job_timer.stop()
+
+    def on_job_finished(self, job, event):
+        if event['status'] == job_runner.FAILED:
+            self.append_log(f"任务 #{job.id} 失败: {event.get('error')}")
+            if event.get('traceback'):
+                self.append_log(event['traceback'])
+        self.append_log("="*20 + f" 任务 #{job.id} {STAGE_NAMES[job.stage]}结束 ({JOB_STATE_NAMES[job.state]}，耗时 {event['elapsed']:.1f} 秒) " + "="*20)
+        # 任务结束后，重新扫描文件夹并更新按钮状态
         self.populate_source_folders_combo()
 
+    def update_job_item(self, job):
+        text = f"#{job.id} {STAGE_NAMES[job.stage]} - {job.label} [{JOB_STATE_NAMES[job.state]}]"
+        if job.progress:
+            done, total, _ = job.progress
+            text += f" {done}/{total}" if total else f" {done}"
+        self.job_list.item(self.job_rows[job.id]).setText(text)
+        if self.job_list.currentRow() == self.job_rows[job.id]:
+            self.update_job_buttons()
+
+    def selected_job(self):
+        item = self.job_list.currentItem()
+        return self.job_runner.jobs[item.data(Qt.ItemDataRole.UserRole)] if item is not None else None
+
+    def update_job_buttons(self, *args):
+        job = self.selected_job()
+        self.pause_job_button.setEnabled(job is not None and job.state == job_runner.RUNNING)
+        self.resume_job_button.setEnabled(job is not None and job.state == job_runner.PAUSED)
+        self.cancel_job_button.setEnabled(job is not None and not job.finished)
+
+    def on_pause_job_clicked(self):
+        job = self.selected_job()
+        if job is not None:
+            self.job_runner.pause(job.id)
+            self.append_log(f"任务 #{job.id} 将在下一条日志处暂停。")
+            self.update_job_item(job)
+
+    def on_resume_job_clicked(self):
+        job = self.selected_job()
+        if job is not None:
+            self.job_runner.resume(job.id)
+            self.append_log(f"任务 #{job.id} 已继续。")
+            self.update_job_item(job)
+
+    def on_cancel_job_clicked(self):
+        job = self.selected_job()
+        if job is not None:
+            # 输出文件都是原子写入的，结束子进程不会留下半截文件，下次运行从中断处继续
+            self.job_runner.cancel(job.id)
+            self.append_log("="*20 + f" 任务 #{job.id} {STAGE_NAMES[job.stage]}已取消 " + "="*20)
+            self.update_job_item(job)
+            self.populate_source_folders_combo()
+
     def populate_source_folders_combo(self):
-        """扫描output目录，填充可选的数据源文件夹"""
+        """在后台线程中扫描output目录，扫描完成后填充可选的数据源文件夹"""
+        if self.scan_thread is not None:
+            return # 上一次扫描尚未结束
         self.log_text.append("正在刷新数据源列表...")
+        self.refresh_folders_button.setEnabled(False)
+
+        self.scan_thread = QThread(self)
+        self.scan_worker = FolderScanWorker(os.path.join(project_root, 'output'))
+        self.scan_worker.moveToThread(self.scan_thread)
+        self.scan_thread.started.connect(self.scan_worker.run)
+        self.scan_worker.finished.connect(self.on_folders_scanned)
+        self.scan_worker.finished.connect(self.scan_thread.quit)
+        self.scan_worker.finished.connect(self.scan_worker.deleteLater)
+        self.scan_thread.finished.connect(self.scan_thread.deleteLater)
+        self.scan_thread.start()
+
+    def on_folders_scanned(self, folder_states, error):
+        self.scan_thread = None
+        self.scan_worker = None
+        self.refresh_folders_button.setEnabled(True)
+        self.folder_states = folder_states
+        raw_folders = list(folder_states)
+        current = self.source_folder_combo.currentText()
         self.source_folder_combo.clear()
-        
-        output_path = os.path.join(project_root, 'output')
-        if not os.path.exists(output_path):
-            os.makedirs(output_path)
-        
-        try:
-            all_files = os.listdir(output_path)
-            raw_folders = [f for f in all_files if f.startswith('raw_md') and os.path.isdir(os.path.join(output_path, f))]
-            
-            if not raw_folders:
-                self.log_text.append("未在 'output' 目录中找到任何 'raw_md' 开头的数据文件夹。")
-            else:
-                self.source_folder_combo.addItems(sorted(raw_folders))
-                self.log_text.append(f"发现 {len(raw_folders)} 个可用数据集。")
-        except Exception as e:
-            self.log_text.append(f"刷新数据源列表时出错: {e}")
-        
+        if error:
+            self.log_text.append(f"刷新数据源列表时出错: {error}")
+        elif not raw_folders:
+            self.log_text.append("未在 'output' 目录中找到任何 'raw_md' 开头的数据文件夹。")
+        else:
+            self.source_folder_combo.addItems(raw_folders)
+            if current in raw_folders:
+                self.source_folder_combo.setCurrentText(current) # 刷新后保持原来的选择
+            self.log_text.append(f"发现 {len(raw_folders)} 个可用数据集。")
+
         self.update_button_states() # 填充后立即更新按钮状态
 
     def on_process_ai_clicked(self):
@@ -396,29 +478,7 @@ class MainWindow(QMainWindow):
             self.append_log("错误：请先设置API Base URL和API Key。")
             return
 
-        self.set_controls_enabled(False)
-        self.log_text.append("\n" + "="*20 + " AI处理任务开始 " + "="*20)
-
-        self.ai_thread = QThread(self)
-        self.ai_worker = AiWorker(source_folder, base_url, api_key, concurrency)
-        self.ai_worker.moveToThread(self.ai_thread)
-
-        self.ai_thread.started.connect(self.ai_worker.run)
-        self.ai_worker.log_message.connect(self.append_log)
-        self.ai_worker.finished.connect(self.on_ai_task_finished)
-        
-        self.ai_worker.finished.connect(self.ai_thread.quit)
-        self.ai_worker.finished.connect(self.ai_worker.deleteLater)
-        self.ai_thread.finished.connect(self.ai_thread.deleteLater)
-        
-        self.ai_thread.start()
-
-    def on_ai_task_finished(self):
-        self.append_log("="*20 + " AI处理任务结束 " + "="*20)
-        self.set_controls_enabled(True)
-        self.ai_thread = None
-        self.ai_worker = None
-        self.update_button_states() # 处理结束后更新按钮状态
+        self.submit_job('ai', source_folder, source_folder_name=source_folder, base_url=base_url, api_key=api_key, concurrency=concurrency)
 
     def on_build_html_clicked(self):
         source_folder = self.source_folder_combo.currentText()
@@ -429,29 +489,15 @@ class MainWindow(QMainWindow):
         # 从原始目录推断出已处理目录的名称
         processed_folder = source_folder.replace('raw_', 'processed_')
 
-        self.set_controls_enabled(False)
-        self.log_text.append("\n" + "="*20 + " 生成网页任务开始 " + "="*20)
-
-        self.html_thread = QThread(self)
-        self.html_worker = HtmlWorker(processed_folder) # <--- 传递文件夹名
-        self.html_worker.moveToThread(self.html_thread)
-
-        self.html_thread.started.connect(self.html_worker.run)
-        self.html_worker.log_message.connect(self.append_log)
-        self.html_worker.finished.connect(self.on_html_task_finished)
-
-        self.html_worker.finished.connect(self.html_thread.quit)
-        self.html_worker.finished.connect(self.html_worker.deleteLater)
-        self.html_thread.finished.connect(self.html_thread.deleteLater)
+        self.submit_job('build', processed_folder, source_folder_name=processed_folder)
 
-        self.html_thread.start()
-
-    def on_html_task_finished(self):
-        self.append_log("="*20 + " 生成网页任务结束 " + "="*20)
-        self.set_controls_enabled(True)
-        self.html_thread = None
-        self.html_worker = None
-        self.update_button_states() # 生成结束后更新按钮状态
+    def on_export_archive_clicked(self):
+        source_folder = self.source_folder_combo.currentText()
+        if not source_folder:
+            self.append_log("错误：请先从下拉菜单中选择一个要导出的数据集。")
+            return
+        processed_folder = source_folder.replace('raw_', 'processed_')
+        self.submit_job('archive', processed_folder, source_folder_name=processed_folder)
 
     def on_preview_clicked(self):
         """启动HTTP服务器并打开浏览器"""
@@ -494,20 +540,16 @@ class MainWindow(QMainWindow):
         # 标记正在关闭，防止新的任务启动
         self.is_closing = True 
         
-        # 1. 停止所有可能的工作线程
+        # 1. 结束所有未完成的作业子进程（已完成的文件都有完成标记，下次运行从中断处继续）
+        self.job_timer.stop()
+        if self.job_runner.active_jobs():
+            self.append_log("正在结束未完成的任务...")
+        self.job_runner.shutdown()
+
         threads_to_wait = []
-        if self.thread and self.thread.isRunning():
-            self.append_log("等待抓取线程结束...")
-            threads_to_wait.append(self.thread)
-        
-        if self.ai_thread and self.ai_thread.isRunning():
-            self.append_log("等待AI处理线程结束...")
-            threads_to_wait.append(self.ai_thread)
-            
-        if self.html_thread and self.html_thread.isRunning():
-            self.append_log("等待HTML生成线程结束...")
-            threads_to_wait.append(self.html_thread)
-            
+        if self.scan_thread and self.scan_thread.isRunning():
+            threads_to_wait.append(self.scan_thread)
+
         for t in threads_to_wait:
             t.quit()
             if not t.wait(3000):
@@ -536,28 +578,18 @@ class MainWindow(QMainWindow):
         if not selected_folder:
             self.process_ai_button.setEnabled(False)
             self.build_html_button.setEnabled(False)
+            self.export_archive_button.setEnabled(False)
             self.preview_button.setEnabled(False)
             return
 
         # 只要有数据源可选，就可以进行AI处理
         self.process_ai_button.setEnabled(True)
 
-        # 检查对应的processed文件夹是否存在且不为空，以决定是否可以生成网页
-        output_path = os.path.join(project_root, 'output')
-        processed_folder_name = selected_folder.replace('raw_', 'processed_')
-        processed_folder_path = os.path.join(output_path, processed_folder_name)
-        
-        can_build_html = False
-        if os.path.exists(processed_folder_path) and os.path.isdir(processed_folder_path):
-            if len(os.listdir(processed_folder_path)) > 0:
-                can_build_html = True
-
+        # 对应的processed文件夹不为空才可以生成网页，web文件夹中有index.html才可以预览
+        # （由后台扫描线程预先检查，界面线程不访问磁盘）
+        can_build_html, can_preview = self.folder_states.get(selected_folder, (False, False))
         self.build_html_button.setEnabled(can_build_html)
-        
-        # 检查对应的web文件夹是否存在且有index.html，以决定是否可以预览
-        web_folder_name = selected_folder.replace('raw_', 'web_')
-        web_folder_path = os.path.join(output_path, web_folder_name)
-        can_preview = os.path.exists(os.path.join(web_folder_path, 'index.html'))
+        self.export_archive_button.setEnabled(can_build_html)
         self.preview_button.setEnabled(can_preview)
         
     def set_controls_enabled(self, enabled):
@@ -570,6 +602,7 @@ class MainWindow(QMainWindow):
         self.base_url_input.setEnabled(enabled)
         self.api_key_input.setEnabled(enabled)
         self.concurrency_spinbox.setEnabled(enabled)
+        self.profile_checkbox.setEnabled(enabled)
         
         # 如果正在关闭，则禁用所有按钮
         if hasattr(self, 'is_closing') and self.is_closing:
@@ -578,6 +611,7 @@ class MainWindow(QMainWindow):
         if not enabled:
             self.process_ai_button.setEnabled(False)
             self.build_html_button.setEnabled(False)
+            self.export_archive_button.setEnabled(False)
             self.preview_button.setEnabled(False)
         else:
             self.update_button_states()
@@ -600,13 +634,79 @@ class MainWindow(QMainWindow):
         settings.setValue("api_key", self.api_key_input.text())
         settings.setValue("concurrency", self.concurrency_spinbox.value())
 
+def parse_importtime(stderr: str) -> list:
+    """
+    解析 -X importtime 的输出（每行 "import time: 自身微秒 | 累计微秒 | 缩进+模块名"），
+    返回顶层导入的 [(累计微秒, 模块名)]，被其他模块间接导入的子模块计入其父模块。
+    """
+    top_level = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line.split('|')
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue # 表头
+        name = fields[2][1:] # 去掉分隔符后的一个空格，剩余的前导空格表示嵌套层级
+        if not name.startswith(' '):
+            top_level.append((int(fields[1]), name.strip()))
+    return top_level
+
+def startup_benchmark(runs: int = 5, log_callback=print) -> bool:
+    """
+    在子进程中以 -X importtime 启动界面，测量从启动进程到窗口首次显示的耗时（窗口显示后立即退出），
+    并列出耗时最多的顶层导入。没有显示器时使用 Qt 的 offscreen 平台。
+
+    Returns:
+        bool: 所有运行的中位数是否达到 STARTUP_TARGET_SEC。
+    """
+    import subprocess
+    import statistics
+    env = dict(os.environ)
+    if sys.platform.startswith('linux') and not env.get('DISPLAY') and not env.get('WAYLAND_DISPLAY'):
+        env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    timings = []
+    imports = []
+    for _ in range(runs):
+        env[STARTUP_T0_ENV] = repr(time.time())
+        result = subprocess.run([sys.executable, '-X', 'importtime', os.path.abspath(__file__), '--measure-startup'],
+                                env=env, capture_output=True, text=True, timeout=120)
+        lines = [line for line in result.stdout.splitlines() if line.startswith('time_to_first_window=')]
+        if result.returncode != 0 or not lines:
+            log_callback(f"启动失败: {result.stderr[-2000:]}")
+            return False
+        timings.append(float(lines[-1].split('=', 1)[1]))
+        imports = parse_importtime(result.stderr)
+
+    median = statistics.median(timings)
+    log_callback(f"窗口首次显示耗时: 中位数 {median:.3f} 秒（{', '.join(f'{t:.3f}' for t in timings)}），目标 {STARTUP_TARGET_SEC:.1f} 秒 —— "
+                 f"{'达标' if median <= STARTUP_TARGET_SEC else '未达标'}")
+    log_callback(f"导入耗时合计 {sum(us for us, _ in imports) / 1e6:.3f} 秒，最慢的顶层导入:")
+    for cumulative_us, name in sorted(imports, reverse=True)[:10]:
+        log_callback(f"  {cumulative_us / 1000:8.1f} 毫秒  {name}")
+    return median <= STARTUP_TARGET_SEC
+
 def main():
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description='知识星球内容总管')
+    parser.add_argument('--startup-benchmark', type=int, nargs='?', const=5, metavar='N',
+                        help='测量 N 次（默认 5 次）从启动到窗口首次显示的耗时，并列出最慢的导入')
+    parser.add_argument('--measure-startup', action='store_true', help=argparse.SUPPRESS)  # 基准测试的子进程使用
+    args, qt_args = parser.parse_known_args()
+    if args.startup_benchmark:
+        sys.exit(0 if startup_benchmark(args.startup_benchmark) else 1)
+
+    app = QApplication(sys.argv[:1] + qt_args)
     # --- 核心修复：禁用最后一个窗口关闭时自动退出程序的行为 ---
     # 这允许我们在closeEvent中执行清理操作而不会立即退出
     app.setQuitOnLastWindowClosed(False) 
     window = MainWindow()
     window.show()
+    if args.measure_startup:
+        # 事件循环处理完显示事件后记录耗时并退出
+        def report_and_quit():
+            start = float(os.environ.get(STARTUP_T0_ENV, '0') or 0)
+            print(f"time_to_first_window={time.time() - start:.4f}", flush=True)
+            os._exit(0)
+        QTimer.singleShot(0, report_and_quit)
     sys.exit(app.exec())
 
 if __name__ == '__main__':
@@ -0,0 +1,105 @@
+import os
+import heapq
+
+try:
+    from .site_data import DATA_DIR_NAME, dump_compact, write_if_changed
+    from .facets import delta_encode
+except ImportError:  # 作为独立脚本运行时
+    from site_data import DATA_DIR_NAME, dump_compact, write_if_changed
+    from facets import delta_encode
+
+# --- 聚合视图配置 ---
+AGGREGATES_DIR_NAME = 'aggregates'   # data目录下存放聚合数据的子目录
+SUMMARY_FILENAME = 'summary.json'    # 月份/主题×月份/作者排行/点赞排行的概览
+AUTHORS_DIR_NAME = 'authors'         # 作者 -> 帖子列表的分片目录
+AUTHORS_PER_SHARD = 200              # 按发帖数排名分片，活跃作者集中在前几个分片
+TOP_LIKED_COUNT = 200                # 点赞排行保留的帖子数
+
+
+def build_aggregates(posts: list) -> dict:
+    """
+    一次遍历帖子元数据，计算按作者、按月份、主题×月份、点赞排行的聚合结果。
+
+    posts 应已按发布时间从新到旧排序（与元数据索引相同），文档编号即下标，
+    因此同一个月的帖子是连续的一段编号，月份视图只需记录区间。
+
+    Returns:
+        dict: {'months': [(月份, 帖子数, [起始编号, 数量, ...]), ...],
+               'topic_months': {主题: {月份: 帖子数}},
+               'authors': {作者: [文档编号, ...]},
+               'top_liked': [按点赞数从高到低的文档编号]}
+    """
+    months = []            # [月份, 帖子数, 区间列表]，按出现顺序（即从新到旧）
+    month_index = {}
+    topic_months = {}
+    authors = {}
+    previous_month = None
+    for doc_id, post in enumerate(posts):
+        month = str(post.get('create_time') or '')[:7]
+        if month:
+            if month not in month_index:
+                month_index[month] = len(months)
+                months.append([month, 0, []])
+            entry = months[month_index[month]]
+            entry[1] += 1
+            if month == previous_month:
+                entry[2][-1] += 1              # 延长当前区间
+            else:
+                entry[2].extend((doc_id, 1))   # 新区间（仅在输入未严格排序时会出现多段）
+            if post.get('topic'):
+                counts = topic_months.setdefault(str(post['topic']), {})
+                counts[month] = counts.get(month, 0) + 1
+        previous_month = month
+        authors.setdefault(str(post.get('author') or '匿名用户'), []).append(doc_id)
+
+    top_liked = heapq.nlargest(TOP_LIKED_COUNT, range(len(posts)), key=lambda i: int(posts[i].get('likes') or 0))
+    return {'months': months, 'topic_months': topic_months, 'authors': authors, 'top_liked': top_liked}
+
+def write_aggregates(posts: list, web_output_dir: str, log_callback=print) -> dict:
+    """
+    写出 data/aggregates/summary.json 和按作者分片的 data/aggregates/authors/<n>.json。
+
+    summary.json:
+        months:       [[月份, 帖子数, [起始编号, 数量, ...]], ...]   从新到旧
+        topics:       [主题, ...]
+        topic_months: [[与 months 对齐的帖子数, ...], ...]          与 topics 对齐
+        authors:      [[作者, 帖子数, 分片号], ...]                 按帖子数从多到少
+        top_liked:    [文档编号, ...]                               按点赞数从高到低
+    authors/<n>.json: {作者: 差值编码的文档编号列表}
+
+    Returns:
+        dict: 包含 'aggregates_path'（相对web目录）。
+    """
+    aggregates = build_aggregates(posts)
+    aggregates_dir = os.path.join(web_output_dir, DATA_DIR_NAME, AGGREGATES_DIR_NAME)
+    authors_dir = os.path.join(aggregates_dir, AUTHORS_DIR_NAME)
+    os.makedirs(authors_dir, exist_ok=True)
+
+    ranked_authors = sorted(aggregates['authors'].items(), key=lambda item: (-len(item[1]), item[0]))
+    author_rows = []
+    shards = []
+    for rank, (author, doc_ids) in enumerate(ranked_authors):
+        shard_id = rank // AUTHORS_PER_SHARD
+        if shard_id == len(shards):
+            shards.append({})
+        shards[shard_id][author] = delta_encode(doc_ids)
+        author_rows.append([author, len(doc_ids), shard_id])
+    for shard_id, shard in enumerate(shards):
+        write_if_changed(os.path.join(authors_dir, f'{shard_id}.json'), dump_compact(shard))
+    for entry in os.scandir(authors_dir):
+        stem, ext = os.path.splitext(entry.name)
+        if ext == '.json' and stem.isdigit() and int(stem) >= len(shards):
+            os.remove(entry.path)
+
+    month_keys = [month for month, _, _ in aggregates['months']]
+    topics = sorted(aggregates['topic_months'])
+    summary = {
+        'months': aggregates['months'],
+        'topics': topics,
+        'topic_months': [[aggregates['topic_months'][topic].get(month, 0) for month in month_keys] for topic in topics],
+        'authors': author_rows,
+        'top_liked': aggregates['top_liked'],
+    }
+    write_if_changed(os.path.join(aggregates_dir, SUMMARY_FILENAME), dump_compact(summary))
+    log_callback(f"  - [聚合] 已生成 {len(author_rows)} 位作者、{len(month_keys)} 个月份的聚合视图（作者分片 {len(shards)} 个）。")
+    return {'aggregates_path': f'{DATA_DIR_NAME}/{AGGREGATES_DIR_NAME}/'}
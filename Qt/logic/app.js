@@ -1,50 +1,583 @@
-document.addEventListener('DOMContentLoaded', () => {
-    const topicButtons = document.querySelectorAll('.topic-filter .topic-tag');
-    const tagButtons = document.querySelectorAll('.tag-filter .tag');
-    const postCards = document.querySelectorAll('.post-card');
+// 帖子列表前端逻辑：加载元数据索引，分面筛选、全文检索、聚合视图，以及虚拟化的无限滚动列表。
+// 页面只加载精简的元数据索引 (posts_index.json)，帖子正文按分片懒加载，
+// 列表只保留视口附近的卡片节点，节点滚出视口后回收复用。
+document.addEventListener('DOMContentLoaded', async () => {
+    const postsContainer = document.getElementById('posts-container');
+    if (!postsContainer) return;
 
-    let activeTopic = 'all';
-    let activeTag = 'all';
+    const indexUrl = postsContainer.dataset.indexUrl;
+    const contentUrl = postsContainer.dataset.contentUrl;
+    const searchUrl = postsContainer.dataset.searchUrl;
+    const searchShardCount = Number(postsContainer.dataset.searchShards);
+    const resultSummary = document.getElementById('result-summary');
 
-    // 主题筛选事件
-    topicButtons.forEach(button => {
-        button.addEventListener('click', () => {
-            const selectedTopic = button.dataset.topic;
-            if (selectedTopic === activeTopic) return;
+    const fetchJson = async (url) => {
+        const response = await fetch(url);
+        if (!response.ok) throw new Error(response.status);
+        return response.json();
+    };
+    let allPosts, facets;
+    try {
+        // facets: {维度: {取值: 差值编码的文档编号列表}}，文档编号即 allPosts 下标（已按最新发布排序）
+        [allPosts, facets] = await Promise.all([fetchJson(indexUrl), fetchJson(postsContainer.dataset.facetsUrl)]);
+    } catch (e) {
+        postsContainer.innerHTML = '<p class="posts-message">加载帖子索引失败，请通过本地预览服务器访问本页面。</p>';
+        return;
+    }
+
+    // 分片缓存：URL -> Promise<JSON>，正文分片和检索分片共用
+    const shardCache = new Map();
+    function fetchShard(url) {
+        if (!shardCache.has(url)) {
+            const request = fetchJson(url).catch(e => {
+                shardCache.delete(url); // 失败后允许下次重试
+                throw e;
+            });
+            shardCache.set(url, request);
+        }
+        return shardCache.get(url);
+    }
+    const loadShard = (shardId) => fetchShard(`${contentUrl}${shardId}.json`);
+
+    // --- 全文检索 ---
+    // 分词规则与构建端 search_index.tokenize 保持一致：中文二字切分，英文/数字按单词切分
+    const TOKEN_RE = /[\u3400-\u4dbf\u4e00-\u9fff]+|[a-z0-9]+/g;
+    const MAX_WORD_LEN = 32;
+    function tokenize(text) {
+        const tokens = [];
+        for (const run of text.toLowerCase().match(TOKEN_RE) || []) {
+            if (run[0] <= 'z') {
+                if (run.length >= 2) tokens.push(run.substring(0, MAX_WORD_LEN));
+            } else if (run.length === 1) {
+                tokens.push(run);
+            } else {
+                for (let i = 0; i < run.length - 1; i++) tokens.push(run.substring(i, i + 2));
+            }
+        }
+        return [...new Set(tokens)];
+    }
+
+    // 查询单个词项，返回 Map(docId -> score)。
+    // 最后一个词项按前缀匹配（同一首字符的词项都在同一分片中），便于边输入边搜索。
+    async function lookupTerm(term, prefix) {
+        const shard = await fetchShard(`${searchUrl}${term.codePointAt(0) % searchShardCount}.json`);
+        const scores = new Map();
+        const addPostings = (flat) => {
+            for (let i = 0; i < flat.length; i += 2) {
+                scores.set(flat[i], Math.max(scores.get(flat[i]) || 0, flat[i + 1]));
+            }
+        };
+        if (shard[term]) addPostings(shard[term]);
+        if (prefix) {
+            for (const key in shard) {
+                if (key !== term && key.startsWith(term)) addPostings(shard[key]);
+            }
+        }
+        return scores;
+    }
 
-            topicButtons.forEach(btn => btn.classList.remove('active'));
-            button.classList.add('active');
-            activeTopic = selectedTopic;
-            applyFilters();
+    // 返回同时包含所有查询词项的帖子下标，按相关度从高到低排序
+    async function searchPosts(query) {
+        const terms = tokenize(query);
+        if (terms.length === 0) return [];
+        const termScores = await Promise.all(terms.map((term, i) => lookupTerm(term, i === terms.length - 1)));
+        termScores.sort((a, b) => a.size - b.size); // 从最短的倒排表开始求交集
+        const totals = new Map(termScores[0]);
+        for (const scores of termScores.slice(1)) {
+            for (const [docId, total] of totals) {
+                const score = scores.get(docId);
+                if (score === undefined) totals.delete(docId);
+                else totals.set(docId, total + score);
+            }
+        }
+        return [...totals.entries()].sort((a, b) => b[1] - a[1]).map(([docId]) => docId);
+    }
+
+    let currentTopic = 'all';
+    let currentTag = 'all';
+    let currentDigested = 'all'; // 'all' or 'true'
+    let currentSort = 'newest'; // 'newest' or 'oldest'
+    let searchResults = null; // 有搜索词时为按相关度排序的帖子下标数组
+
+    // --- 分面筛选：倒排表求交集，位图按需生成并缓存 ---
+    const postingCache = new Map();
+    const bitsetCache = new Map();
+    function facetPostings(kind, key) {
+        const cacheKey = `${kind}\u0000${key}`;
+        if (!postingCache.has(cacheKey)) {
+            const gaps = (facets[kind] && facets[kind][key]) || [];
+            const ids = new Uint32Array(gaps.length);
+            let current = 0;
+            gaps.forEach((gap, i) => { current += gap; ids[i] = current; });
+            postingCache.set(cacheKey, ids);
+        }
+        return postingCache.get(cacheKey);
+    }
+    function facetBitset(kind, key) {
+        const cacheKey = `${kind}\u0000${key}`;
+        if (!bitsetCache.has(cacheKey)) {
+            const bitset = new Uint8Array(allPosts.length);
+            facetPostings(kind, key).forEach(docId => { bitset[docId] = 1; });
+            bitsetCache.set(cacheKey, bitset);
+        }
+        return bitsetCache.get(cacheKey);
+    }
+
+    // 返回符合当前筛选条件的文档编号列表；无任何条件时返回 null 表示全部帖子
+    function selectDocIds() {
+        const selections = [];
+        if (currentTopic !== 'all') selections.push(['topic', currentTopic]);
+        if (currentTag !== 'all') selections.push(['tag', currentTag]);
+        if (currentDigested === 'true') selections.push(['digested', 'true']);
+
+        // 有序来源：搜索结果（相关度）或排行类视图（点赞最多）；作者/月份视图与分面一样作为筛选条件
+        let ranked = searchResults;
+        const useViewAsFilter = currentView && (ranked || !currentView.ranked);
+        if (!ranked && currentView && currentView.ranked) ranked = currentView.docIds;
+        if (ranked) {
+            const bitsets = selections.map(([kind, key]) => facetBitset(kind, key));
+            if (useViewAsFilter) bitsets.push(viewBitset(currentView));
+            return ranked.filter(docId => bitsets.every(bitset => bitset[docId]));
+        }
+        if (selections.length === 0 && !useViewAsFilter) return null;
+
+        const postings = selections.map(([kind, key]) => facetPostings(kind, key));
+        const bitsets = selections.map(([kind, key]) => facetBitset(kind, key));
+        if (useViewAsFilter) {
+            postings.push(currentView.docIds);
+            bitsets.push(viewBitset(currentView));
+        }
+        if (postings.length === 1) return Array.from(postings[0]);
+        const shortest = postings.reduce((a, b) => (b.length < a.length ? b : a));
+        return Array.from(shortest).filter(docId => bitsets.every(bitset => bitset[docId]));
+    }
+
+    // --- 聚合视图：按作者 / 按月份 / 点赞最多，数据由构建端预先计算 ---
+    // summary.json 和作者分片只在首次进入聚合视图时加载
+    const aggregatesUrl = postsContainer.dataset.aggregatesUrl;
+    const statsPanel = document.getElementById('stats-panel');
+    const viewBanner = document.getElementById('view-banner');
+    let currentView = null; // {label, docIds, ranked}，docIds 非 ranked 时按编号升序
+    const loadSummary = () => fetchShard(`${aggregatesUrl}summary.json`);
+
+    function viewBitset(view) {
+        if (!view.bitset) {
+            view.bitset = new Uint8Array(allPosts.length);
+            view.docIds.forEach(docId => { view.bitset[docId] = 1; });
+        }
+        return view.bitset;
+    }
+
+    // 月份视图：同一月份的帖子是连续的文档编号区间 [起始编号, 数量, ...]
+    async function monthView(month) {
+        const summary = await loadSummary();
+        const entry = summary.months.find(row => row[0] === month);
+        const docIds = [];
+        if (entry) {
+            const ranges = entry[2];
+            for (let i = 0; i < ranges.length; i += 2) {
+                for (let docId = ranges[i]; docId < ranges[i] + ranges[i + 1]; docId++) docIds.push(docId);
+            }
+            docIds.sort((a, b) => a - b);
+        }
+        return { label: `${month} 发布的帖子`, docIds, ranked: false };
+    }
+
+    async function authorView(author) {
+        const summary = await loadSummary();
+        const row = summary.authors.find(item => item[0] === author);
+        const docIds = [];
+        if (row) {
+            const gaps = (await fetchShard(`${aggregatesUrl}authors/${row[2]}.json`))[author] || [];
+            let current = 0;
+            gaps.forEach(gap => { current += gap; docIds.push(current); });
+        }
+        return { label: `作者「${author}」的帖子`, docIds, ranked: false };
+    }
+
+    async function topLikedView() {
+        const summary = await loadSummary();
+        return { label: `点赞最多的 ${summary.top_liked.length} 篇帖子`, docIds: summary.top_liked, ranked: true };
+    }
+
+    function setView(view) {
+        currentView = view;
+        if (viewBanner) {
+            viewBanner.replaceChildren();
+            viewBanner.style.display = view ? 'block' : 'none';
+            if (view) {
+                const clear = document.createElement('a');
+                clear.textContent = '返回全部帖子';
+                clear.addEventListener('click', () => { location.hash = ''; });
+                viewBanner.append(`当前视图：${view.label}`, clear);
+            }
+        }
+        renderPosts();
+    }
+
+    // 统计概览：按月发帖量柱状图、主题×月份热力图、发帖最多的作者
+    let statsRendered = false;
+    async function renderStatsPanel() {
+        if (statsRendered) return;
+        const summary = await loadSummary();
+        const months = summary.months.slice().reverse(); // 从早到晚显示
+        const heading = (text) => {
+            const h = document.createElement('h3');
+            h.textContent = text;
+            return h;
+        };
+
+        const bars = document.createElement('div');
+        bars.className = 'month-bars';
+        const maxCount = Math.max(1, ...months.map(row => row[1]));
+        months.forEach(([month, count]) => {
+            const bar = document.createElement('a');
+            bar.className = 'month-bar';
+            bar.href = `#month=${encodeURIComponent(month)}`;
+            bar.title = `${month}: ${count} 篇`;
+            bar.style.height = `${Math.max(2, Math.round(100 * count / maxCount))}%`;
+            bars.appendChild(bar);
         });
-    });
 
-    // 标签筛选事件
-    tagButtons.forEach(button => {
-        button.addEventListener('click', () => {
-            const selectedTag = button.dataset.tag;
-            if (selectedTag === activeTag) return;
-            
-            tagButtons.forEach(btn => btn.classList.remove('active'));
-            button.classList.add('active');
-            activeTag = selectedTag;
-            applyFilters();
+        const heatmap = document.createElement('div');
+        heatmap.className = 'heatmap';
+        const table = document.createElement('table');
+        const headRow = table.insertRow();
+        headRow.appendChild(document.createElement('th'));
+        months.forEach(([month]) => {
+            const th = document.createElement('th');
+            th.textContent = month;
+            headRow.appendChild(th);
         });
-    });
+        const maxCell = Math.max(1, ...summary.topic_months.flat());
+        summary.topics.forEach((topic, t) => {
+            const row = table.insertRow();
+            const th = document.createElement('th');
+            th.textContent = topic;
+            row.appendChild(th);
+            // topic_months 与 summary.months（从新到旧）对齐，这里反向取
+            const counts = summary.topic_months[t].slice().reverse();
+            counts.forEach((count, m) => {
+                const cell = row.insertCell();
+                cell.className = 'cell';
+                cell.textContent = count || '';
+                cell.title = `${topic} / ${months[m][0]}: ${count} 篇`;
+                cell.style.backgroundColor = count ? `rgba(33, 133, 208, ${(0.15 + 0.85 * count / maxCell).toFixed(2)})` : '';
+                cell.dataset.topic = topic;
+                cell.dataset.month = months[m][0];
+            });
+        });
+        table.addEventListener('click', (e) => {
+            const cell = e.target.closest('td.cell');
+            if (!cell || !cell.textContent) return;
+            const topicButton = document.querySelector(`.topic-filter button[data-topic="${CSS.escape(cell.dataset.topic)}"]`);
+            if (topicButton) topicButton.click();
+            location.hash = `month=${encodeURIComponent(cell.dataset.month)}`;
+        });
+        heatmap.appendChild(table);
 
-    function applyFilters() {
-        postCards.forEach(card => {
-            const cardTopic = card.dataset.topic;
-            const cardTags = card.dataset.tags.split(',');
+        const authors = document.createElement('div');
+        authors.className = 'stats-authors';
+        summary.authors.slice(0, 30).forEach(([author, count]) => {
+            const link = document.createElement('a');
+            link.className = 'ui mini basic button';
+            link.href = `#author=${encodeURIComponent(author)}`;
+            link.textContent = `${author} (${count})`;
+            authors.appendChild(link);
+        });
 
-            const topicMatch = activeTopic === 'all' || cardTopic === activeTopic;
-            const tagMatch = activeTag === 'all' || cardTags.includes(activeTag);
+        statsPanel.replaceChildren(
+            heading('按月发帖量'), bars,
+            heading('主题 × 月份'), heatmap,
+            heading('发帖最多的作者'), authors,
+        );
+        statsRendered = true;
+    }
 
-            if (topicMatch && tagMatch) {
-                card.classList.remove('hidden');
-            } else {
-                card.classList.add('hidden');
+    // 地址栏 hash 路由：#stats、#top、#author=<作者>、#month=<YYYY-MM>，便于分享和浏览器后退
+    let routeSeq = 0;
+    async function applyRoute() {
+        const seq = ++routeSeq;
+        const hash = decodeURIComponent(location.hash.slice(1));
+        let view = null;
+        try {
+            if (hash === 'stats') {
+                await renderStatsPanel();
+            } else if (hash === 'top') {
+                view = await topLikedView();
+            } else if (hash.startsWith('author=')) {
+                view = await authorView(hash.substring('author='.length));
+            } else if (hash.startsWith('month=')) {
+                view = await monthView(hash.substring('month='.length));
+            }
+        } catch (e) {
+            view = null;
+        }
+        if (seq !== routeSeq) return;
+        if (statsPanel) statsPanel.style.display = hash === 'stats' ? 'block' : 'none';
+        if (view !== currentView) setView(view);
+    }
+    window.addEventListener('hashchange', applyRoute);
+
+    // --- 虚拟列表 ---
+    // 卡片高度不一，使用树状数组(Fenwick)维护高度前缀和：按滚动位置定位首个可见卡片和更新单个高度都是 O(log n)。
+    const ESTIMATED_CARD_HEIGHT = 360; // 尚未测量的卡片的预估高度(px)
+    const OVERSCAN_PX = 800;           // 视口上下额外渲染的像素范围，减少快速滚动时的空白
+    const measuredHeights = new Map(); // 文档编号 -> 实测高度，筛选条件变化后仍然有效
+
+    class HeightTree {
+        constructor(heights) {
+            this.size = heights.length;
+            this.heights = Float64Array.from(heights);
+            this.tree = new Float64Array(this.size + 1);
+            for (let i = 0; i < this.size; i++) {
+                this.tree[i + 1] += this.heights[i];
+                const parent = i + 1 + ((i + 1) & -(i + 1));
+                if (parent <= this.size) this.tree[parent] += this.tree[i + 1];
+            }
+        }
+        // 前 count 个卡片的总高度
+        prefix(count) {
+            let sum = 0;
+            for (let i = count; i > 0; i -= i & -i) sum += this.tree[i];
+            return sum;
+        }
+        set(index, height) {
+            const delta = height - this.heights[index];
+            if (delta === 0) return;
+            this.heights[index] = height;
+            for (let i = index + 1; i <= this.size; i += i & -i) this.tree[i] += delta;
+        }
+        // 第一个底边超过 offset 的卡片下标
+        indexAt(offset) {
+            let index = 0;
+            let step = 1;
+            while (step * 2 <= this.size) step *= 2;
+            for (; step > 0; step >>= 1) {
+                if (index + step <= this.size && this.tree[index + step] <= offset) {
+                    index += step;
+                    offset -= this.tree[index];
+                }
+            }
+            return Math.min(index, Math.max(this.size - 1, 0));
+        }
+        get total() {
+            return this.prefix(this.size);
+        }
+    }
+
+    const topSpacer = document.createElement('div');
+    const cardLayer = document.createElement('div');
+    cardLayer.className = 'post-card-layer';
+    const bottomSpacer = document.createElement('div');
+    postsContainer.replaceChildren(topSpacer, cardLayer, bottomSpacer);
+
+    let listDocIds = null;   // 当前列表的文档编号（null 表示全部帖子）
+    let listLength = 0;
+    let listReversed = false;
+    let heightTree = new HeightTree([]);
+    const mounted = new Map(); // 列表位置 -> 卡片节点
+    const cardPool = [];       // 回收待复用的卡片节点
+
+    const docAt = (position) => {
+        const i = listReversed ? listLength - 1 - position : position;
+        return listDocIds ? listDocIds[i] : i;
+    };
+
+    function createCard() {
+        const card = document.createElement('div');
+        card.className = 'post-card';
+        card.innerHTML = `
+            <div class="post-header">
+                <span class="post-author"></span>
+                <span class="post-time"></span>
+            </div>
+            <div class="post-body">
+                <p class="post-digest"><strong>摘要:</strong> <span class="post-digest-text"></span></p>
+                <div class="post-content"></div>
+            </div>
+            <div class="post-footer">
+                <div class="post-meta">
+                    <span class="post-likes"></span>
+                    <span class="post-comments"></span>
+                    <span class="digested-badge">精华</span>
+                    <span class="post-duplicates"></span>
+                </div>
+                <div class="post-tags">
+                    <span class="topic-badge"></span>
+                    <span class="post-tag-list"></span>
+                </div>
+            </div>`;
+        return card;
+    }
+
+    // 将卡片节点绑定到某篇帖子：元数据用 textContent 直接填充，正文异步从分片加载
+    function bindCard(card, docId) {
+        const post = allPosts[docId];
+        card.dataset.id = post.topic_id;
+        card.querySelector('.post-author').textContent = post.author || '';
+        card.querySelector('.post-time').textContent = post.create_time ? String(post.create_time).substring(0, 16) : '';
+        card.querySelector('.post-digest-text').textContent = post.digest || '';
+        card.querySelector('.post-likes').textContent = `点赞: ${post.likes || 0}`;
+        card.querySelector('.post-comments').textContent = `评论: ${post.comments_count || 0}`;
+        card.querySelector('.digested-badge').style.display = post.digested ? '' : 'none';
+        card.querySelector('.post-duplicates').textContent = post.duplicates ? `另有 ${post.duplicates} 篇相似帖子` : '';
+        card.querySelector('.topic-badge').textContent = post.topic || '';
+        const tagList = card.querySelector('.post-tag-list');
+        tagList.replaceChildren(...(post.tags || []).map(tag => {
+            const label = document.createElement('span');
+            label.className = 'tag-label';
+            label.textContent = tag;
+            return label;
+        }));
+
+        const contentEl = card.querySelector('.post-content');
+        contentEl.innerHTML = '<p class="post-loading">正文加载中...</p>';
+        loadShard(post.shard).then(shard => {
+            if (card.dataset.id !== post.topic_id) return; // 节点已被复用给其他帖子
+            contentEl.innerHTML = shard[post.topic_id] || '';
+            scheduleUpdate();
+        }).catch(() => {
+            if (card.dataset.id === post.topic_id) contentEl.innerHTML = '<p>正文加载失败。</p>';
+        });
+    }
+
+    // 根据滚动位置挂载/回收卡片，并用实测高度修正前缀和
+    function updateVisible() {
+        if (listLength === 0) return;
+        const containerTop = postsContainer.getBoundingClientRect().top + window.scrollY;
+        const viewTop = window.scrollY - containerTop - OVERSCAN_PX;
+        const viewBottom = window.scrollY - containerTop + window.innerHeight + OVERSCAN_PX;
+        const first = heightTree.indexAt(Math.max(0, viewTop));
+        let last = heightTree.indexAt(Math.max(0, viewBottom));
+        last = Math.min(last, listLength - 1);
+
+        for (const [position, card] of mounted) {
+            if (position < first || position > last) {
+                mounted.delete(position);
+                card.remove();
+                card.dataset.id = '';
+                cardPool.push(card);
+            }
+        }
+        const ordered = [];
+        for (let position = first; position <= last; position++) {
+            let card = mounted.get(position);
+            if (!card) {
+                card = cardPool.pop() || createCard();
+                bindCard(card, docAt(position));
+                mounted.set(position, card);
+            }
+            ordered.push(card);
+        }
+        // appendChild 会移动已存在的节点，只涉及视口附近的少量卡片
+        ordered.forEach(card => cardLayer.appendChild(card));
+
+        for (let position = first; position <= last; position++) {
+            const card = mounted.get(position);
+            const style = getComputedStyle(card);
+            const height = card.offsetHeight + parseFloat(style.marginTop) + parseFloat(style.marginBottom);
+            measuredHeights.set(docAt(position), height);
+            heightTree.set(position, height);
+        }
+        topSpacer.style.height = `${heightTree.prefix(first)}px`;
+        bottomSpacer.style.height = `${heightTree.total - heightTree.prefix(last + 1)}px`;
+    }
+
+    let updateScheduled = false;
+    function scheduleUpdate() {
+        if (updateScheduled) return;
+        updateScheduled = true;
+        requestAnimationFrame(() => {
+            updateScheduled = false;
+            updateVisible();
+        });
+    }
+    window.addEventListener('scroll', scheduleUpdate, { passive: true });
+    window.addEventListener('resize', scheduleUpdate);
+
+    // 筛选/排序/搜索条件变化后重建列表
+    function renderPosts() {
+        listDocIds = selectDocIds();
+        listLength = listDocIds ? listDocIds.length : allPosts.length;
+        // "最新发布"即文档编号顺序，"最早发布"反向取；搜索结果和排行视图保持原有顺序
+        listReversed = currentSort === 'oldest' && !searchResults && !(currentView && currentView.ranked);
+        const heights = new Float64Array(listLength);
+        for (let position = 0; position < listLength; position++) {
+            heights[position] = measuredHeights.get(docAt(position)) || ESTIMATED_CARD_HEIGHT;
+        }
+        heightTree = new HeightTree(heights);
+
+        for (const card of mounted.values()) {
+            card.remove();
+            card.dataset.id = '';
+            cardPool.push(card);
+        }
+        mounted.clear();
+        topSpacer.style.height = '0px';
+        bottomSpacer.style.height = `${heightTree.total}px`;
+
+        if (resultSummary) {
+            resultSummary.textContent = listLength === 0 ? '没有找到符合条件的帖子。' : `共 ${listLength} 篇符合条件的帖子`;
+        }
+        // 列表已滚动到下方时回到列表顶部
+        const containerTop = postsContainer.getBoundingClientRect().top + window.scrollY;
+        if (window.scrollY > containerTop) window.scrollTo(0, containerTop);
+        updateVisible();
+    }
+
+    function setupEventListeners(selector, stateUpdater) {
+        document.querySelector(selector).addEventListener('click', (e) => {
+            if (e.target.tagName === 'BUTTON') {
+                document.querySelectorAll(`${selector} button`).forEach(btn => btn.classList.remove('active'));
+                e.target.classList.add('active');
+                stateUpdater(e.target.dataset);
+                renderPosts();
             }
         });
     }
-}); 
\ No newline at end of file
+
+    // 绑定事件
+    setupEventListeners('.topic-filter', (data) => currentTopic = data.topic);
+    setupEventListeners('.tag-filter', (data) => currentTag = data.tag);
+    setupEventListeners('.digested-filter', (data) => currentDigested = data.digested);
+    setupEventListeners('.sort-order', (data) => currentSort = data.sort);
+
+    // 搜索框：输入停止200ms后查询，searchSeq 用于丢弃过期的查询结果
+    const searchInput = document.getElementById('search-input');
+    const searchStatus = document.getElementById('search-status');
+    let searchTimer = null;
+    let searchSeq = 0;
+    searchInput.addEventListener('input', () => {
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(async () => {
+            const seq = ++searchSeq;
+            const query = searchInput.value.trim();
+            let results = null;
+            if (query) {
+                const started = performance.now();
+                try {
+                    results = await searchPosts(query);
+                } catch (e) {
+                    results = [];
+                }
+                if (seq !== searchSeq) return;
+                searchStatus.textContent = `找到 ${results.length} 篇相关帖子 (${Math.round(performance.now() - started)} 毫秒)`;
+            } else {
+                searchStatus.textContent = '';
+            }
+            searchResults = results;
+            renderPosts();
+        }, 200);
+    });
+
+    // 点击卡片上的作者名进入该作者的帖子视图
+    cardLayer.addEventListener('click', (e) => {
+        const authorEl = e.target.closest('.post-author');
+        if (authorEl && authorEl.textContent) location.hash = `author=${encodeURIComponent(authorEl.textContent)}`;
+    });
+
+    // 初始渲染（地址栏带有视图 hash 时先按视图渲染）
+    renderPosts();
+    if (location.hash) applyRoute();
+});
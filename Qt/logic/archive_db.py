@@ -0,0 +1,403 @@
+import os
+import re
+import json
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import tempfile
+
+try:
+    from . import front_matter
+    from . import profiling
+    from .search_index import FIELD_BOOST, TOKEN_RE, tokenize
+except ImportError:  # 作为独立脚本运行时
+    import front_matter
+    import profiling
+    from search_index import FIELD_BOOST, TOKEN_RE, tokenize
+
+# --- 检索库配置 ---
+DB_FILENAME = '.archive.sqlite'   # 保存在 processed_ 目录中，与帖子文件一一对应
+DB_VERSION = 1                    # 表结构版本（PRAGMA user_version），不符时重建
+COMMIT_EVERY = 2000               # 导出时每写入多少篇帖子提交一次事务
+SNIPPET_CHARS = 80                # 检索结果中正文摘录的长度
+SQLITE_MAX_INT = 2 ** 63 - 1      # SQLite 整数的上限，更大的 limit/offset/min_likes 会在绑定参数时溢出
+CACHE_SIZE_KB = 65536             # 导出时 SQLite 页缓存的大小，FTS5 索引段合并时命中缓存可明显加快写入
+ORDERS = {
+    'rank': 'score DESC',
+    'time': 'p.create_time DESC',
+    'likes': 'p.likes DESC, p.create_time DESC',
+}
+LINK_RE = re.compile(r'!?\[([^\]]*)\]\([^)]*\)')   # Markdown 图片/链接只保留文字，URL 不进入索引
+URL_RE = re.compile(r'https?://\S+')
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS posts (
+    id INTEGER PRIMARY KEY,
+    topic_id TEXT NOT NULL UNIQUE,
+    filename TEXT NOT NULL UNIQUE,
+    author TEXT,
+    create_time TEXT,
+    topic TEXT,
+    tags TEXT,
+    digest TEXT,
+    likes INTEGER,
+    comments_count INTEGER,
+    digested INTEGER,
+    content TEXT,
+    mtime INTEGER,
+    size INTEGER
+);
+CREATE TABLE IF NOT EXISTS post_tags (post_id INTEGER NOT NULL, tag TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS post_tags_tag ON post_tags (tag, post_id);
+CREATE INDEX IF NOT EXISTS post_tags_post ON post_tags (post_id);
+CREATE INDEX IF NOT EXISTS posts_time ON posts (create_time);
+CREATE INDEX IF NOT EXISTS posts_likes ON posts (likes);
+CREATE INDEX IF NOT EXISTS posts_topic ON posts (topic);
+CREATE INDEX IF NOT EXISTS posts_author ON posts (author);
+-- 词项由 search_index.tokenize 预先切分（中文二字切分），以空格分隔写入，unicode61 只按空格拆分；
+-- prefix='1' 为单字前缀建立索引，单个汉字的查询不必扫描所有以该字开头的词项
+CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(body, meta, tokenize='unicode61 remove_diacritics 0', prefix='1');
+PRAGMA user_version = {DB_VERSION};
+"""
+
+
+def plain_text(markdown_text: str) -> str:
+    """去掉 Markdown 链接/图片的URL和裸URL，得到用于索引和摘录的正文文本。"""
+    return URL_RE.sub(' ', LINK_RE.sub(r'\1', markdown_text or ''))
+
+def build_match_query(query: str) -> str:
+    """
+    把用户输入转换为 FTS5 查询：按空白分为多个关键词，关键词中的每段连续汉字或英文/数字切分为词项后作为短语查询，
+    全部需要命中。因此 "人工智能" 只匹配连续出现的原文，而不是分别出现的 "人工" 和 "智能"。
+    单个汉字的片段在索引中可能只出现在二字词项的末尾，无法可靠匹配，因此忽略；整个查询只有单个汉字时，
+    按前缀匹配以这些字开头的词项。没有可检索的词项时返回空字符串。
+    """
+    phrases, single_chars = [], []
+    for match in TOKEN_RE.finditer(query.lower()):
+        terms = tokenize(match.group(0))
+        if len(terms) == 1 and len(terms[0]) == 1:
+            single_chars.append(f'"{terms[0]}"*')
+        elif terms:
+            phrases.append('"' + ' '.join(terms) + '"')
+    return ' AND '.join(dict.fromkeys(phrases or single_chars))
+
+def make_snippet(content: str, query: str, length: int = SNIPPET_CHARS) -> str:
+    """从正文中截取第一个关键词附近的一段文字；没有找到关键词时取开头。"""
+    text = ' '.join(content.split())
+    lowered = text.lower()
+    positions = [lowered.find(keyword.lower()) for keyword in query.split()]
+    positions = [position for position in positions if position >= 0]
+    start = max(0, min(positions) - length // 4) if positions else 0
+    snippet = text[start:start + length]
+    return ('…' if start > 0 else '') + snippet + ('…' if start + length < len(text) else '')
+
+
+class ArchiveDB:
+    """
+    帖子归档的 SQLite 检索库：posts 表保存元数据和正文，posts_fts（FTS5）保存预先切分的词项，
+    post_tags 表用于按标签筛选。以 topic_id 为键增量更新，按 mtime/size 判断帖子文件是否变化。
+
+    检索按 BM25 排序（标签、主题、摘要和作者的权重为正文的 FIELD_BOOST 倍，与网页端索引一致），
+    也可以按时间或点赞数排序，并按标签、主题、作者、时间范围和点赞数筛选。
+    每个线程应使用自己的 ArchiveDB 实例（sqlite3 连接不在线程间共享）。
+    """
+
+    def __init__(self, db_path: str, readonly: bool = False):
+        self.db_path = db_path
+        if readonly:
+            self.conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        else:
+            self.conn = sqlite3.connect(db_path)
+            self.conn.execute('PRAGMA journal_mode = WAL')   # 导出期间预览服务器仍可读取
+            self.conn.execute('PRAGMA synchronous = NORMAL')
+            self.conn.execute(f'PRAGMA cache_size = -{CACHE_SIZE_KB}')
+            if self.conn.execute('PRAGMA user_version').fetchone()[0] != DB_VERSION:
+                self._drop_all()
+            self.conn.executescript(SCHEMA)
+        self.conn.row_factory = sqlite3.Row
+
+    def _drop_all(self):
+        for name in ('posts_fts', 'post_tags', 'posts'):
+            self.conn.execute(f'DROP TABLE IF EXISTS {name}')
+        self.conn.commit()
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM posts').fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def upsert(self, filename: str, post, stat: os.stat_result = None):
+        """写入或替换一篇帖子（post 为 frontmatter.Post），调用方负责提交事务。"""
+        metadata = post.metadata
+        topic_id = str(metadata.get('topic_id') or os.path.splitext(filename)[0])
+        tags = [str(tag) for tag in metadata.get('tags') or []]
+        content = plain_text(post.content)
+        values = {
+            'topic_id': topic_id, 'filename': filename, 'author': str(metadata.get('author') or ''),
+            'create_time': str(metadata.get('create_time') or ''), 'topic': str(metadata.get('topic') or ''),
+            'tags': json.dumps(tags, ensure_ascii=False), 'digest': str(metadata.get('digest') or ''),
+            'likes': int(metadata.get('likes') or 0), 'comments_count': int(metadata.get('comments_count') or 0),
+            'digested': 1 if metadata.get('digested') is True or str(metadata.get('digested')).lower() == 'true' else 0,
+            'content': content, 'mtime': stat.st_mtime_ns if stat else 0, 'size': stat.st_size if stat else 0,
+        }
+        self._delete_where('topic_id = ? OR filename = ?', (topic_id, filename))
+        cursor = self.conn.execute(f"INSERT INTO posts ({', '.join(values)}) VALUES ({', '.join('?' * len(values))})", list(values.values()))
+        post_id = cursor.lastrowid
+        self.conn.executemany('INSERT INTO post_tags (post_id, tag) VALUES (?, ?)', [(post_id, tag) for tag in dict.fromkeys(tags)])
+        meta = ' '.join([values['topic'], values['digest'], values['author']] + tags)
+        self.conn.execute('INSERT INTO posts_fts (rowid, body, meta) VALUES (?, ?, ?)',
+                          (post_id, ' '.join(tokenize(content)), ' '.join(tokenize(meta))))
+
+    def _delete_where(self, condition: str, params: tuple):
+        ids = [row[0] for row in self.conn.execute(f'SELECT id FROM posts WHERE {condition}', params)]
+        for post_id in ids:
+            self.conn.execute('DELETE FROM posts_fts WHERE rowid = ?', (post_id,))
+            self.conn.execute('DELETE FROM post_tags WHERE post_id = ?', (post_id,))
+            self.conn.execute('DELETE FROM posts WHERE id = ?', (post_id,))
+
+    def update(self, md_dir: str, log_callback=print) -> tuple:
+        """
+        与目录中的 .md 文件同步：新增或变化（mtime/size 不同）的帖子重新读取并写入，已删除的帖子移除。
+
+        Returns:
+            tuple: (写入的帖子数, 删除的帖子数)
+        """
+        known = {row['filename']: (row['mtime'], row['size']) for row in self.conn.execute('SELECT filename, mtime, size FROM posts')}
+        seen = set()
+        written = 0
+        try:
+            for entry in os.scandir(md_dir):
+                if not entry.name.endswith('.md'):
+                    continue
+                seen.add(entry.name)
+                stat = entry.stat()
+                if known.get(entry.name) == (stat.st_mtime_ns, stat.st_size):
+                    continue
+                try:
+                    post = front_matter.load(entry.path)
+                except Exception as e:
+                    log_callback(f"  - [警告] 读取 {entry.name} 失败: {e}")
+                    continue
+                self.upsert(entry.name, post, stat)
+                written += 1
+                if written % COMMIT_EVERY == 0:
+                    self.conn.commit()
+                    log_callback(f"  - [检索库] 已写入 {written} 篇帖子...")
+            removed = [filename for filename in known if filename not in seen]
+            for filename in removed:
+                self._delete_where('filename = ?', (filename,))
+            self.conn.commit()
+        except BaseException:
+            self.conn.commit()   # 已写入的帖子保留，下次从中断处继续
+            raise
+        if written or removed:
+            self.conn.execute("INSERT INTO posts_fts (posts_fts) VALUES ('optimize')")   # 合并索引段，加快查询
+            self.conn.commit()
+        return written, len(removed)
+
+    def search(self, query: str = '', limit: int = 20, offset: int = 0, tag: str = None, topic: str = None, author: str = None,
+               since: str = None, until: str = None, min_likes: int = 0, digested: bool = None, order: str = 'rank') -> list:
+        """
+        检索帖子。query 为空时只按条件筛选（此时 'rank' 排序退回按时间排序）。
+
+        Args:
+            query (str): 关键词，多个关键词以空格分隔，全部命中才返回。
+            since/until (str): create_time 的范围，例如 '2023-01-01'（含）到 '2024-01-01'（不含）。
+            order (str): 'rank'（相关度）、'time'（最新）或 'likes'（点赞数）。
+
+        Returns:
+            list: 每项为帖子元数据字典，另含 'score'（相关度，越大越相关）和 'snippet'（正文摘录）。
+        """
+        if order not in ORDERS:
+            raise ValueError(f"未知的排序方式: {order}")
+        # SQLite 把负的 LIMIT 当作不限数量，负的 OFFSET 当作 0；这里统一收紧，调用方不能借此取回全部结果
+        limit = max(1, min(int(limit), SQLITE_MAX_INT))
+        offset = max(0, min(int(offset), SQLITE_MAX_INT))
+        min_likes = min(int(min_likes or 0), SQLITE_MAX_INT)
+        match = build_match_query(query)
+        conditions, params = [], []
+        if match:
+            conditions.append('posts_fts MATCH ?')
+            params.append(match)
+        elif query.strip():
+            return []   # 关键词中没有可检索的字符
+        for column, value in (('p.topic', topic), ('p.author', author)):
+            if value:
+                conditions.append(f'{column} = ?')
+                params.append(value)
+        if tag:
+            conditions.append('p.id IN (SELECT post_id FROM post_tags WHERE tag = ?)')
+            params.append(tag)
+        if since:
+            conditions.append('p.create_time >= ?')
+            params.append(since)
+        if until:
+            conditions.append('p.create_time < ?')
+            params.append(until)
+        if min_likes:
+            conditions.append('p.likes >= ?')
+            params.append(min_likes)
+        if digested is not None:
+            conditions.append('p.digested = ?')
+            params.append(1 if digested else 0)
+
+        if match:
+            sql = (f"SELECT p.*, -bm25(posts_fts, 1.0, {float(FIELD_BOOST)}) AS score FROM posts_fts "
+                   f"JOIN posts p ON p.id = posts_fts.rowid")
+            order_by = ORDERS[order]
+        else:
+            sql = "SELECT p.*, 0.0 AS score FROM posts p"
+            order_by = ORDERS['time' if order == 'rank' else order]
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += f' ORDER BY {order_by} LIMIT ? OFFSET ?'
+        params.extend([limit, offset])
+
+        results = []
+        for row in self.conn.execute(sql, params):
+            result = {key: row[key] for key in row.keys() if key not in ('id', 'content', 'mtime', 'size')}
+            result['tags'] = json.loads(row['tags'] or '[]')
+            result['digested'] = bool(row['digested'])
+            result['score'] = round(row['score'], 4)
+            result['snippet'] = make_snippet(row['content'] or '', query)
+            results.append(result)
+        return results
+
+
+def db_path_for(source_folder_name: str) -> str:
+    """数据集对应的检索库路径，source_folder_name 可以是 raw_/processed_/web_ 目录名。"""
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    processed_folder_name = source_folder_name.replace('raw_', 'processed_', 1).replace('web_', 'processed_', 1)
+    return os.path.join(project_root, 'output', processed_folder_name, DB_FILENAME)
+
+@profiling.profiled('archive')
+def run_archive_export(source_folder_name: str, log_callback=print):
+    """
+    把 processed_ 目录中的帖子增量导出到 SQLite 检索库（目录中的 .archive.sqlite）。
+    source_folder_name: 例如 'processed_md' 或 'processed_md_digests'
+    """
+    db_path = db_path_for(source_folder_name)
+    md_dir = os.path.dirname(db_path)
+    if not os.path.isdir(md_dir):
+        log_callback(f"错误：找不到已处理的Markdown文件目录 '{md_dir}'。请先运行AI处理步骤。")
+        return
+    log_callback(f"开始导出数据集 '{source_folder_name}' 的检索库...")
+    start = time.time()
+    with ArchiveDB(db_path) as db:
+        written, removed = db.update(md_dir, log_callback)
+        total = len(db)
+    log_callback(f"检索库已更新：写入 {written} 篇、删除 {removed} 篇，共 {total} 篇帖子，耗时 {time.time() - start:.2f} 秒。")
+    log_callback(f"检索库路径: {db_path}")
+
+def print_results(results: list, log_callback=print):
+    for result in results:
+        tags = ' '.join(f"#{tag}" for tag in result['tags'])
+        log_callback(f"[{result['score']:7.2f}] {result['topic_id']}  {result['create_time'][:16]}  {result['author']}  "
+                     f"赞{result['likes']}  {result['topic']} {tags}")
+        log_callback(f"          {result['snippet']}")
+
+def benchmark(num_posts: int = 200000, queries: int = 200, log_callback=print):
+    """
+    在临时检索库中写入 num_posts 篇随机生成的帖子，测量导出速度和各类查询的平均/最慢耗时。
+    """
+    rng = random.Random(0)
+    vocabulary = [chr(c) for c in range(0x4e00, 0x4e00 + 800)]   # 接近常用汉字的数量，词项分布更接近真实数据
+    words = ['python', 'llm', 'etf', 'gpu', 'rust', 'sql']
+    tmp_dir = tempfile.mkdtemp(prefix='archive_db_bench_')
+
+    class FakePost:
+        def __init__(self, content, metadata):
+            self.content = content
+            self.metadata = metadata
+
+    try:
+        db = ArchiveDB(os.path.join(tmp_dir, DB_FILENAME))
+        start = time.perf_counter()
+        for i in range(num_posts):
+            body = ''.join(rng.choices(vocabulary, k=rng.randint(100, 600))) + ' ' + ' '.join(rng.sample(words, 2))
+            db.upsert(f'{i}.md', FakePost(body, {
+                'topic_id': str(10 ** 14 + i), 'author': rng.choice(['张三', '李四', '王五']),
+                'create_time': f'20{rng.randint(18, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 10:00:00.000',
+                'digested': i % 7 == 0, 'likes': rng.randint(0, 200), 'tags': rng.sample(['AI', '算法', '后端', '投资理财'], 2),
+                'topic': rng.choice(['技术分享', '投资理财', '随想杂谈']), 'digest': ''.join(rng.choices(vocabulary, k=30)),
+            }))
+            if (i + 1) % COMMIT_EVERY == 0:
+                db.conn.commit()
+        db.conn.commit()
+        db.conn.execute("INSERT INTO posts_fts (posts_fts) VALUES ('optimize')")
+        db.conn.commit()
+        elapsed = time.perf_counter() - start
+        log_callback(f"写入 {num_posts} 篇帖子: {elapsed:.1f} 秒（{num_posts / elapsed:.0f} 篇/秒），"
+                     f"检索库 {os.path.getsize(db.db_path) / 1024 / 1024:.0f} MB")
+
+        cases = {
+            '二字词': lambda: ''.join(rng.choices(vocabulary, k=2)),
+            '单字': lambda: rng.choice(vocabulary),
+            '英文单词': lambda: rng.choice(words),
+            '两个关键词': lambda: f"{rng.choice(words)} {rng.choice(vocabulary)}",
+        }
+        for label, make_query in cases.items():
+            for kwargs in ({}, {'tag': 'AI', 'order': 'likes'}):
+                timings = []
+                for _ in range(queries):
+                    query = make_query()
+                    query_start = time.perf_counter()
+                    db.search(query, **kwargs)
+                    timings.append((time.perf_counter() - query_start) * 1000)
+                suffix = '（标签筛选+按点赞排序）' if kwargs else ''
+                log_callback(f"  {label + suffix:<28} 平均 {sum(timings) / len(timings):7.2f} 毫秒  最慢 {max(timings):7.2f} 毫秒")
+        db.close()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='帖子归档的 SQLite 全文检索库：导出、查询和基准测试。')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help='把 processed_ 目录中的帖子增量导出到检索库')
+    export_parser.add_argument('source_folder', help="数据集目录名，例如 processed_md")
+    export_parser.add_argument('--profile', action='store_true', help='开启性能分析，报告写入 output/profiles')
+    query_parser = subparsers.add_parser('query', help='检索帖子')
+    query_parser.add_argument('source_folder', help="数据集目录名，例如 processed_md")
+    query_parser.add_argument('query', nargs='?', default='', help='关键词，多个关键词以空格分隔')
+    query_parser.add_argument('--tag')
+    query_parser.add_argument('--topic')
+    query_parser.add_argument('--author')
+    query_parser.add_argument('--since', help="起始时间（含），例如 2023-01-01")
+    query_parser.add_argument('--until', help="结束时间（不含）")
+    query_parser.add_argument('--min-likes', type=int, default=0)
+    query_parser.add_argument('--digested', action='store_true', help='只检索精华帖')
+    query_parser.add_argument('--order', choices=sorted(ORDERS), default='rank')
+    query_parser.add_argument('--limit', type=int, default=20)
+    query_parser.add_argument('--json', action='store_true', help='以 JSON 输出结果')
+    bench_parser = subparsers.add_parser('benchmark', help='导出和查询的基准测试')
+    bench_parser.add_argument('num_posts', type=int, nargs='?', default=200000)
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        run_archive_export(args.source_folder, profile=args.profile)
+    elif args.command == 'query':
+        db_path = db_path_for(args.source_folder)
+        if not os.path.exists(db_path):
+            parser.error(f"检索库不存在: {db_path}，请先运行 export")
+        with ArchiveDB(db_path, readonly=True) as db:
+            query_start = time.perf_counter()
+            results = db.search(args.query, limit=args.limit, tag=args.tag, topic=args.topic, author=args.author, since=args.since,
+                                until=args.until, min_likes=args.min_likes, digested=True if args.digested else None, order=args.order)
+            elapsed_ms = (time.perf_counter() - query_start) * 1000
+        if args.json:
+            print(json.dumps(results, ensure_ascii=False, indent=1))
+        else:
+            print_results(results)
+            print(f"共 {len(results)} 条结果，耗时 {elapsed_ms:.1f} 毫秒。")
+    else:
+        benchmark(args.num_posts)
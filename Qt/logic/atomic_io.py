@@ -0,0 +1,248 @@
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    from .front_matter import read_front_matter
+except ImportError:  # 作为独立脚本运行时
+    from front_matter import read_front_matter
+
+# --- 原子写入配置 ---
+MARKER_FILENAME = '.complete'   # 目录中已完整写出的文件清单（追加写入，每行一个文件名）
+FSYNC_MODE = 'batch'            # 'none'：不调用 fsync，只防止进程崩溃留下半截文件；
+                                # 'always'：每个文件改名前都 fsync，断电也不丢数据，但最慢；
+                                # 'batch'：文件立即改名可见，每 FSYNC_BATCH_SIZE 个文件集中 fsync 后再记录完成标记
+FSYNC_BATCH_SIZE = 64
+MARKER_COMPACT_SLACK = 1000     # 标记文件中的重复行超过此数量（且超过有效行数）时重写压缩
+LOCK_FILENAME = '.lock'         # 目录锁文件：同一时间只允许一个写入器（一个任务）写入同一目录
+
+# mkstemp 创建的临时文件权限为 0600，改名前按当前 umask 恢复为普通文件的默认权限
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _fsync_dir(directory: str):
+    """fsync 目录本身，使其中的改名操作落盘。Windows 不支持打开目录，直接跳过。"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+@contextmanager
+def atomic_open(path: str, mode: str = 'w', encoding: str = None, fsync: bool = False, buffering: int = -1):
+    """
+    以原子方式写文件：先写入同目录下的临时文件，成功关闭后再改名为目标文件。
+    写入过程中出错或进程崩溃时，目标文件保持原样（不存在或旧内容），不会留下半截文件。
+
+    用法:
+        with atomic_open(path, 'wb') as f:
+            f.write(data)
+    """
+    directory = os.path.dirname(path) or '.'
+    if encoding is None and 'b' not in mode:
+        encoding = 'utf-8'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        os.chmod(tmp_path, 0o666 & ~_UMASK)
+        with os.fdopen(fd, mode, buffering=buffering, encoding=encoding) as f:
+            yield f
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def atomic_write(path: str, data, fsync: bool = False):
+    """以原子方式写出整个文件内容（str 按 UTF-8 写出，bytes 原样写出）。"""
+    with atomic_open(path, 'wb' if isinstance(data, bytes) else 'w', fsync=fsync) as f:
+        f.write(data)
+
+def atomic_copy(src_path: str, dest_path: str, fsync: bool = False):
+    """以原子方式复制文件内容。"""
+    with open(src_path, 'rb') as src, atomic_open(dest_path, 'wb', fsync=fsync) as dest:
+        shutil.copyfileobj(src, dest)
+
+
+class DirectoryLock:
+    """
+    输出目录的排他锁（POSIX 上用 flock，Windows 上用 msvcrt.locking），防止两个任务同时写入同一目录。
+    锁由操作系统随文件描述符释放，持有锁的进程崩溃或被结束后不会留下需要手动清理的锁。
+    """
+
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, LOCK_FILENAME)
+        self.file = None
+
+    def acquire(self):
+        """获取锁；目录已被其他任务锁定时立即抛出 RuntimeError，而不是等待。"""
+        f = open(self.path, 'a+')
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            raise RuntimeError(f"目录 '{os.path.dirname(self.path)}' 正被另一个任务写入，请等待该任务结束后再试。")
+        self.file = f
+
+    def release(self):
+        if self.file is not None:
+            self.file.close()   # 关闭文件即释放锁
+            self.file = None
+
+
+class OutputWriter:
+    """
+    某个输出目录（raw_/processed_）的写入器：每个文件原子写出，并在内容落盘后追加完成标记。
+
+    重启时只需读取完成标记即可判断哪些文件是完整的，而不必依赖 os.path.exists（崩溃留下的半截文件
+    也"存在"）或重新扫描、校验整个目录。文件存在但没有完成标记时，说明它写出后尚未确认落盘，
+    调用方应当重新生成该文件。
+
+    多个线程可以共用同一个写入器。batch 模式下使用完毕后必须调用 close()（或使用 with 语句），
+    否则最后一批文件没有完成标记，下次运行时会被重新处理。
+    写入器在关闭前持有目录锁，同一目录上的第二个写入器（例如另一个并发任务）会创建失败。
+    """
+
+    def __init__(self, directory: str, fsync_mode: str = FSYNC_MODE, batch_size: int = FSYNC_BATCH_SIZE, log_callback=None):
+        if fsync_mode not in ('none', 'always', 'batch'):
+            raise ValueError(f"未知的 fsync 模式: {fsync_mode}")
+        self.directory = directory
+        self.fsync_mode = fsync_mode
+        self.batch_size = max(1, batch_size)
+        self.lock = threading.Lock()
+        self.pending = []       # batch 模式下已改名、等待 fsync 和记录完成标记的文件名
+        os.makedirs(directory, exist_ok=True)
+        self.dir_lock = DirectoryLock(directory)
+        self.dir_lock.acquire()
+        try:
+            self.marker_path = os.path.join(directory, MARKER_FILENAME)
+            if not os.path.exists(self.marker_path):
+                self._bootstrap(log_callback)
+            with open(self.marker_path, 'r', encoding='utf-8') as f:
+                lines = [line.strip() for line in f if line.strip()]
+            self.completed = set(lines)
+            if len(lines) > 2 * len(self.completed) + MARKER_COMPACT_SLACK:
+                # 反复重写同一批文件会让标记文件不断变长，重复行过多时压缩一次
+                atomic_write(self.marker_path, ''.join(name + '\n' for name in sorted(self.completed)), fsync=True)
+            self.marker_file = open(self.marker_path, 'a', encoding='utf-8')
+        except BaseException:
+            self.dir_lock.release()
+            raise
+
+    def _bootstrap(self, log_callback):
+        """
+        首次在已有目录上使用时，为现有的 .md 文件建立完成标记（只执行一次）：
+        能解析出带 topic_id 的YAML头部的文件视为完整，其余文件留待重新生成。
+        """
+        names = []
+        skipped = 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.md'):
+                continue
+            try:
+                if read_front_matter(entry.path).get('topic_id'):
+                    names.append(entry.name)
+                    continue
+            except Exception:
+                pass
+            skipped += 1
+        atomic_write(self.marker_path, ''.join(name + '\n' for name in names), fsync=True)
+        if log_callback and (names or skipped):
+            log_callback(f"  - [完成标记] 为已有的 {len(names)} 个文件建立了完成标记，{skipped} 个文件不完整，将重新生成。")
+
+    def is_complete(self, filename: str) -> bool:
+        """文件有完成标记且仍然存在（用户手动删除的文件需要重新生成）。"""
+        with self.lock:
+            if filename not in self.completed:
+                return False
+        return os.path.exists(os.path.join(self.directory, filename))
+
+    def _mark(self, names: list, fsync: bool):
+        self.marker_file.write(''.join(name + '\n' for name in names))
+        self.marker_file.flush()
+        if fsync:
+            os.fsync(self.marker_file.fileno())
+        self.completed.update(names)
+
+    def _finish(self, filename: str):
+        """文件已原子改名到位后，按 fsync 模式记录完成标记。调用方需持有锁。"""
+        if self.fsync_mode == 'none':
+            self._mark([filename], fsync=False)
+        elif self.fsync_mode == 'always':
+            _fsync_dir(self.directory)
+            self._mark([filename], fsync=True)
+        else:
+            self.completed.discard(filename)
+            self.pending.append(filename)
+            if len(self.pending) >= self.batch_size:
+                self._flush_pending()
+
+    def _flush_pending(self):
+        """batch 模式：集中 fsync 本批文件和目录，然后一次性追加完成标记。调用方需持有锁。"""
+        if not self.pending:
+            return
+        for filename in self.pending:
+            try:
+                # 以读写方式打开（不修改内容），Windows 上 fsync 需要可写的文件描述符
+                fd = os.open(os.path.join(self.directory, filename), os.O_RDWR)
+            except OSError:
+                continue
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        _fsync_dir(self.directory)
+        self._mark(self.pending, fsync=True)
+        self.pending = []
+
+    def write(self, filename: str, data) -> str:
+        """原子写出目录中的一个文件并记录完成标记，返回文件路径。"""
+        path = os.path.join(self.directory, filename)
+        atomic_write(path, data, fsync=self.fsync_mode == 'always')
+        with self.lock:
+            self._finish(filename)
+        return path
+
+    def copy(self, src_path: str, filename: str) -> str:
+        """原子复制一个文件到目录中并记录完成标记，返回文件路径。"""
+        path = os.path.join(self.directory, filename)
+        atomic_copy(src_path, path, fsync=self.fsync_mode == 'always')
+        with self.lock:
+            self._finish(filename)
+        return path
+
+    def flush(self):
+        with self.lock:
+            self._flush_pending()
+
+    def close(self):
+        with self.lock:
+            try:
+                self._flush_pending()
+                self.marker_file.close()
+            finally:
+                self.dir_lock.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,174 @@
+import os
+import json
+import shutil
+import hashlib
+
+try:
+    from .atomic_io import atomic_copy, atomic_open, atomic_write
+except ImportError:  # 作为独立脚本运行时
+    from atomic_io import atomic_copy, atomic_open, atomic_write
+
+# --- 缓存配置 ---
+CACHE_DIR_NAME = '.build_cache'       # 位于web输出目录下的缓存目录
+MANIFEST_NAME = 'manifest.json'       # 记录每个源文件 mtime/size/hash 的清单
+FRAGMENTS_DIR_NAME = 'fragments'      # 每篇帖子正文HTML的缓存目录（元数据保存在清单中）
+RENDER_DIR_NAME = 'render'            # 按 (正文哈希, 渲染后端版本) 缓存的正文HTML目录
+CACHE_VERSION = 2                     # 渲染逻辑或缓存格式变化时递增，使旧缓存整体失效
+PRECOMPRESSED_SUFFIXES = ('.gz', '.br')  # 预压缩副本的后缀；源文件仍存在时同步资源目录不删除这些副本
+
+
+def file_digest(data: bytes) -> str:
+    """计算内容哈希，用于判断文件内容是否真正发生变化。"""
+    return hashlib.sha1(data).hexdigest()
+
+
+class BuildCache:
+    """
+    增量构建缓存：按源文件的 mtime/size 快速判断是否变化，变化时再用内容哈希确认，
+    并为每篇帖子保存渲染好的HTML片段，未变化的帖子无需重新读取和转换。
+    元数据保存在清单中，正文片段只在写出分片时按需读取，构建过程中不必把所有正文留在内存里。
+    """
+
+    def __init__(self, web_output_dir: str, renderer_id: str = ''):
+        self.cache_dir = os.path.join(web_output_dir, CACHE_DIR_NAME)
+        self.fragments_dir = os.path.join(self.cache_dir, FRAGMENTS_DIR_NAME)
+        self.render_dir = os.path.join(self.cache_dir, RENDER_DIR_NAME)
+        self.manifest_path = os.path.join(self.cache_dir, MANIFEST_NAME)
+        self.renderer_id = renderer_id
+        os.makedirs(self.fragments_dir, exist_ok=True)
+        self.entries = {}
+        self.load()
+
+    def load(self):
+        """加载清单；版本或渲染后端不匹配、文件损坏时视为空缓存。"""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') == CACHE_VERSION and manifest.get('renderer', '') == self.renderer_id:
+                self.entries = manifest.get('entries', {})
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def save(self):
+        """原子写出清单，避免中途崩溃留下半截清单。"""
+        with atomic_open(self.manifest_path) as f:
+            json.dump({'version': CACHE_VERSION, 'renderer': self.renderer_id, 'entries': self.entries}, f, ensure_ascii=False, default=str)
+
+    def _fragment_path(self, filename: str) -> str:
+        return os.path.join(self.fragments_dir, filename + '.html')
+
+    def lookup(self, filepath: str, stat: os.stat_result):
+        """
+        查询缓存。mtime/size 都未变化时直接命中；
+        否则读取文件并比较哈希，内容未变（例如仅被touch）时同样命中。
+
+        Returns:
+            tuple: (元数据 或 None, 文件内容哈希 或 None)。命中时正文需通过 load_content() 读取。
+                   未命中时返回的哈希可在渲染完成后传给 store()，避免重复计算。
+        """
+        filename = os.path.basename(filepath)
+        entry = self.entries.get(filename)
+        digest = None
+        if entry and (entry['mtime'], entry['size']) != (stat.st_mtime_ns, stat.st_size):
+            with open(filepath, 'rb') as f:
+                digest = file_digest(f.read())
+            if digest == entry['hash']:
+                entry['mtime'], entry['size'] = stat.st_mtime_ns, stat.st_size
+            else:
+                entry = None
+        if not entry or not os.path.exists(self._fragment_path(filename)):
+            return None, digest
+        return dict(entry['meta']), digest
+
+    def load_content(self, filename: str) -> str:
+        """读取某篇帖子缓存的正文HTML。"""
+        with open(self._fragment_path(filename), 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def store(self, filename: str, stat: os.stat_result, digest: str, post_data: dict, render_key: str = None) -> dict:
+        """
+        保存某篇帖子的渲染结果并更新清单条目。render_key 为其正文在渲染缓存中的键。
+
+        Returns:
+            dict: 不含正文的元数据（经JSON往返，与缓存命中时返回的形式一致，例如日期均为字符串）。
+        """
+        # 原子写出：构建中途崩溃时不会留下截断的片段被后续构建当作有效缓存
+        atomic_write(self._fragment_path(filename), post_data.get('content') or '')
+        meta = json.loads(json.dumps({k: v for k, v in post_data.items() if k != 'content'}, ensure_ascii=False, default=str))
+        self.entries[filename] = {'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'hash': digest, 'render': render_key, 'meta': meta}
+        return dict(meta)
+
+    def live_render_keys(self) -> set:
+        """当前清单中仍被引用的渲染缓存键。"""
+        return {entry.get('render') for entry in self.entries.values()}
+
+    def prune(self, live_filenames: set):
+        """删除源文件已不存在的缓存条目和片段。"""
+        for filename in list(self.entries):
+            if filename not in live_filenames:
+                del self.entries[filename]
+                try:
+                    os.remove(self._fragment_path(filename))
+                except OSError:
+                    pass
+
+
+def _same_file(src_stat: os.stat_result, dest_path: str) -> bool:
+    """目标文件与源文件大小一致且不比源文件旧，或者本身就是同一个硬链接时，视为相同。"""
+    try:
+        dest_stat = os.stat(dest_path)
+    except OSError:
+        return False
+    if (dest_stat.st_dev, dest_stat.st_ino) == (src_stat.st_dev, src_stat.st_ino):
+        return True
+    return dest_stat.st_size == src_stat.st_size and dest_stat.st_mtime_ns >= src_stat.st_mtime_ns
+
+def copy_if_changed(src_path: str, dest_path: str) -> bool:
+    """
+    源文件有变化时才原子复制到目标位置，未变化时保留目标文件（mtime、ETag 和预压缩副本都不受影响）。
+
+    Returns:
+        bool: 是否实际复制了文件。
+    """
+    if _same_file(os.stat(src_path), dest_path):
+        return False
+    atomic_copy(src_path, dest_path)
+    return True
+
+def _is_precompressed_copy(name: str, src_names: set) -> bool:
+    """name 是否为某个源文件的预压缩副本（如 a.json 对应的 a.json.gz）。"""
+    base, suffix = os.path.splitext(name)
+    return suffix in PRECOMPRESSED_SUFFIXES and base in src_names
+
+def sync_asset_dir(src_dir: str, dest_dir: str) -> int:
+    """
+    增量同步一个帖子的资源目录：只处理新增或变化的文件，优先使用硬链接（不占额外空间），
+    跨设备等无法链接的情况下退回到复制；源目录中已删除的文件也会从目标目录移除，
+    但仍存在的源文件的预压缩副本（.gz/.br）会保留。
+
+    Returns:
+        int: 实际链接/复制/删除的文件数量，0 表示目标目录已是最新。
+    """
+    changed = 0
+    os.makedirs(dest_dir, exist_ok=True)
+    src_names = set()
+    for entry in os.scandir(src_dir):
+        if not entry.is_file():
+            continue
+        src_names.add(entry.name)
+        dest_path = os.path.join(dest_dir, entry.name)
+        src_stat = entry.stat()
+        if _same_file(src_stat, dest_path):
+            continue
+        if os.path.lexists(dest_path):
+            os.remove(dest_path)
+        try:
+            os.link(entry.path, dest_path)
+        except OSError:
+            shutil.copy2(entry.path, dest_path)
+        changed += 1
+    for entry in os.scandir(dest_dir):
+        if entry.is_file() and entry.name not in src_names and not _is_precompressed_copy(entry.name, src_names):
+            os.remove(entry.path)
+            changed += 1
+    return changed
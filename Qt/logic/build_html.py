@@ -1,21 +1,79 @@
 import os
-import frontmatter
-import markdown2
-import json
-import shutil
-import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from jinja2 import Environment, FileSystemLoader
 
+try:
+    from .build_cache import BuildCache, copy_if_changed, file_digest, sync_asset_dir
+    from . import front_matter
+    from . import profiling
+    from .markdown_render import get_renderer, render_cached, prune_render_cache
+    from .site_data import write_site_data, write_chunks_if_changed
+    from .metadata_store import open_store
+    from .search_index import SearchIndexBuilder
+    from .facets import write_facets
+    from .aggregates import write_aggregates
+    from .compression import precompress_tree
+    from . import image_variants
+except ImportError:  # 作为独立脚本运行时
+    from build_cache import BuildCache, copy_if_changed, file_digest, sync_asset_dir
+    import front_matter
+    import profiling
+    from markdown_render import get_renderer, render_cached, prune_render_cache
+    from site_data import write_site_data, write_chunks_if_changed
+    from metadata_store import open_store
+    from search_index import SearchIndexBuilder
+    from facets import write_facets
+    from aggregates import write_aggregates
+    from compression import precompress_tree
+    import image_variants
+
 # --- 路径配置 (将被动态化) ---
 LOGIC_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(LOGIC_DIR)
 TEMPLATE_DIR = LOGIC_DIR
 TEMPLATE_NAME = 'template.html'
 
+# --- 构建配置 ---
+RENDER_WORKERS = None        # Markdown转换进程数，None表示使用CPU核数
+MIN_POSTS_FOR_POOL = 16      # 需要重新渲染的帖子少于此数时直接在当前进程渲染，省去进程池启动开销
+MARKDOWN_BACKEND = 'auto'    # Markdown渲染后端：'auto'、'cmark'、'markdown-it' 或 'markdown2'，见 markdown_render.py
+COLLAPSE_DUPLICATES = False  # 折叠AI处理阶段标记为近似重复(duplicate_of)的帖子，只显示代表帖
+
+
+def render_post_file(filepath: str, backend: str = MARKDOWN_BACKEND, render_cache_dir: str = None):
+    """
+    读取并渲染单个处理过的Markdown文件（在子进程中执行）。
+    正文中指向图片/附件的相对路径在渲染过程中被改写为 <topic_id>/<文件名>：
+        ![...](image.png) => <img src="<topic_id>/image.png">
+        [...](file.zip)   => <a href="<topic_id>/file.zip">
+    绝对URL (http/https/mailto 等) 保持不变。
+
+    Returns:
+        tuple: (post_data, 文件内容哈希, 渲染缓存键)。post_data 为元数据加上 'content' 字段的HTML。
+               文件缺少 topic_id 时 post_data 为 None。
+    """
+    with open(filepath, 'rb') as f:
+        raw = f.read()
+    post = front_matter.loads(raw.decode('utf-8'))
+    topic_id = post.metadata.get('topic_id')
+    if not topic_id:
+        return None, file_digest(raw), None
+
+    renderer = get_renderer(backend)
+    post_data = post.metadata
+    if render_cache_dir:
+        # 仅元数据变化（例如AI处理后补充了标签/摘要）时，正文直接命中渲染缓存
+        post_data['content'], key = render_cached(renderer, post.content, topic_id, render_cache_dir)
+    else:
+        post_data['content'], key = renderer.render(post.content, topic_id), None
+    return post_data, file_digest(raw), key
+
+@profiling.profiled('build')
 def run_html_generation(source_folder_name: str, log_callback=print):
     """
     读取指定目录中的所有处理过的Markdown文件，并使用模板生成最终的静态网站。
     source_folder_name: 例如 'processed_md' 或 'processed_md_digests'
+    传入 profile=True 时开启性能分析，结束时写出报告（见 profiling.py）。
     """
     log_callback(f"开始为数据集 '{source_folder_name}' 构建Web可视化页面...")
 
@@ -38,93 +96,197 @@ def run_html_generation(source_folder_name: str, log_callback=print):
         os.makedirs(web_output_dir)
         log_callback(f"创建输出目录: {web_output_dir}")
 
-    # 2. 加载所有处理过的帖子数据
+    # 2. 加载所有处理过的帖子数据（内存中只保留元数据，正文留在片段缓存中，写出时逐篇读取）
     all_posts = []
     all_tags = set()
     all_topics = set()
     log_callback(f"正在从 '{processed_md_dir}' 加载数据...")
 
-    filenames = sorted(os.listdir(processed_md_dir), reverse=True)
+    filenames = sorted((f for f in os.listdir(processed_md_dir) if f.endswith('.md')), reverse=True)
     if not filenames:
         log_callback("警告：已处理目录中没有找到任何 .md 文件。")
         return
-        
+
+    # --- 增量构建：未变化的帖子直接使用缓存的HTML片段 ---
+    try:
+        renderer = get_renderer(MARKDOWN_BACKEND)
+    except ValueError as e:
+        log_callback(f"  - [警告] {e}，改用 markdown2 渲染。")
+        renderer = get_renderer('markdown2')
+    log_callback(f"  - [渲染] 使用 Markdown 渲染后端: {renderer.name}")
+    profiling.begin_phase('cache_lookup')
+    cache = BuildCache(web_output_dir, renderer.renderer_id)
+    meta_by_name = {}
+    to_render = {}
     for filename in filenames:
-        if filename.endswith('.md'):
-            filepath = os.path.join(processed_md_dir, filename)
-            try:
-                post = frontmatter.load(filepath)
-                
-                # --- 核心修改：处理内容中的相对路径并复制资源 ---
-                topic_id = post.metadata.get('topic_id')
-                if not topic_id:
-                    log_callback(f"  - [警告] 文件 {filename} 缺少 'topic_id' 元数据，无法处理其附件。")
-                    continue
-                
-                # 1. 修正内容中的相对路径
-                #    将 ![...](image.png) => ![...](<topic_id>/image.png)
-                #    将 [...](file.zip)   => [...](<topic_id>/file.zip)
-                #    使用一个相对复杂的正则表达式来确保只替换Markdown链接，而不是普通文本
-                #    --- 核心修复：更新正则表达式，使其忽略绝对URL (http/https/mailto) ---
-                content_with_paths = re.sub(r'(!?\[.*?\]\()((?!https?://|mailto:)[^)]+)(\))', rf'\g<1>{topic_id}/\g<2>\g<3>', post.content)
-                html_content = markdown2.markdown(content_with_paths, extras=["cuddled-lists", "tables", "fenced-code-blocks", "break-on-newline"])
-
-                post_data = post.metadata
-                post_data['content'] = html_content
-                
-                # 2. 复制与该帖子关联的整个资源文件夹（如果存在）
-                #    源: ../output/raw_xxx/123456789/  <--- 已修正为从raw目录查找
-                #    目标: ../output/web_xxx/123456789/
-                topic_assets_dir = os.path.join(raw_md_dir, str(topic_id))
-                if os.path.exists(topic_assets_dir) and os.path.isdir(topic_assets_dir):
-                    dest_assets_dir = os.path.join(web_output_dir, str(topic_id))
-                    # shutil.copytree 在目标目录存在时会报错，所以先删除
-                    if os.path.exists(dest_assets_dir):
-                        shutil.rmtree(dest_assets_dir)
-                    shutil.copytree(topic_assets_dir, dest_assets_dir)
-                    log_callback(f"  - [资源] 已复制帖子 '{topic_id}' 的附件目录。")
-
-                if 'tags' in post_data and post_data['tags']:
-                    all_tags.update(post_data['tags'])
-                
-                if 'topic' in post_data and post_data['topic']:
-                    all_topics.add(post_data['topic'])
-
-                all_posts.append(post_data)
+        filepath = os.path.join(processed_md_dir, filename)
+        try:
+            stat = os.stat(filepath)
+            cached, _ = cache.lookup(filepath, stat)
+        except OSError as e:
+            log_callback(f"  - [警告] 读取文件 {filename} 失败: {e}")
+            continue
+        if cached is not None:
+            meta_by_name[filename] = cached
+        else:
+            to_render[filename] = stat
+    log_callback(f"  - [缓存] {len(meta_by_name)} 篇帖子未变化，{len(to_render)} 篇需要重新渲染。")
 
+    def collect(filename, post_data, digest, render_key):
+        if post_data is None:
+            log_callback(f"  - [警告] 文件 {filename} 缺少 'topic_id' 元数据，无法处理其附件。")
+            return
+        # 正文写入片段缓存后即被释放，只保留元数据
+        meta_by_name[filename] = cache.store(filename, to_render[filename], digest, post_data, render_key)
+
+    # --- 并行渲染：Markdown转换是CPU密集型任务，放到进程池中执行 ---
+    profiling.begin_phase('markdown_render')
+    if len(to_render) >= MIN_POSTS_FOR_POOL:
+        with ProcessPoolExecutor(max_workers=RENDER_WORKERS) as executor:
+            future_to_name = {executor.submit(render_post_file, os.path.join(processed_md_dir, name), renderer.name, cache.render_dir): name for name in to_render}
+            for future in as_completed(future_to_name):
+                filename = future_to_name.pop(future)   # 释放对结果的引用，已处理的正文不再驻留内存
+                try:
+                    collect(filename, *future.result())
+                except Exception as e:
+                    log_callback(f"  - [警告] 读取或处理文件 {filename} 失败: {e}")
+    else:
+        for filename in to_render:
+            try:
+                collect(filename, *render_post_file(os.path.join(processed_md_dir, filename), renderer.name, cache.render_dir))
             except Exception as e:
                 log_callback(f"  - [警告] 读取或处理文件 {filename} 失败: {e}")
 
+    cache.prune(set(filenames))
+    cache.save()
+    prune_render_cache(cache.render_dir, cache.live_render_keys())
+
+    # --- 帖子顺序：由列式元数据表按发布时间从新到旧排序（向量化排序，无需解析各文件） ---
+    profiling.begin_phase('metadata_sync')
+    meta_store = open_store(processed_md_dir, log_callback)
+    ordered_filenames = [f for f in meta_store.order_by(['create_time']) if f in meta_by_name]
+    ordered_filenames += sorted(set(meta_by_name) - set(ordered_filenames), reverse=True)
+
+    # --- 折叠近似重复的帖子：只保留代表帖，并在代表帖上记录被折叠的数量 ---
+    duplicate_counts = {}
+    if COLLAPSE_DUPLICATES:
+        present_ids = {str(meta['topic_id']) for meta in meta_by_name.values()}
+        collapsed = set()
+        for filename, meta in meta_by_name.items():
+            representative = str(meta.get('duplicate_of') or '')
+            if representative in present_ids and representative != str(meta['topic_id']):
+                collapsed.add(filename)
+                duplicate_counts[representative] = duplicate_counts.get(representative, 0) + 1
+        ordered_filenames = [f for f in ordered_filenames if f not in collapsed]
+        log_callback(f"  - [去重] 折叠了 {len(collapsed)} 篇近似重复的帖子。")
+
+    # --- 汇总数据并增量同步资源目录 ---
+    profiling.begin_phase('asset_sync')
+    synced_dirs = 0
+    content_files = {}
+    for filename in ordered_filenames:
+        post_data = meta_by_name.get(filename)
+        if post_data is None:
+            continue
+        content_files[str(post_data['topic_id'])] = filename
+        if duplicate_counts.get(str(post_data['topic_id'])):
+            post_data['duplicates'] = duplicate_counts[str(post_data['topic_id'])]
+        # 同步与该帖子关联的资源文件夹（如果存在），只处理有变化的文件
+        #    源: ../output/raw_xxx/123456789/  <--- 附件总是位于raw目录
+        #    目标: ../output/web_xxx/123456789/
+        topic_id = post_data['topic_id']
+        topic_assets_dir = os.path.join(raw_md_dir, str(topic_id))
+        if os.path.isdir(topic_assets_dir):
+            try:
+                if sync_asset_dir(topic_assets_dir, os.path.join(web_output_dir, str(topic_id))):
+                    synced_dirs += 1
+            except OSError as e:
+                log_callback(f"  - [警告] 同步帖子 '{topic_id}' 的附件目录失败: {e}")
+
+        if post_data.get('tags'):
+            all_tags.update(post_data['tags'])
+
+        if post_data.get('topic'):
+            all_topics.add(post_data['topic'])
+
+        all_posts.append(post_data)
+    log_callback(f"  - [资源] 同步了 {synced_dirs} 个有变化的附件目录。")
+
     log_callback(f"  - [成功] 加载了 {len(all_posts)} 篇帖子。")
     log_callback(f"  - [成功] 发现了 {len(all_tags)} 个唯一标签。")
     log_callback(f"  - [成功] 发现了 {len(all_topics)} 个唯一主题。")
 
-    # 3. 设置并加载Jinja2模板
+    def read_content(post_data) -> str:
+        try:
+            return cache.load_content(content_files[str(post_data['topic_id'])])
+        except OSError as e:
+            log_callback(f"  - [警告] 读取帖子 '{post_data['topic_id']}' 的正文缓存失败: {e}")
+            return ''
+
+    # --- 图片优化：为正文中的本地图片生成缩略图和响应式尺寸，并改写为懒加载的 srcset 图片 ---
+    profiling.begin_phase('image_optimize')
+    optimizer = None
+    if image_variants.is_available():
+        optimizer = image_variants.ImageOptimizer(web_output_dir, raw_md_dir)
+        optimizer.prepare((read_content(post_data) for post_data in all_posts), log_callback)
+    else:
+        log_callback("  - [图片] 未安装 Pillow，跳过图片优化，页面将直接使用原图。")
+
+    # 3. 生成元数据索引和正文分片，页面只加载索引，正文由前端按页懒加载
+    #    正文按索引顺序逐篇读取，顺带加入全文检索索引（文档编号与元数据索引中的下标一致），
+    #    写完一个分片即释放，峰值内存与帖子总数无关
+    search_builder = SearchIndexBuilder()
+
+    def iter_contents():
+        for doc_id, post_data in enumerate(all_posts):
+            content_html = read_content(post_data)
+            if optimizer:
+                content_html = optimizer.rewrite(content_html)
+            search_builder.add(doc_id, post_data, content_html)
+            yield content_html
+
+    profiling.begin_phase('site_data')
+    site_stats = write_site_data(all_posts, web_output_dir, log_callback, contents=iter_contents())
+    profiling.begin_phase('facets')
+    facet_stats = write_facets(all_posts, web_output_dir, log_callback)
+    profiling.begin_phase('aggregates')
+    aggregate_stats = write_aggregates(all_posts, web_output_dir, log_callback)
+
+    # 4. 写出全文检索索引
+    profiling.begin_phase('search_index')
+    search_stats = search_builder.write(web_output_dir, log_callback)
+
+    # 5. 设置并加载Jinja2模板（generate() 是惰性的，模板渲染的耗时大部分发生在写出文件时）
+    profiling.begin_phase('template_render')
     env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
     template = env.get_template(TEMPLATE_NAME)
 
-    # 4. 渲染模板
-    posts_json = json.dumps(all_posts, ensure_ascii=False)
-    
-    output_html = template.render(
-        posts=all_posts, 
-        posts_json=posts_json,
+    # 6. 渲染模板：generate() 逐块产出HTML，直接流式写入文件，不在内存中拼接完整页面
+    output_stream = template.generate(
+        post_count=site_stats['post_count'],
+        index_url=site_stats['index_path'],
+        content_url=site_stats['content_path'],
+        facets_url=facet_stats['facets_path'],
+        aggregates_url=aggregate_stats['aggregates_path'],
+        search_url=search_stats['search_path'],
+        search_shards=search_stats['search_shards'],
         all_tags=sorted(list(all_tags)),
         all_topics=sorted(list(all_topics)),
         default_theme='light'
     )
 
-    # 5. 保存最终的HTML文件
+    # 7. 保存最终的HTML文件（内容未变化时保留原文件）
     output_filepath = os.path.join(web_output_dir, 'index.html')
     try:
-        with open(output_filepath, 'w', encoding='utf-8') as f:
-            f.write(output_html)
-        log_callback(f"\n[成功] 网站已生成！请在浏览器中打开: {os.path.abspath(output_filepath)}")
+        write_chunks_if_changed(output_filepath, output_stream)
+        log_callback(f"\n[成功] 网站已生成: {os.path.abspath(output_filepath)}")
+        log_callback("  - [提示] 帖子数据由页面按需加载，请使用\"在浏览器中预览\"通过本地服务器访问。")
     except Exception as e:
         log_callback(f"\n[失败] 保存HTML文件失败: {e}")
         return
 
     # --- 核心修复：复制CSS和JS资源文件 ---
+    profiling.begin_phase('asset_copy')
     log_callback("正在复制必要的样式(style.css)和脚本(app.js)文件...")
     assets_to_copy = ['style.css', 'app.js']
     for asset in assets_to_copy:
@@ -132,14 +294,27 @@ def run_html_generation(source_folder_name: str, log_callback=print):
         dest_path = os.path.join(web_output_dir, asset)
         if os.path.exists(source_path):
             try:
-                shutil.copy(source_path, dest_path)
-                log_callback(f"  - [成功] 已复制 {asset}")
+                if copy_if_changed(source_path, dest_path):
+                    log_callback(f"  - [成功] 已复制 {asset}")
+                else:
+                    log_callback(f"  - [跳过] {asset} 未变化")
             except Exception as e:
                 log_callback(f"  - [失败] 复制 {asset} 失败: {e}")
         else:
             log_callback(f"  - [警告] 未在模板目录 {TEMPLATE_DIR} 中找到资源文件: {asset}，请确保它存在。")
 
+    # --- 为页面、索引和分片生成预压缩版本，供预览服务器直接返回 ---
+    profiling.begin_phase('precompress')
+    try:
+        precompress_tree(web_output_dir, log_callback)
+    except Exception as e:
+        log_callback(f"  - [警告] 生成预压缩文件失败: {e}")
+
 
 if __name__ == '__main__':
-    # 当独立运行时，提供一个默认的文件夹名进行测试
-    run_html_generation('processed_md', log_callback=print)
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description='由处理过的Markdown文件生成静态网站。')
+    parser.add_argument('source_folder', nargs='?', default='processed_md', help="output 下的数据目录名，默认 processed_md")
+    parser.add_argument('--profile', action='store_true', help="开启性能分析，报告写入 output/profiles")
+    args = parser.parse_args()
+    run_html_generation(args.source_folder, log_callback=print, profile=args.profile)
\ No newline at end of file
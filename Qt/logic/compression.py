@@ -0,0 +1,107 @@
+import os
+import gzip
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from .atomic_io import atomic_write
+except ImportError:  # 作为独立脚本运行时
+    from atomic_io import atomic_write
+
+try:
+    import brotli  # 可选依赖：安装后额外生成 .br 文件
+except ImportError:
+    brotli = None
+
+# --- 预压缩配置 ---
+COMPRESSIBLE_SUFFIXES = ('.html', '.json', '.js', '.css', '.svg', '.txt', '.md')
+MIN_COMPRESS_SIZE = 1024        # 小于此大小的文件压缩收益不大，直接跳过
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9
+SKIP_DIR_NAMES = {'.build_cache'}
+# 只压缩构建生成的文件；帖子附件目录由 build_cache.sync_asset_dir 与 raw_md 保持一致，不能在其中添加或删除文件
+GENERATED_PATHS = ['index.html', 'style.css', 'app.js', 'data']
+MANIFEST_NAME = '.precompressed.json'   # 本模块生成过的压缩文件清单（相对路径），清理孤立文件时只删除清单中的文件
+# 编码名 -> 预压缩文件后缀，按优先级排列（预览服务器优先返回 br）
+ENCODING_SUFFIXES = [('br', '.br'), ('gzip', '.gz')] if brotli else [('gzip', '.gz')]
+
+
+def _is_fresh(source_path: str, compressed_path: str) -> bool:
+    """压缩文件存在且不比源文件旧时无需重新生成。"""
+    try:
+        return os.path.getmtime(compressed_path) >= os.path.getmtime(source_path)
+    except OSError:
+        return False
+
+def precompress_file(path: str) -> int:
+    """
+    为单个文件生成 .gz（以及安装了 brotli 时的 .br）预压缩版本，已是最新的跳过。
+
+    Returns:
+        int: 新生成的压缩文件数量。
+    """
+    created = 0
+    data = None
+    for encoding, suffix in ENCODING_SUFFIXES:
+        compressed_path = path + suffix
+        if _is_fresh(path, compressed_path):
+            continue
+        if data is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+        if encoding == 'br':
+            payload = brotli.compress(data, quality=BROTLI_QUALITY)
+        else:
+            payload = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+        atomic_write(compressed_path, payload)
+        created += 1
+    return created
+
+def _load_manifest(root_dir: str) -> set:
+    try:
+        with open(os.path.join(root_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            return set(json.load(f))
+    except (OSError, ValueError):
+        return set()
+
+def _generated_files(root_dir: str):
+    """遍历 GENERATED_PATHS 中构建生成的文件（不含压缩文件本身）。"""
+    for name in GENERATED_PATHS:
+        path = os.path.join(root_dir, name)
+        if os.path.isfile(path):
+            yield path
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIR_NAMES]
+            for filename in filenames:
+                if not filename.endswith(('.gz', '.br')):
+                    yield os.path.join(dirpath, filename)
+
+def precompress_tree(root_dir: str, log_callback=print, max_workers: int = 4) -> int:
+    """
+    为web输出目录中构建生成的文本类文件（GENERATED_PATHS）生成预压缩版本，
+    并删除以前生成过、但源文件已不存在的孤立压缩文件。帖子附件目录中的文件不做处理。
+    zlib/brotli 压缩时会释放GIL，因此使用线程池并行压缩。
+
+    Returns:
+        int: 新生成的压缩文件数量。
+    """
+    targets = [path for path in _generated_files(root_dir)
+               if path.endswith(COMPRESSIBLE_SUFFIXES) and os.path.getsize(path) >= MIN_COMPRESS_SIZE]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        created = sum(executor.map(precompress_file, targets))
+
+    compressed = {os.path.relpath(path + suffix, root_dir).replace(os.sep, '/') for path in targets for _, suffix in ENCODING_SUFFIXES}
+    previous = _load_manifest(root_dir)
+    for relpath in previous - compressed:
+        try:
+            os.remove(os.path.join(root_dir, relpath))
+        except OSError:
+            pass
+    if compressed != previous:
+        atomic_write(os.path.join(root_dir, MANIFEST_NAME), json.dumps(sorted(compressed), ensure_ascii=False))
+    encodings = '/'.join(encoding for encoding, _ in ENCODING_SUFFIXES)
+    log_callback(f"  - [压缩] 检查了 {len(targets)} 个文本文件，新生成 {created} 个预压缩文件({encodings})，"
+                 f"删除 {len(previous - compressed)} 个过期的预压缩文件。")
+    return created
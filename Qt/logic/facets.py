@@ -0,0 +1,132 @@
+import os
+import time
+import random
+
+try:
+    from .site_data import DATA_DIR_NAME, dump_compact, write_if_changed
+except ImportError:  # 作为独立脚本运行时
+    from site_data import DATA_DIR_NAME, dump_compact, write_if_changed
+
+# --- 分面筛选配置 ---
+FACETS_FILENAME = 'facets.json'   # data目录下的分面倒排表文件
+
+
+def delta_encode(doc_ids: list) -> list:
+    """将升序的文档编号列表编码为差值列表，显著减小JSON体积。"""
+    encoded = []
+    previous = 0
+    for doc_id in doc_ids:
+        encoded.append(doc_id - previous)
+        previous = doc_id
+    return encoded
+
+def delta_decode(gaps: list) -> list:
+    """delta_encode 的逆过程。"""
+    doc_ids = []
+    current = 0
+    for gap in gaps:
+        current += gap
+        doc_ids.append(current)
+    return doc_ids
+
+def build_facets(posts: list) -> dict:
+    """
+    为主题、标签、精华三个维度预先计算倒排表：{维度: {取值: [文档编号, ...]}}。
+
+    文档编号即帖子在元数据索引中的下标，索引已按发布时间从新到旧排序，
+    因此每个倒排表天然就是"最新发布"顺序，反向遍历即为"最早发布"顺序，前端无需再排序。
+    """
+    facets = {'topic': {}, 'tag': {}, 'digested': {'true': []}}
+    for doc_id, post in enumerate(posts):
+        if post.get('topic'):
+            facets['topic'].setdefault(str(post['topic']), []).append(doc_id)
+        for tag in set(post.get('tags') or []):
+            facets['tag'].setdefault(str(tag), []).append(doc_id)
+        if post.get('digested'):
+            facets['digested']['true'].append(doc_id)
+    return facets
+
+def write_facets(posts: list, web_output_dir: str, log_callback=print) -> dict:
+    """
+    生成并写出 data/facets.json，倒排表以差值编码存储。
+
+    Returns:
+        dict: 包含 'facets_path'（相对web目录）。
+    """
+    facets = build_facets(posts)
+    encoded = {kind: {key: delta_encode(ids) for key, ids in values.items()} for kind, values in facets.items()}
+    write_if_changed(os.path.join(web_output_dir, DATA_DIR_NAME, FACETS_FILENAME), dump_compact(encoded))
+    log_callback(f"  - [筛选] 已生成 {len(facets['topic'])} 个主题、{len(facets['tag'])} 个标签的倒排表。")
+    return {'facets_path': f'{DATA_DIR_NAME}/{FACETS_FILENAME}'}
+
+def select_doc_ids(facets: dict, doc_count: int, selections: list) -> list:
+    """
+    与前端 app.js 中 selectDocIds 相同的筛选算法（Python版，供基准测试使用）：
+    从最短的倒排表出发，用其余维度的位图判断成员关系，结果保持文档编号升序。
+
+    Args:
+        facets (dict): build_facets 的返回值。
+        doc_count (int): 文档总数。
+        selections (list): [(维度, 取值), ...]，为空表示不筛选。
+    """
+    if not selections:
+        return list(range(doc_count))
+    postings = sorted((facets[kind].get(key, []) for kind, key in selections), key=len)
+    bitsets = []
+    for ids in postings[1:]:
+        bitset = bytearray(doc_count)
+        for doc_id in ids:
+            bitset[doc_id] = 1
+        bitsets.append(bitset)
+    return [doc_id for doc_id in postings[0] if all(bitset[doc_id] for bitset in bitsets)]
+
+def benchmark(num_posts: int = 100000, page_size: int = 20, rounds: int = 20, log_callback=print):
+    """
+    不依赖浏览器的基准测试：用合成数据比较旧的"全量过滤+按日期排序"与"倒排表求交+切片"两种方式。
+    """
+    rng = random.Random(42)
+    topics = [f'主题{i}' for i in range(14)]
+    tags = [f'标签{i}' for i in range(300)]
+    posts = [
+        {
+            'topic': rng.choice(topics),
+            'tags': rng.sample(tags, 4),
+            'digested': rng.random() < 0.05,
+            'create_time': f'20{rng.randint(18, 25)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 10:00:00.000',
+        }
+        for _ in range(num_posts)
+    ]
+    posts.sort(key=lambda p: p['create_time'], reverse=True)
+
+    started = time.perf_counter()
+    facets = build_facets(posts)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    queries = [[('topic', rng.choice(topics)), ('tag', rng.choice(tags))] for _ in range(rounds // 2)]
+    queries += [[('tag', rng.choice(tags)), ('digested', 'true')] for _ in range(rounds - len(queries))]
+
+    started = time.perf_counter()
+    for query in queries:
+        wanted = dict(query)
+        matched = [p for p in posts
+                   if ('topic' not in wanted or p['topic'] == wanted['topic'])
+                   and ('tag' not in wanted or wanted['tag'] in p['tags'])
+                   and ('digested' not in wanted or p['digested'])]
+        matched.sort(key=lambda p: p['create_time'], reverse=True)
+        matched[:page_size]
+    naive_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+    started = time.perf_counter()
+    for query in queries:
+        select_doc_ids(facets, len(posts), query)[:page_size]
+    facet_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+    log_callback(f"帖子数: {num_posts}，构建倒排表耗时: {build_ms:.1f} 毫秒")
+    log_callback(f"全量过滤+排序: 平均每次 {naive_ms:.2f} 毫秒")
+    log_callback(f"倒排表求交+切片: 平均每次 {facet_ms:.2f} 毫秒")
+    return {'build_ms': build_ms, 'naive_ms': naive_ms, 'facet_ms': facet_ms}
+
+
+if __name__ == '__main__':
+    # 独立运行时执行基准测试
+    benchmark()
@@ -0,0 +1,132 @@
+import os
+import time
+import random
+import shutil
+import argparse
+import tempfile
+
+import yaml
+import frontmatter
+from frontmatter.default_handlers import YAMLHandler
+
+try:
+    YamlLoader = yaml.CSafeLoader
+    YamlDumper = yaml.CSafeDumper
+except AttributeError:  # PyYAML 未编译 libyaml 时退回纯 Python 实现
+    YamlLoader = yaml.SafeLoader
+    YamlDumper = yaml.SafeDumper
+
+
+class FastYAMLHandler(YAMLHandler):
+    """
+    python-frontmatter 的 YAML 处理器，固定使用 libyaml 实现的 CSafeLoader/CSafeDumper（不可用时退回纯 Python）。
+    python-frontmatter 的旧版本默认使用纯 Python 的 SafeLoader/SafeDumper，比 libyaml 慢数倍，
+    统一经过本模块读写可以不依赖所安装的版本。
+    """
+
+    def load(self, fm: str, **kwargs):
+        kwargs.setdefault('Loader', YamlLoader)
+        return super().load(fm, **kwargs)
+
+    def export(self, metadata: dict, **kwargs) -> str:
+        kwargs.setdefault('Dumper', YamlDumper)
+        return super().export(metadata, **kwargs)
+
+
+HANDLER = FastYAMLHandler()
+
+
+def is_accelerated() -> bool:
+    return YamlLoader is not yaml.SafeLoader
+
+def loads(text: str) -> frontmatter.Post:
+    """解析带YAML头部的Markdown文本，返回 frontmatter.Post（与 frontmatter.loads 相同）。"""
+    return frontmatter.loads(text, handler=HANDLER)
+
+def load(filepath: str) -> frontmatter.Post:
+    """读取并解析带YAML头部的Markdown文件，返回 frontmatter.Post（与 frontmatter.load 相同）。"""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return loads(f.read())
+
+def dumps(post: frontmatter.Post, **kwargs) -> str:
+    """将 frontmatter.Post 序列化为文本，参数与 frontmatter.dumps 相同（例如 allow_unicode、sort_keys、width）。"""
+    return frontmatter.dumps(post, handler=HANDLER, **kwargs)
+
+def read_front_matter(filepath: str) -> dict:
+    """只读取并解析文件开头的YAML头部，读到结束分隔线即停止，不读取正文。没有头部时返回空字典。"""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        if not HANDLER.FM_BOUNDARY.match(f.readline()):
+            return {}
+        lines = []
+        for line in f:
+            if HANDLER.FM_BOUNDARY.match(line):
+                break
+            lines.append(line)
+    metadata = yaml.load(''.join(lines), Loader=YamlLoader)
+    return metadata if isinstance(metadata, dict) else {}
+
+def benchmark(num_files: int = 50000, log_callback=print):
+    """
+    在临时目录中生成 num_files 个与爬虫输出格式相同的帖子文件，比较以下读写方式的耗时：
+    纯 Python YAML、所安装的 python-frontmatter 的默认设置、本模块（libyaml）以及只读YAML头部。
+    """
+    class PureYAMLHandler(YAMLHandler):
+        def load(self, fm, **kwargs):
+            return super().load(fm, Loader=yaml.SafeLoader, **kwargs)
+
+        def export(self, metadata, **kwargs):
+            return super().export(metadata, Dumper=yaml.SafeDumper, **kwargs)
+
+    pure_handler = PureYAMLHandler()
+    def pure_load(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return frontmatter.loads(f.read(), handler=pure_handler)
+
+    rng = random.Random(0)
+    vocabulary = [chr(c) for c in range(0x4e00, 0x4e00 + 3000)]
+    tmp_dir = tempfile.mkdtemp(prefix='front_matter_bench_')
+    try:
+        posts = []
+        for i in range(num_files):
+            post = frontmatter.Post(''.join(rng.choices(vocabulary, k=rng.randint(200, 2000))))
+            post.metadata = {
+                'topic_id': str(10 ** 14 + i), 'author': rng.choice(['张三', '李四', '王五']),
+                'create_time': f'2023-{i % 12 + 1:02d}-{i % 28 + 1:02d} 10:00:00.000', 'digested': i % 7 == 0,
+                'image_urls': [f'https://images.zsxq.com/{i}.jpg'], 'file_paths': [], 'likes': rng.randint(0, 50),
+                'comments_count': rng.randint(0, 5), 'tags': rng.sample(['AI', '算法', '后端', '投资理财'], 2),
+                'digest': ''.join(rng.choices(vocabulary, k=40)), 'topic': '技术分享',
+            }
+            posts.append(post)
+        paths = [os.path.join(tmp_dir, f'{i}.md') for i in range(num_files)]
+
+        def timed(label, func):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            log_callback(f"  {label:<28} {elapsed:7.2f} 秒  ({elapsed / num_files * 1e6:6.0f} 微秒/篇)")
+            return elapsed
+
+        log_callback(f"{num_files} 个帖子文件（libyaml 加速: {'是' if is_accelerated() else '否'}）:")
+        dump_kwargs = {'allow_unicode': True, 'sort_keys': False, 'width': 10000}
+        pure_dump = timed('序列化 纯 Python YAML', lambda: [frontmatter.dumps(post, handler=pure_handler, **dump_kwargs) for post in posts])
+        timed('序列化 frontmatter.dumps', lambda: [frontmatter.dumps(post, **dump_kwargs) for post in posts])
+        fast_dump = timed('序列化 front_matter.dumps', lambda: [dumps(post, **dump_kwargs) for post in posts])
+        for post, path in zip(posts, paths):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(dumps(post, **dump_kwargs))
+        del posts
+        baseline = timed('读取 纯 Python YAML', lambda: [pure_load(path) for path in paths])
+        timed('读取 frontmatter.load', lambda: [frontmatter.load(path) for path in paths])
+        fast = timed('读取 front_matter.load', lambda: [load(path) for path in paths])
+        header = timed('只读头部 read_front_matter', lambda: [read_front_matter(path) for path in paths])
+        log_callback(f"  相对纯 Python YAML：序列化加速 {pure_dump / fast_dump:.1f} 倍，完整读取加速 {baseline / fast:.1f} 倍，"
+                     f"只读头部加速 {baseline / header:.1f} 倍。")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='YAML头部读写的基准测试。')
+    parser.add_argument('--benchmark', type=int, default=50000, metavar='N', help='生成的帖子文件数（默认 50000）')
+    args = parser.parse_args()
+    benchmark(args.benchmark)
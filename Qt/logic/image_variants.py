@@ -0,0 +1,187 @@
+import os
+import re
+import json
+import html
+import hashlib
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    from .atomic_io import atomic_open
+except ImportError:  # 作为独立脚本运行时
+    from atomic_io import atomic_open
+
+try:
+    from PIL import Image, ImageOps  # 可选依赖：未安装 Pillow 时跳过图片优化，页面直接使用原图
+except ImportError:
+    Image = None
+
+# --- 图片优化配置 ---
+IMAGE_DIR_NAME = '_img'                  # web输出目录下存放缩略图/响应式图片的目录
+MANIFEST_NAME = 'manifest.json'
+VARIANT_WIDTHS = [320, 640, 1280]        # 生成的响应式宽度(px)，不超过原图宽度
+IMAGE_FORMAT = 'webp'                    # 'webp' 或 'jpeg'
+IMAGE_QUALITY = 80
+IMAGE_SIZES = '(max-width: 1200px) 100vw, 1200px'
+SOURCE_SUFFIXES = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')  # GIF 可能是动图，保持原样
+MIN_IMAGES_FOR_POOL = 4                  # 需要生成的图片少于此数时直接在当前进程处理
+VARIANTS_VERSION = 1                     # 变更尺寸/格式/质量时递增，使旧的清单条目失效
+
+IMG_TAG_RE = re.compile(r'<img\b[^>]*>', re.IGNORECASE)
+SRC_ATTR_RE = re.compile(r'\bsrc="([^"]+)"')
+
+
+def is_available() -> bool:
+    return Image is not None
+
+def hash_file(path: str) -> str:
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+def generate_variants(source_path: str, digest: str, image_dir: str) -> dict:
+    """
+    为一张原图生成各个宽度的响应式版本（在子进程中执行）。文件名以源文件哈希为键，已存在的直接复用。
+
+    Returns:
+        dict: {'width': 原图宽, 'height': 原图高, 'variants': [[宽度, 相对 _img 的路径], ...]}
+    """
+    suffix = '.webp' if IMAGE_FORMAT == 'webp' else '.jpg'
+    subdir = digest[:2]
+    os.makedirs(os.path.join(image_dir, subdir), exist_ok=True)
+    with Image.open(source_path) as opened:
+        image = ImageOps.exif_transpose(opened)
+        width, height = image.size
+        has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+        mode = 'RGBA' if has_alpha and IMAGE_FORMAT == 'webp' else 'RGB'
+        if image.mode != mode:
+            image = image.convert(mode)
+        targets = sorted({w for w in VARIANT_WIDTHS if w < width} | {min(width, VARIANT_WIDTHS[-1])})
+        variants = []
+        for target in targets:
+            relpath = f'{subdir}/{digest}-{target}{suffix}'
+            out_path = os.path.join(image_dir, relpath)
+            if not os.path.exists(out_path):
+                resized = image if target == width else image.resize((target, max(1, round(height * target / width))), Image.LANCZOS)
+                with atomic_open(out_path, 'wb') as f:
+                    resized.save(f, format=IMAGE_FORMAT.upper(), quality=IMAGE_QUALITY)
+            variants.append([target, relpath])
+    return {'width': width, 'height': height, 'variants': variants}
+
+
+class ImageOptimizer:
+    """
+    构建阶段的图片优化：收集帖子正文中引用的本地图片，按源文件哈希生成（仅生成一次）缩略图和响应式尺寸，
+    再把 <img> 改写为带 srcset、懒加载和固定宽高比的版本。原图未变化时通过 mtime/size 清单跳过哈希计算。
+    """
+
+    def __init__(self, web_output_dir: str, raw_md_dir: str):
+        self.image_dir = os.path.join(web_output_dir, IMAGE_DIR_NAME)
+        self.manifest_path = os.path.join(self.image_dir, MANIFEST_NAME)
+        self.raw_md_dir = raw_md_dir
+        self.entries = {}
+        os.makedirs(self.image_dir, exist_ok=True)
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') == VARIANTS_VERSION:
+                self.entries = manifest.get('entries', {})
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def _local_source(self, src: str):
+        """将 <img src> 中的相对路径（<topic_id>/<文件名>）映射到raw目录中的原图，非本地图片返回 None。"""
+        if '://' in src or src.startswith(('/', 'data:')) or not src.lower().endswith(SOURCE_SUFFIXES):
+            return None
+        # CommonMark 渲染后端会对中文/空格文件名做百分号编码
+        path = os.path.normpath(os.path.join(self.raw_md_dir, urllib.parse.unquote(html.unescape(src))))
+        if not path.startswith(os.path.normpath(self.raw_md_dir) + os.sep) or not os.path.isfile(path):
+            return None
+        return path
+
+    def prepare(self, contents, log_callback=print, max_workers=None):
+        """
+        扫描所有帖子正文中的本地图片，为新增或变化的原图生成响应式版本。
+
+        Args:
+            contents (iterable): 各帖子的正文HTML，可以是逐篇读取的生成器。
+        """
+        pending = {}
+        seen = set()
+        for content_html in contents:
+            for tag in IMG_TAG_RE.findall(content_html or ''):
+                match = SRC_ATTR_RE.search(tag)
+                src = match.group(1) if match else None
+                if not src or src in seen:
+                    continue
+                seen.add(src)
+                source_path = self._local_source(src)
+                if not source_path:
+                    continue
+                stat = os.stat(source_path)
+                entry = self.entries.get(src)
+                if entry and (entry['mtime'], entry['size']) == (stat.st_mtime_ns, stat.st_size) \
+                        and all(os.path.exists(os.path.join(self.image_dir, rel)) for _, rel in entry['variants']):
+                    continue
+                pending[src] = (source_path, stat)
+
+        generated = 0
+        failed = 0
+        def collect(src, result):
+            # 失败的图片也记入清单（variants 为空），原图不变时不再重复尝试
+            source_path, stat = pending[src]
+            self.entries[src] = dict(result, mtime=stat.st_mtime_ns, size=stat.st_size)
+
+        jobs = {src: (source_path, hash_file(source_path)) for src, (source_path, _) in pending.items()}
+        if len(jobs) >= MIN_IMAGES_FOR_POOL:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                future_to_src = {executor.submit(generate_variants, path, digest, self.image_dir): src for src, (path, digest) in jobs.items()}
+                for future in as_completed(future_to_src):
+                    src = future_to_src[future]
+                    try:
+                        collect(src, future.result())
+                        generated += 1
+                    except Exception as e:
+                        failed += 1
+                        collect(src, {'variants': []})
+                        log_callback(f"  - [图片] 生成 '{src}' 的缩略图失败: {e}")
+        else:
+            for src, (path, digest) in jobs.items():
+                try:
+                    collect(src, generate_variants(path, digest, self.image_dir))
+                    generated += 1
+                except Exception as e:
+                    failed += 1
+                    collect(src, {'variants': []})
+                    log_callback(f"  - [图片] 生成 '{src}' 的缩略图失败: {e}")
+
+        # 清单只保留本次仍被引用的图片（变体文件按哈希命名，可被其他帖子共享，因此不删除文件）
+        live_entries = {src: entry for src, entry in self.entries.items() if src in seen}
+        pruned = len(live_entries) != len(self.entries)
+        self.entries = live_entries
+        # 没有新生成、失败或移除的条目时不改写清单，未变化的构建不触碰任何文件
+        if generated or failed or pruned or not os.path.exists(self.manifest_path):
+            with atomic_open(self.manifest_path) as f:
+                json.dump({'version': VARIANTS_VERSION, 'entries': self.entries}, f, ensure_ascii=False)
+        log_callback(f"  - [图片] 共 {len(self.entries)} 张本地图片，新生成 {generated} 张的响应式版本，失败 {failed} 张。")
+
+    def rewrite(self, content_html: str) -> str:
+        """将正文中的本地 <img> 改写为响应式、懒加载的版本；未处理的图片也补上懒加载属性。"""
+        def replace(match):
+            tag = match.group(0)
+            src_match = SRC_ATTR_RE.search(tag)
+            entry = self.entries.get(src_match.group(1)) if src_match else None
+            extra = ' loading="lazy" decoding="async"'
+            if entry and entry['variants']:
+                variants = entry['variants']
+                srcset = ', '.join(f'{IMAGE_DIR_NAME}/{rel} {w}w' for w, rel in variants)
+                largest_width, largest_rel = variants[-1]
+                shown_height = max(1, round(entry['height'] * largest_width / entry['width']))
+                tag = SRC_ATTR_RE.sub(lambda _: f'src="{IMAGE_DIR_NAME}/{largest_rel}"', tag, count=1)
+                extra += f' srcset="{srcset}" sizes="{IMAGE_SIZES}" width="{largest_width}" height="{shown_height}"'
+            if 'loading=' in tag:
+                return tag
+            return re.sub(r'\s*/?>$', lambda m: extra + m.group(0), tag, count=1)
+        return IMG_TAG_RE.sub(replace, content_html or '')
@@ -0,0 +1,258 @@
+import os
+import sys
+import time
+import signal
+import itertools
+import importlib
+import threading
+import traceback
+import multiprocessing
+
+# --- 作业配置 ---
+# 阶段名 -> (模块名, 入口函数名)。入口函数必须接受 log_callback 关键字参数
+STAGES = {
+    'crawl': ('zsxq_crawler', 'run_crawler'),
+    'ai': ('process_with_ai', 'run_ai_processing'),
+    'build': ('build_html', 'run_html_generation'),
+    'archive': ('archive_db', 'run_archive_export'),
+}
+CANCEL_GRACE_SEC = 5        # 取消作业时等待子进程退出的时间，超时后强制结束
+MAX_EVENTS_PER_POLL = 2000  # 每次 poll 从单个作业读取的事件上限，避免日志洪峰时阻塞界面
+
+# 作业状态
+RUNNING = 'running'
+PAUSED = 'paused'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+# spawn 启动的子进程不继承父进程的线程和 Qt 状态，在各平台上行为一致
+_mp_context = multiprocessing.get_context('spawn')
+_channel = None   # 子进程中与父进程通信的通道，父进程中为 None
+
+
+class _Channel:
+    """子进程一侧的事件通道。多个线程共用同一个管道，发送时加锁；作业暂停时发送方在此阻塞。"""
+
+    def __init__(self, job_id, conn, running):
+        self.job_id = job_id
+        self.conn = conn
+        self.running = running
+        self.lock = threading.Lock()
+
+    def send(self, event_type, **fields):
+        self.running.wait()   # 暂停时在下一次输出日志/进度处停下，恢复后继续
+        fields.update(job=self.job_id, type=event_type, time=time.time())
+        with self.lock:
+            self.conn.send(fields)
+
+
+def report_progress(done, total=None, label=''):
+    """
+    阶段代码报告进度的钩子：在作业子进程中发送结构化的进度事件（同时是暂停点），
+    直接在进程内调用阶段函数时不做任何事。
+    """
+    if _channel is not None:
+        _channel.send('progress', done=done, total=total, label=label)
+
+def _resolve_stage(stage):
+    module_name, func_name = STAGES[stage]
+    if __package__:
+        module = importlib.import_module('.' + module_name, __package__)
+    else:  # 作为独立脚本运行时
+        module = importlib.import_module(module_name)
+    return getattr(module, func_name)
+
+def _job_main(job_id, stage, kwargs, conn, running):
+    """子进程入口：运行阶段函数，日志、进度和最终结果都通过管道发回父进程。"""
+    global _channel
+    if hasattr(os, 'setsid'):
+        os.setsid()   # 作业自成进程组，取消时连同其进程池（如网页生成的渲染进程）一起结束
+    _channel = _Channel(job_id, conn, running)
+    start = time.time()
+    try:
+        func = _resolve_stage(stage)
+        func(log_callback=lambda message: _channel.send('log', message=str(message)), **kwargs)
+        _channel.send('result', status=SUCCEEDED, elapsed=time.time() - start)
+    except BaseException as e:
+        _channel.running.set()
+        _channel.send('result', status=FAILED, elapsed=time.time() - start, error=f"{type(e).__name__}: {e}",
+                      traceback=traceback.format_exc())
+    finally:
+        conn.close()
+
+
+def _kill_group(job, sig):
+    """向作业的进程组发送信号（仅 POSIX）。Windows 上只能结束作业进程本身。"""
+    if not hasattr(os, 'killpg') or job.process.pid is None:
+        return
+    try:
+        os.killpg(job.process.pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+class Job:
+    """一个在子进程中运行的阶段作业。状态只由 JobRunner 在父进程中更新。"""
+
+    def __init__(self, job_id, stage, label, kwargs):
+        self.id = job_id
+        self.stage = stage
+        self.label = label
+        self.kwargs = kwargs
+        self.state = RUNNING
+        self.progress = None       # 最近一次进度事件 (done, total, label)
+        self.error = None
+        self.started = time.time()
+        self.ended = None
+        self.process = None
+        self.conn = None
+        self.running = None        # 已设置表示运行，清除表示暂停
+
+    @property
+    def finished(self) -> bool:
+        return self.state in FINISHED_STATES
+
+    def describe(self) -> str:
+        text = f"#{self.id} {self.stage} {self.label}"
+        if self.progress and self.progress[1]:
+            text += f" {self.progress[0]}/{self.progress[1]}"
+        return text
+
+
+class JobRunner:
+    """
+    在子进程中执行流水线阶段（抓取、AI处理、网页生成、导出检索库）的作业管理器。
+
+    每个作业一个子进程，通过单向管道把日志、进度和结果以字典事件的形式发回；子进程崩溃只影响该作业。
+    不同数据集的作业可以同时运行；写入同一输出目录的两个作业由 OutputWriter 的目录锁互斥。
+    父进程（界面）定期调用 poll() 取回事件，不会被阶段代码的CPU密集计算阻塞。
+
+    取消作业直接结束子进程：输出文件都是原子写入的，已完成标记的文件不受影响，下次运行从中断处继续。
+    暂停是协作式的：子进程在下一次输出日志或进度时停下，恢复后继续。
+    """
+
+    def __init__(self):
+        self.jobs = {}
+        self._ids = itertools.count(1)
+
+    def submit(self, stage: str, label: str = '', **kwargs) -> Job:
+        """启动一个作业，kwargs 原样传给阶段入口函数（必须可以 pickle）。"""
+        if stage not in STAGES:
+            raise ValueError(f"未知的阶段: {stage}")
+        job = Job(next(self._ids), stage, label, kwargs)
+        receive_conn, send_conn = _mp_context.Pipe(duplex=False)
+        job.running = _mp_context.Event()
+        job.running.set()
+        job.process = _mp_context.Process(target=_job_main, args=(job.id, stage, kwargs, send_conn, job.running),
+                                          name=f"job-{job.id}-{stage}")
+        job.process.start()
+        send_conn.close()   # 父进程只保留读端，子进程退出后读端即可收到 EOF
+        job.conn = receive_conn
+        self.jobs[job.id] = job
+        return job
+
+    def poll(self) -> list:
+        """
+        非阻塞地取回所有作业的新事件，返回 [(job, event)]。
+        子进程退出而没有发回结果时（崩溃或被结束），补一个 result 事件。
+        """
+        events = []
+        for job in list(self.jobs.values()):
+            if job.conn is None:
+                continue
+            try:
+                for _ in range(MAX_EVENTS_PER_POLL):
+                    if not job.conn.poll():
+                        break
+                    event = job.conn.recv()
+                    self._apply(job, event)
+                    events.append((job, event))
+                else:
+                    continue   # 还有未读事件，下次再读
+            except (EOFError, OSError):
+                pass   # 子进程已退出，管道关闭
+            if job.process.is_alive() and not job.finished:
+                continue
+            job.process.join(timeout=1)
+            if job.process.is_alive():
+                continue
+            job.conn.close()
+            job.conn = None
+            _kill_group(job, getattr(signal, 'SIGKILL', signal.SIGTERM))   # 清理作业崩溃后遗留的子进程
+            if not job.finished:
+                event = {'job': job.id, 'type': 'result', 'status': FAILED, 'time': time.time(),
+                         'elapsed': time.time() - job.started, 'error': f"子进程意外退出（退出码 {job.process.exitcode}）"}
+                self._apply(job, event)
+                events.append((job, event))
+        return events
+
+    def _apply(self, job, event):
+        if event['type'] == 'progress':
+            job.progress = (event.get('done'), event.get('total'), event.get('label'))
+        elif event['type'] == 'result' and not job.finished:
+            job.state = event['status']
+            job.error = event.get('error')
+            job.ended = event['time']
+
+    def pause(self, job_id):
+        job = self.jobs[job_id]
+        if job.state == RUNNING:
+            job.running.clear()
+            job.state = PAUSED
+
+    def resume(self, job_id):
+        job = self.jobs[job_id]
+        if job.state == PAUSED:
+            job.running.set()
+            job.state = RUNNING
+
+    def cancel(self, job_id, grace: float = CANCEL_GRACE_SEC):
+        """结束作业的子进程（先 terminate，超时后 kill）。"""
+        job = self.jobs[job_id]
+        if job.finished:
+            return
+        _kill_group(job, signal.SIGTERM)
+        job.process.terminate()
+        job.process.join(grace)
+        if job.process.is_alive():
+            job.process.kill()
+            job.process.join()
+        _kill_group(job, getattr(signal, 'SIGKILL', signal.SIGTERM))
+        job.state = CANCELLED
+        job.ended = time.time()
+
+    def active_jobs(self) -> list:
+        return [job for job in self.jobs.values() if not job.finished]
+
+    def shutdown(self, grace: float = CANCEL_GRACE_SEC):
+        """取消所有未结束的作业，退出程序前调用。"""
+        for job in self.active_jobs():
+            self.cancel(job.id, grace)
+        self.poll()
+
+
+if __name__ == '__main__':
+    # 在子进程中运行单个阶段并输出其事件，例如（在 Qt 目录下）:
+    #   python -m logic.job_runner build '{"source_folder_name": "processed_md"}'
+    import json
+    import argparse
+    parser = argparse.ArgumentParser(description='在子进程中运行流水线阶段，并输出其日志和进度。Ctrl+C 取消作业。')
+    parser.add_argument('stage', choices=sorted(STAGES))
+    parser.add_argument('kwargs', help='传给阶段入口函数的参数（JSON 对象）')
+    args = parser.parse_args()
+    runner = JobRunner()
+    job = runner.submit(args.stage, **json.loads(args.kwargs))
+    try:
+        while not job.finished:
+            for _, event in runner.poll():
+                if event['type'] == 'log':
+                    print(event['message'])
+                elif event['type'] == 'progress':
+                    print(f"[进度] {event['done']}/{event['total'] or '?'} {event['label']}")
+            time.sleep(0.05)
+    except KeyboardInterrupt:
+        runner.cancel(job.id)
+    print(f"作业 #{job.id} 结束: {job.state}" + (f" ({job.error})" if job.error else ''))
+    sys.exit(0 if job.state == SUCCEEDED else 1)
@@ -0,0 +1,392 @@
+import json
+import time
+import random
+import argparse
+import threading
+from collections import deque, Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import openai
+
+# --- 端点池配置 ---
+ENDPOINTS_FILENAME = 'llm_endpoints.json'   # 放在 Qt 目录下时，AI处理改用其中的多个端点（格式见 load_endpoints）
+LATENCY_WINDOW = 200        # 每个端点保留最近多少次成功请求的耗时，用于估计中位数和对冲阈值
+DEFAULT_LATENCY_SEC = 5.0   # 端点还没有耗时记录时的估计值
+HEDGE_ENABLED = True        # 请求耗时超过该端点的 p95 仍未完成时，向另一个端点发送相同的请求，先返回者胜出
+HEDGE_PERCENTILE = 0.95
+HEDGE_MIN_SAMPLES = 20      # 端点的耗时样本少于此数时不发对冲请求
+HEDGE_MAX_RATIO = 0.1       # 对冲请求最多占总请求数的比例，避免所有端点同时变慢时请求量翻倍
+FAILURE_THRESHOLD = 3       # 连续失败（网络错误、限流、5xx）达到此次数的端点暂停使用
+COOLDOWN_SEC = 30           # 暂停时长，到期后先放行一个请求试探端点是否恢复
+ERROR_RATE_DECAY = 0.1      # 端点近期失败率（指数加权平均）的更新系数；失败率高的端点分到的请求相应减少
+MIN_SUCCESS_RATE = 0.05     # 路由打分中成功率的下限，避免除以零
+MAX_REQUEST_THREADS = 256   # 执行请求的线程数上限（每个请求及其对冲请求各占一个线程）
+TRANSIENT_ERRORS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+
+class RequestCancelled(Exception):
+    """对冲的两个请求中，另一个已先返回，本请求被取消。"""
+
+
+def load_endpoints(path: str) -> list:
+    """
+    读取端点配置文件：JSON 数组，每项为
+    {"name": "deepseek-1", "base_url": "https://api.deepseek.com", "api_key": "sk-...", "weight": 2, "max_concurrency": 20}。
+    name、weight（默认 1）和 max_concurrency（默认不限）可省略。
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        endpoints = json.load(f)
+    if not isinstance(endpoints, list):
+        raise ValueError(f"端点配置 {path} 应为 JSON 数组")
+    return endpoints
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Endpoint:
+    """一个 OpenAI 兼容的端点：复用同一个客户端（连接池），记录并发数、近期耗时和健康状态。"""
+
+    def __init__(self, name: str, base_url: str, api_key: str, weight: float = 1.0, max_concurrency: int = None):
+        self.name = name
+        self.base_url = base_url
+        self.weight = weight
+        self.max_concurrency = max_concurrency
+        self.client = openai.OpenAI(api_key=api_key, base_url=base_url, max_retries=0)  # 重试由调用方负责
+        self.in_flight = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.consecutive_failures = 0
+        self.error_rate = 0.0
+        self.down_until = 0.0
+        self.counts = Counter()   # requests / failures / hedges / hedge_wins / failovers
+
+    def latency_estimate(self) -> float:
+        return percentile(self.latencies, 0.5) if self.latencies else DEFAULT_LATENCY_SEC
+
+    def expected_wait(self) -> float:
+        """
+        路由打分：排队加上重试的预计耗时，按权重折算。失败率按平方计入（30% 失败率约使打分翻倍），
+        快速失败的端点耗时样本少、中位数低，只按线性折算仍会显得很便宜。
+        """
+        success_rate = max(MIN_SUCCESS_RATE, 1.0 - self.error_rate)
+        return (self.in_flight + 1) * self.latency_estimate() / (self.weight * success_rate ** 2)
+
+    def is_available(self, now: float) -> bool:
+        if self.max_concurrency is not None and self.in_flight >= self.max_concurrency:
+            return False
+        if self.consecutive_failures >= FAILURE_THRESHOLD:
+            # 暂停到期后只放行一个试探请求，成功后恢复
+            return now >= self.down_until and self.in_flight == 0
+        return True
+
+
+class ProviderPool:
+    """
+    多个 OpenAI 兼容端点组成的请求池，按权重、负载、耗时和健康状态为每个请求选择端点。
+
+    选择预计等待最短的可用端点：(在途请求数 + 1) × 近期耗时中位数 / (权重 × 近期成功率²)；已达并发上限的端点不参与选择，
+    全部占满时调用方等待。连续失败 FAILURE_THRESHOLD 次的端点暂停 COOLDOWN_SEC 秒。
+    请求遇到临时错误（网络错误、限流、5xx）时换一个尚未失败的端点重试，最多把池中每个端点都试一遍。
+    开启对冲时，请求耗时超过所在端点近期耗时的 p95 仍未完成，就向另一个端点（没有空闲端点时不发）
+    发送相同的请求，先成功的结果胜出，另一个请求被取消。对冲请求总数不超过 HEDGE_MAX_RATIO。
+    """
+
+    def __init__(self, endpoints: list, hedge: bool = HEDGE_ENABLED, log_callback=print):
+        if not endpoints:
+            raise ValueError("没有可用的AI端点")
+        self.endpoints = endpoints
+        self.hedge = hedge
+        self.log_callback = log_callback
+        self.condition = threading.Condition()
+        self.executor = ThreadPoolExecutor(max_workers=MAX_REQUEST_THREADS, thread_name_prefix='llm-request')
+        self.requests = 0
+        self.hedges = 0
+
+    @classmethod
+    def from_config(cls, configs: list, hedge: bool = HEDGE_ENABLED, log_callback=print):
+        """由端点配置（见 load_endpoints）创建请求池，跳过 API 密钥缺失或格式不正确的端点。"""
+        endpoints = []
+        for i, config in enumerate(configs):
+            name = config.get('name') or f"endpoint-{i + 1}"
+            api_key = config.get('api_key') or ''
+            if not config.get('base_url') or "sk-" not in api_key:
+                log_callback(f"  - [错误] 端点 {name} 的 base_url 或 API密钥未配置或格式不正确，已跳过。")
+                continue
+            endpoints.append(Endpoint(name, config['base_url'], api_key, float(config.get('weight', 1.0)), config.get('max_concurrency')))
+        return cls(endpoints, hedge, log_callback)
+
+    def _pick(self, exclude=()) -> Endpoint:
+        now = time.time()
+        candidates = [endpoint for endpoint in self.endpoints if endpoint not in exclude and endpoint.is_available(now)]
+        if not candidates:
+            return None
+        return min(candidates, key=Endpoint.expected_wait)
+
+    def acquire(self, exclude=(), failover: bool = False) -> Endpoint:
+        """选出 exclude 以外的一个端点并占用一个并发名额；没有可用端点时等待。failover=True 表示这是失败后的重试。"""
+        with self.condition:
+            while True:
+                endpoint = self._pick(exclude)
+                if endpoint is not None:
+                    endpoint.in_flight += 1
+                    endpoint.counts['requests'] += 1
+                    if failover:
+                        endpoint.counts['failovers'] += 1
+                    return endpoint
+                resume_at = min((endpoint.down_until for endpoint in self.endpoints if endpoint.down_until > time.time()), default=None)
+                self.condition.wait(timeout=1.0 if resume_at is None else max(0.01, resume_at - time.time()))
+
+    def try_acquire(self, exclude) -> Endpoint:
+        """为对冲请求选择 exclude 以外的端点；没有其他空闲端点时返回 None（不对冲），不等待。"""
+        with self.condition:
+            endpoint = self._pick(exclude)
+            if endpoint is not None:
+                endpoint.in_flight += 1
+                endpoint.counts['requests'] += 1
+                endpoint.counts['hedges'] += 1
+                self.hedges += 1
+            return endpoint
+
+    def release(self, endpoint: Endpoint, elapsed: float, error: BaseException = None):
+        with self.condition:
+            endpoint.in_flight -= 1
+            if error is None:
+                endpoint.latencies.append(elapsed)
+                endpoint.consecutive_failures = 0
+                endpoint.error_rate *= 1 - ERROR_RATE_DECAY
+            elif isinstance(error, TRANSIENT_ERRORS):
+                endpoint.error_rate += ERROR_RATE_DECAY * (1 - endpoint.error_rate)
+                endpoint.counts['failures'] += 1
+                endpoint.consecutive_failures += 1
+                if endpoint.consecutive_failures >= FAILURE_THRESHOLD:
+                    endpoint.down_until = time.time() + COOLDOWN_SEC
+                    self.log_callback(f"  - [端点] {endpoint.name} 连续失败 {endpoint.consecutive_failures} 次，暂停使用 {COOLDOWN_SEC} 秒。")
+            self.condition.notify_all()
+
+    def hedge_delay(self, endpoint: Endpoint):
+        """返回发送对冲请求前的等待时间，不应对冲时返回 None。"""
+        with self.condition:
+            if not self.hedge or len(endpoint.latencies) < HEDGE_MIN_SAMPLES or self.hedges >= HEDGE_MAX_RATIO * self.requests:
+                return None
+            return percentile(endpoint.latencies, HEDGE_PERCENTILE)
+
+    def _run(self, endpoint: Endpoint, request_fn, cancel: threading.Event):
+        start = time.perf_counter()
+        error = None
+        try:
+            return request_fn(endpoint, cancel)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.release(endpoint, time.perf_counter() - start, error)
+
+    def execute(self, request_fn):
+        """
+        执行一个请求（必要时加上对冲请求），返回 (结果, 端点)。遇到临时错误时换一个端点重试。
+
+        Args:
+            request_fn: request_fn(endpoint, cancel) 使用 endpoint.client 发送请求并返回结果；
+                流式读取时应定期检查 cancel（threading.Event），被设置时抛出 RequestCancelled。
+
+        Raises:
+            非临时错误直接抛出；池中每个端点都遇到临时错误时，抛出最后一个临时错误。
+        """
+        with self.condition:
+            self.requests += 1
+        endpoint = self.acquire()
+        failed = set()
+        while True:
+            try:
+                return self._attempt(endpoint, request_fn, failed)
+            except TRANSIENT_ERRORS:
+                if len(failed) >= len(self.endpoints):
+                    raise
+                endpoint = self.acquire(exclude=failed, failover=True)
+
+    def _attempt(self, primary: Endpoint, request_fn, failed: set):
+        """在 primary 上执行一次请求（必要时加上对冲请求）；遇到临时错误的端点记入 failed。"""
+        futures = {}
+
+        def launch(endpoint):
+            cancel = threading.Event()
+            future = self.executor.submit(self._run, endpoint, request_fn, cancel)
+            futures[future] = (endpoint, cancel)
+            return future
+
+        primary_future = launch(primary)
+        hedge_future = None
+        delay = self.hedge_delay(primary)
+        if delay is not None and not wait(futures, timeout=delay).done:
+            backup = self.try_acquire(exclude=failed | {primary})
+            if backup is not None:
+                hedge_future = launch(backup)
+        error = None
+        try:
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    endpoint, _ = futures.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        if isinstance(e, TRANSIENT_ERRORS):
+                            failed.add(endpoint)
+                        error = e
+                        continue
+                    if future is hedge_future and not primary_future.done():   # 对冲请求先完成（原请求仍在进行）
+                        with self.condition:
+                            endpoint.counts['hedge_wins'] += 1
+                    return result, endpoint
+        finally:
+            for _, cancel in futures.values():
+                cancel.set()
+        raise error
+
+    def report(self, log_callback=print):
+        for endpoint in self.endpoints:
+            counts = endpoint.counts
+            if not counts['requests']:
+                continue
+            latency = ''
+            if endpoint.latencies:
+                latency = f"，耗时中位数 {percentile(endpoint.latencies, 0.5):.2f} 秒，p95 {percentile(endpoint.latencies, HEDGE_PERCENTILE):.2f} 秒"
+            log_callback(f"[端点] {endpoint.name}: 请求 {counts['requests']} 次，失败 {counts['failures']} 次{latency}"
+                         f"；接替失败请求 {counts['failovers']} 次；对冲请求 {counts['hedges']} 次，其中先于原请求完成 {counts['hedge_wins']} 次。")
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+# --- 基准测试：本地 OpenAI 兼容桩服务器 ---
+
+def start_stub_server(latency: float, slow_rate: float = 0.0, slow_latency: float = 1.0, error_rate: float = 0.0):
+    """在后台线程中启动一个 OpenAI 兼容的桩服务器（非流式补全），按参数注入延迟、长尾和 503 错误，返回 (服务器, base_url)。"""
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if random.random() < error_rate:
+                self.send_body(503, {'error': {'message': 'overloaded', 'type': 'server_error'}})
+                return
+            time.sleep(slow_latency if random.random() < slow_rate else latency * random.uniform(0.8, 1.2))
+            content = json.dumps({'tags': ['AI'], 'digest': '摘要', 'topic': '技术分享'}, ensure_ascii=False)
+            self.send_body(200, {'id': 'stub', 'object': 'chat.completion', 'created': 0, 'model': 'stub',
+                                 'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+                                 'usage': {'prompt_tokens': 300, 'completion_tokens': 30, 'total_tokens': 330}})
+
+        def send_body(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def benchmark(num_requests: int = 2000, concurrency: int = 32, log_callback=print):
+    """
+    用三个注入了延迟的本地桩服务器比较：单端点、多端点、多端点 + 对冲请求的吞吐和尾延迟。
+    端点 a 较快但有 3% 的请求需要 1 秒，端点 b 较慢，端点 c 有 30% 的请求返回 503。
+    """
+    random.seed(0)
+    servers = [start_stub_server(0.05, slow_rate=0.03, slow_latency=1.0),
+               start_stub_server(0.08, slow_rate=0.02, slow_latency=1.0),
+               start_stub_server(0.05, error_rate=0.3)]
+    configs = [{'name': name, 'base_url': base_url, 'api_key': 'sk-stub', 'weight': weight, 'max_concurrency': 16}
+               for name, (_, base_url), weight in zip('abc', servers, (2, 1, 1))]
+
+    def request_fn(endpoint, cancel):
+        return endpoint.client.chat.completions.create(model='stub', messages=[{'role': 'user', 'content': 'x'}])
+
+    def run(pool):
+        latencies = []
+        failures = []
+
+        def one():
+            start = time.perf_counter()
+            try:
+                pool.execute(request_fn)
+            except Exception as e:
+                failures.append(e)
+                return
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for _ in range(num_requests):
+                executor.submit(one)
+        return time.perf_counter() - start, latencies, len(failures)
+
+    for label, endpoint_configs, hedge in [('单端点 a', configs[:1], False), ('三端点', configs, False), ('三端点 + 对冲', configs, True)]:
+        pool = ProviderPool.from_config(endpoint_configs, hedge=hedge, log_callback=lambda message: None)
+        elapsed, latencies, failures = run(pool)
+        log_callback(f"{label}: {num_requests} 个请求 {elapsed:.2f} 秒（{num_requests / elapsed:.0f} 个/秒），失败 {failures}，"
+                     f"p50 {percentile(latencies, 0.5) * 1000:.0f} 毫秒，p95 {percentile(latencies, 0.95) * 1000:.0f} 毫秒，"
+                     f"p99 {percentile(latencies, 0.99) * 1000:.0f} 毫秒，最大 {max(latencies) * 1000:.0f} 毫秒。")
+        pool.report(lambda message: log_callback('  ' + message))
+        pool.close()
+    for server, _ in servers:
+        server.shutdown()
+
+
+def self_check(log_callback=print):
+    """用本地桩服务器检查故障转移和对冲的行为，不符合预期时抛出 AssertionError。"""
+    def request_fn(endpoint, cancel):
+        return endpoint.client.chat.completions.create(model='stub', messages=[{'role': 'user', 'content': 'x'}])
+
+    # 1. 选中的端点返回 503 时，请求换到另一个端点完成
+    bad_server, bad_url = start_stub_server(0.01, error_rate=1.0)
+    good_server, good_url = start_stub_server(0.01)
+    pool = ProviderPool.from_config([{'name': 'bad', 'base_url': bad_url, 'api_key': 'sk-stub', 'weight': 100},
+                                     {'name': 'good', 'base_url': good_url, 'api_key': 'sk-stub'}],
+                                    hedge=False, log_callback=lambda message: None)
+    bad, good = pool.endpoints
+    _, endpoint = pool.execute(request_fn)
+    assert endpoint is good and bad.counts['failures'] == 1 and good.counts['failovers'] == 1, pool.endpoints
+    pool.close()
+    log_callback("  故障转移: 端点 bad 返回 503 后，请求在端点 good 上完成")
+
+    # 2. 只有一个端点时，慢请求不会对冲到同一个端点
+    slow_server, slow_url = start_stub_server(0.3)
+    pool = ProviderPool.from_config([{'name': 'only', 'base_url': slow_url, 'api_key': 'sk-stub'}], log_callback=lambda message: None)
+    only = pool.endpoints[0]
+    only.latencies.extend([0.01] * HEDGE_MIN_SAMPLES)   # 使对冲阈值远低于实际耗时
+    pool.execute(request_fn)
+    assert only.counts['requests'] == 1 and only.counts['hedges'] == 0, only.counts
+    pool.close()
+    log_callback("  单端点: 超过对冲阈值的请求没有被重复发送到同一端点")
+    for server in (bad_server, good_server, slow_server):
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='多端点AI请求池：在本地桩服务器上进行基准测试，或检查端点配置文件。')
+    parser.add_argument('endpoints_file', nargs='?', help=f'端点配置文件，例如 Qt/{ENDPOINTS_FILENAME}')
+    parser.add_argument('--benchmark', type=int, metavar='N', help='向本地桩服务器发送 N 个请求')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--check', action='store_true', help='检查故障转移和对冲的行为')
+    args = parser.parse_args()
+    if args.check:
+        self_check()
+    elif args.benchmark:
+        benchmark(args.benchmark, args.concurrency)
+    elif args.endpoints_file:
+        pool = ProviderPool.from_config(load_endpoints(args.endpoints_file))
+        for endpoint in pool.endpoints:
+            print(f"{endpoint.name}: {endpoint.base_url} 权重 {endpoint.weight} 并发上限 {endpoint.max_concurrency or '不限'}")
+    else:
+        parser.print_help()
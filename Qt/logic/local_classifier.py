@@ -0,0 +1,363 @@
+import os
+import re
+import json
+import math
+import time
+import zlib
+import random
+import argparse
+import threading
+from collections import Counter
+
+try:
+    from . import front_matter
+    from .atomic_io import atomic_write
+    from .metadata_store import open_store
+    from .search_index import tokenize
+except ImportError:  # 作为独立脚本运行时
+    import front_matter
+    from atomic_io import atomic_write
+    from metadata_store import open_store
+    from search_index import tokenize
+
+# --- 本地分类器配置 ---
+MODEL_FILENAME = '.local_classifier.json'   # 保存在 processed_ 目录中，随AI处理增量训练
+MODEL_VERSION = 1
+LABEL_SOURCE_FIELD = 'labeled_by'           # 由本地分类器标注的帖子在YAML头部记为 labeled_by: local，不作为训练数据
+LOCAL_LABEL = 'local'
+MIN_TRAINING_POSTS = 200        # 训练数据少于此数时不做预测
+HOLDOUT_PERCENT = 10            # 按文件名哈希固定留出的验证集比例（%），这些帖子永不参与训练
+MAX_HOLDOUT = 2000              # 每次验证最多读取的验证集帖子数
+TARGET_PRECISION = 0.95         # 置信度阈值按验证集确定：高于阈值的预测主题准确率须达到此值
+MIN_CONFIDENT_HOLDOUT = 30      # 验证集中高于阈值的预测少于此数时，统计意义不足，不跳过AI
+MIN_THRESHOLD = 0.5             # 置信度阈值的下限
+AUDIT_PERCENT = 5               # 有把握的预测中仍有此比例（%）交给AI，用于持续检验一致率
+SMOOTHING = 0.1                 # 朴素贝叶斯的加性平滑系数
+MIN_TAG_POSTS = 10              # 标签至少出现在这么多篇训练帖子中才会被预测
+TAG_MIN_PROBABILITY = 0.15      # 预测的标签后验概率下限
+MAX_TAGS = 5
+MAX_TEXT_CHARS = 3000           # 只使用正文的前若干字符，长帖的开头已足以判断主题
+DIGEST_MAX_CHARS = 50           # 本地生成的摘要取正文开头的前若干字（与AI摘要的长度要求一致）
+
+MARKUP_RE = re.compile(r'!?\[([^\]]*)\]\([^)]*\)|https?://\S+|[#>*_`|~-]+')
+
+
+def is_holdout(filename: str) -> bool:
+    return zlib.crc32(filename.encode('utf-8')) % 100 < HOLDOUT_PERCENT
+
+def is_audit(filename: str) -> bool:
+    """抽检：按文件名哈希确定，同一篇帖子在多次运行中的结果一致。"""
+    return zlib.crc32(filename.encode('utf-8')[::-1]) % 100 < AUDIT_PERCENT
+
+def term_weights(text: str) -> dict:
+    """词项权重：log(1 + 词频)，再做 L2 归一化，使长帖和短帖的总权重相当。"""
+    counts = Counter(tokenize(text[:MAX_TEXT_CHARS]))
+    weights = {term: math.log1p(count) for term, count in counts.items()}
+    norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+    return {term: weight / norm for term, weight in weights.items()}
+
+def extract_digest(text: str) -> str:
+    """取正文开头的一段文字作为摘要（去掉链接和 Markdown 标记）。"""
+    plain = ' '.join(MARKUP_RE.sub(' ', text or '').split())
+    return plain if len(plain) <= DIGEST_MAX_CHARS else plain[:DIGEST_MAX_CHARS] + '…'
+
+
+class NaiveBayesModel:
+    """
+    多项式朴素贝叶斯：按类别累加词项权重，可以随时增量训练。预测时文档按 TF-IDF 加权，
+    得分为 log 先验 + Σ 权重 × log 条件概率，即 TF-IDF 特征上的线性模型。
+    多标签（标签）时，一篇帖子对它的每个标签各计一次。
+    """
+
+    def __init__(self):
+        self.doc_counts = {}     # 类别 -> 训练帖子数
+        self.term_counts = {}    # 类别 -> {词项: 累计权重}
+        self.term_totals = {}    # 类别 -> 累计权重之和
+
+    def add(self, labels, weights: dict):
+        for label in labels:
+            self.doc_counts[label] = self.doc_counts.get(label, 0) + 1
+            counts = self.term_counts.setdefault(label, {})
+            for term, weight in weights.items():
+                counts[term] = counts.get(term, 0.0) + weight
+            self.term_totals[label] = self.term_totals.get(label, 0.0) + sum(weights.values())
+
+    def finalize(self, vocab_size: int, min_docs: int = 1):
+        """训练结束后预先计算各类别的 log 先验和 log 条件概率，预测时只需查表。"""
+        labels = [label for label, count in self.doc_counts.items() if count >= min_docs]
+        total_docs = sum(self.doc_counts[label] for label in labels) or 1
+        self.log_prior = {label: math.log(self.doc_counts[label] / total_docs) for label in labels}
+        self.log_prob = {}
+        self.log_default = {}
+        for label in labels:
+            denominator = math.log(self.term_totals[label] + SMOOTHING * vocab_size)
+            self.log_default[label] = math.log(SMOOTHING) - denominator
+            self.log_prob[label] = {term: math.log(count + SMOOTHING) - denominator for term, count in self.term_counts[label].items()}
+
+    def predict(self, vector: dict) -> list:
+        """返回 [(类别, 后验概率)]，按概率从高到低排列。"""
+        scores = {}
+        for label, prior in self.log_prior.items():
+            log_prob = self.log_prob[label]
+            default = self.log_default[label]
+            scores[label] = prior + sum(weight * log_prob.get(term, default) for term, weight in vector.items())
+        if not scores:
+            return []
+        best = max(scores.values())
+        exp_scores = {label: math.exp(score - best) for label, score in scores.items()}
+        total = sum(exp_scores.values())
+        return sorted(((label, value / total) for label, value in exp_scores.items()), key=lambda item: item[1], reverse=True)
+
+    def to_dict(self) -> dict:
+        return {'doc_counts': self.doc_counts, 'term_counts': self.term_counts, 'term_totals': self.term_totals}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        model = cls()
+        model.doc_counts = data['doc_counts']
+        model.term_counts = data['term_counts']
+        model.term_totals = data['term_totals']
+        return model
+
+
+class LocalClassifier:
+    """
+    在 processed_ 目录中已由AI标注的帖子上训练的本地主题/标签分类器，用于跳过有把握的AI调用。
+
+    每次AI处理开始时，用上次以来新增的AI标注帖子增量训练（本地标注的帖子和近似重复的复用结果不参与训练），
+    然后在固定留出的验证集上确定置信度阈值：高于阈值的预测主题准确率须达到 TARGET_PRECISION。
+    达不到时本次不跳过任何AI调用，只记录本地预测与AI结果的一致率。
+    跳过AI的帖子使用预测的主题和标签，摘要取正文开头，并在YAML头部标记 labeled_by: local。
+    """
+
+    def __init__(self, md_dir: str):
+        self.md_dir = md_dir
+        self.path = os.path.join(md_dir, MODEL_FILENAME)
+        self.topics = NaiveBayesModel()
+        self.tags = NaiveBayesModel()
+        self.doc_freq = {}
+        self.num_docs = 0
+        self.seen = set()        # 已读取过的训练集帖子（包括不可用作训练数据的）
+        self.threshold = None    # 本次运行的置信度阈值，None 表示不跳过AI
+        self.ready = False
+        self.stats = Counter()
+        self.stats_lock = threading.Lock()
+
+    @classmethod
+    def load(cls, md_dir: str):
+        classifier = cls(md_dir)
+        try:
+            with open(classifier.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == MODEL_VERSION:
+                classifier.topics = NaiveBayesModel.from_dict(data['topics'])
+                classifier.tags = NaiveBayesModel.from_dict(data['tags'])
+                classifier.doc_freq = data['doc_freq']
+                classifier.num_docs = data['num_docs']
+                classifier.seen = set(data['seen'])
+        except (OSError, ValueError, KeyError):
+            pass
+        return classifier
+
+    def save(self):
+        data = {'version': MODEL_VERSION, 'topics': self.topics.to_dict(), 'tags': self.tags.to_dict(),
+                'doc_freq': self.doc_freq, 'num_docs': self.num_docs, 'seen': sorted(self.seen)}
+        atomic_write(self.path, json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+
+    def _labeled_posts(self, filenames):
+        """逐篇读取可用作训练/验证数据的帖子：有AI给出的主题，且不是本地标注或复用的结果。"""
+        for filename in filenames:
+            try:
+                post = front_matter.load(os.path.join(self.md_dir, filename))
+            except Exception:
+                continue
+            metadata = post.metadata
+            if not metadata.get('topic') or metadata.get(LABEL_SOURCE_FIELD) == LOCAL_LABEL or metadata.get('duplicate_of'):
+                continue
+            yield filename, post
+
+    def add_example(self, topic: str, tags: list, text: str):
+        weights = term_weights(text)
+        self.topics.add([str(topic)], weights)
+        self.tags.add(dict.fromkeys(str(tag) for tag in tags or []), weights)
+        for term in weights:
+            self.doc_freq[term] = self.doc_freq.get(term, 0) + 1
+        self.num_docs += 1
+
+    def finalize(self):
+        self.topics.finalize(len(self.doc_freq))
+        self.tags.finalize(len(self.doc_freq), MIN_TAG_POSTS)
+        self.ready = True
+
+    def vector(self, text: str) -> dict:
+        """预测用的文档向量：训练时见过的词项按 log 词频 × IDF 加权并归一化。"""
+        weights = {}
+        for term, weight in term_weights(text).items():
+            df = self.doc_freq.get(term)
+            if df:
+                weights[term] = weight * (math.log((1 + self.num_docs) / (1 + df)) + 1)
+        norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+        return {term: weight / norm for term, weight in weights.items()}
+
+    def prepare(self, metadata_store, log_callback=print):
+        """
+        增量训练并在验证集上确定本次运行的置信度阈值，有新的训练数据时保存模型。
+
+        Args:
+            metadata_store: processed_ 目录的元数据表，用于找出已有主题的帖子而无需逐个打开文件。
+        """
+        start = time.perf_counter()
+        labeled = sorted(name for name, topic in zip(metadata_store.column('filename'), metadata_store.column('topic')) if topic)
+        new_files = [name for name in labeled if name not in self.seen and not is_holdout(name)]
+        added = 0
+        for filename, post in self._labeled_posts(new_files):
+            self.add_example(post.metadata['topic'], post.metadata.get('tags'), post.content)
+            added += 1
+        self.seen.update(new_files)   # 本地标注和复用结果的帖子也记下，下次不再读取
+        if new_files:
+            self.save()
+        if self.num_docs < MIN_TRAINING_POSTS:
+            log_callback(f"  - [本地分类] 训练数据 {self.num_docs} 篇，少于 {MIN_TRAINING_POSTS} 篇，本次全部交给AI。")
+            return
+        self.finalize()
+        log_callback(f"  - [本地分类] 新增训练数据 {added} 篇，共 {self.num_docs} 篇、{len(self.topics.log_prior)} 个主题、"
+                     f"{len(self.tags.log_prior)} 个标签，耗时 {time.perf_counter() - start:.2f} 秒。")
+        holdout_files = [name for name in labeled if is_holdout(name)][:MAX_HOLDOUT]
+        self.calibrate(((post.content, post.metadata['topic'], post.metadata.get('tags'))
+                        for _, post in self._labeled_posts(holdout_files)), log_callback)
+
+    def calibrate(self, examples, log_callback=print):
+        """
+        在验证集上评估，选出满足 TARGET_PRECISION 的最低置信度阈值。
+
+        Args:
+            examples: 可迭代的 (正文, 主题, 标签列表)。
+        """
+        results = []
+        tag_overlap = []
+        for text, topic, tags in examples:
+            prediction = self.predict(text)
+            results.append((prediction['confidence'], prediction['topic'] == str(topic)))
+            actual_tags = set(str(tag) for tag in tags or [])
+            predicted_tags = set(prediction['tags'])
+            if actual_tags or predicted_tags:
+                tag_overlap.append(len(actual_tags & predicted_tags) / len(actual_tags | predicted_tags))
+        if not results:
+            log_callback("  - [本地分类] 验证集为空，本次全部交给AI。")
+            return
+        results.sort(reverse=True)
+        correct = 0
+        for count, (confidence, is_correct) in enumerate(results, 1):
+            correct += is_correct
+            if count >= MIN_CONFIDENT_HOLDOUT and confidence >= MIN_THRESHOLD and correct / count >= TARGET_PRECISION:
+                self.threshold = confidence   # 按置信度从高到低累计，最后一个仍满足精度要求的位置即为阈值
+        accuracy = sum(is_correct for _, is_correct in results) / len(results)
+        tag_score = sum(tag_overlap) / len(tag_overlap) if tag_overlap else 0.0
+        message = f"  - [本地分类] 验证集 {len(results)} 篇：主题准确率 {accuracy:.1%}，标签 Jaccard {tag_score:.2f}；"
+        if self.threshold is None:
+            log_callback(message + f"没有准确率能达到 {TARGET_PRECISION:.0%} 的置信度阈值，本次全部交给AI。")
+        else:
+            confident = [is_correct for confidence, is_correct in results if confidence >= self.threshold]
+            log_callback(message + f"置信度阈值 {self.threshold:.3f}，覆盖 {len(confident) / len(results):.1%}，"
+                                   f"其中准确率 {sum(confident) / len(confident):.1%}。")
+
+    def predict(self, text: str) -> dict:
+        """预测主题和标签，返回 {'topic', 'confidence', 'tags', 'digest'}；模型尚未就绪时返回 None。"""
+        if not self.ready:
+            return None
+        vector = self.vector(text)
+        topics = self.topics.predict(vector)
+        if not topics:
+            return None
+        topic, confidence = topics[0]
+        tags = [tag for tag, probability in self.tags.predict(vector)[:MAX_TAGS] if probability >= TAG_MIN_PROBABILITY]
+        if not tags and self.tags.log_prior:
+            tags = [self.tags.predict(vector)[0][0]]
+        return {'topic': topic, 'confidence': confidence, 'tags': tags, 'digest': extract_digest(text)}
+
+    def should_skip_ai(self, filename: str, prediction: dict) -> bool:
+        """预测有把握（且不在抽检范围内）时跳过AI调用。"""
+        with self.stats_lock:
+            self.stats['considered'] += 1
+        if not prediction or self.threshold is None or prediction['confidence'] < self.threshold:
+            return False
+        if is_audit(filename):
+            with self.stats_lock:
+                self.stats['audited'] += 1
+            return False
+        with self.stats_lock:
+            self.stats['skipped'] += 1
+        return True
+
+    def record_ai_result(self, filename: str, prediction: dict, ai_topic: str):
+        """记录AI结果与本地预测是否一致（抽检的帖子另行统计）。"""
+        if not prediction:
+            return
+        agreed = prediction['topic'] == ai_topic
+        with self.stats_lock:
+            self.stats['compared'] += 1
+            self.stats['agreed'] += agreed
+            if self.threshold is not None and prediction['confidence'] >= self.threshold:
+                self.stats['audit_compared'] += 1
+                self.stats['audit_agreed'] += agreed
+
+    def report(self, log_callback=print):
+        stats = self.stats
+        if not self.ready or not stats['considered']:
+            return
+        message = f"[本地分类] 跳过AI {stats['skipped']}/{stats['considered']} 篇（跳过率 {stats['skipped'] / stats['considered']:.1%}）"
+        if stats['audit_compared']:
+            message += f"；抽检 {stats['audit_compared']} 篇，与AI主题一致 {stats['audit_agreed'] / stats['audit_compared']:.1%}"
+        if stats['compared']:
+            message += f"；交给AI的帖子中本地预测与AI主题一致 {stats['agreed'] / stats['compared']:.1%}"
+        log_callback(message + "。")
+
+
+def benchmark(num_posts: int = 20000, num_topics: int = 8, log_callback=print):
+    """
+    在合成数据上测量训练和预测的耗时，以及按验证集确定的阈值下可跳过的比例。
+    每个主题有自己的高频词，帖子混入大量公共词和其他主题的词，部分帖子主题模糊。
+    """
+    rng = random.Random(0)
+    common = [chr(c) + chr(c + 1) for c in range(0x4e00, 0x4e00 + 4000, 2)]
+    topic_words = {f'主题{i}': rng.sample(common, 60) for i in range(num_topics)}
+    topics = sorted(topic_words)
+    examples = []
+    for _ in range(num_posts):
+        topic = rng.choice(topics)
+        focus = rng.choice([0.05, 0.15, 0.3])   # 主题词占比，越低越难判断
+        words = [rng.choice(topic_words[topic if rng.random() < 0.8 else rng.choice(topics)]) if rng.random() < focus
+                 else rng.choice(common) for _ in range(rng.randint(40, 300))]
+        examples.append((' '.join(words), topic, [topic + '标签']))
+    classifier = LocalClassifier('.')
+    holdout = [example for i, example in enumerate(examples) if i % 10 == 0][:MAX_HOLDOUT]
+    start = time.perf_counter()
+    for i, (text, topic, tags) in enumerate(examples):
+        if i % 10:
+            classifier.add_example(topic, tags, text)
+    classifier.finalize()
+    train_time = time.perf_counter() - start
+    start = time.perf_counter()
+    predictions = [classifier.predict(text) for text, _, _ in holdout]
+    predict_time = time.perf_counter() - start
+    log_callback(f"{num_posts} 篇合成帖子、{num_topics} 个主题: 训练 {train_time:.2f} 秒，"
+                 f"预测 {predict_time / len(holdout) * 1e6:.0f} 微秒/篇（对比一次AI调用通常需要数秒）。")
+    classifier.calibrate(holdout, log_callback)
+    if classifier.threshold is not None:
+        skipped = sum(1 for prediction in predictions if prediction['confidence'] >= classifier.threshold)
+        log_callback(f"按此阈值估计可跳过约 {skipped / len(holdout) * (100 - AUDIT_PERCENT) / 100:.1%} 的AI调用（已扣除抽检）。")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='在 processed_ 目录上训练/评估本地主题分类器，或在合成数据上进行基准测试。')
+    parser.add_argument('md_dir', nargs='?', help='已由AI处理的帖子目录，例如 Qt/output/processed_md')
+    parser.add_argument('--retrain', action='store_true', help='丢弃已保存的模型，从头训练')
+    parser.add_argument('--benchmark', type=int, metavar='N', help='在 N 篇合成帖子上测试')
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark(args.benchmark)
+    elif args.md_dir:
+        classifier = LocalClassifier(args.md_dir) if args.retrain else LocalClassifier.load(args.md_dir)
+        classifier.prepare(open_store(args.md_dir))
+    else:
+        parser.print_help()
@@ -0,0 +1,370 @@
+import os
+import re
+import sys
+import time
+import json
+import hashlib
+import argparse
+import functools
+import html.parser
+import urllib.parse
+
+import markdown2
+
+try:
+    from .atomic_io import atomic_write
+except ImportError:  # 作为独立脚本运行时
+    from atomic_io import atomic_write
+
+try:
+    import cmarkgfm  # 可选依赖：GitHub 的 C 实现 CommonMark，速度约为 markdown2 的数十倍
+    from cmarkgfm.cmark import Options as CmarkOptions
+except ImportError:
+    cmarkgfm = None
+
+try:
+    from markdown_it import MarkdownIt  # 可选依赖：纯 Python 的 CommonMark 实现
+except ImportError:
+    MarkdownIt = None
+
+# --- 渲染配置 ---
+DEFAULT_BACKEND = 'auto'                       # 'auto' 或下方 RENDERERS 中的名称
+AUTO_ORDER = ['cmark', 'markdown-it', 'markdown2']  # 'auto' 时按此顺序选择第一个可用的后端
+RENDER_LOGIC_VERSION = 1                       # 链接改写等渲染逻辑变化时递增，使渲染缓存失效
+MARKDOWN2_EXTRAS = ["cuddled-lists", "tables", "fenced-code-blocks", "break-on-newline"]
+
+# 带协议(http:、mailto:、data: 等)、以 / 开头或页内锚点的链接不是帖子附件，保持原样
+NON_RELATIVE_URL_RE = re.compile(r'^(?:[a-zA-Z][a-zA-Z0-9+.\-]*:|/|#)')
+# 渲染结果中 <a href> / <img src> 的属性值；正文和代码块中的 < 已被转义，不会误匹配
+LINK_ATTR_RE = re.compile(r'(<(?:a|img)\s[^>]*?\b(?:href|src)=")([^"]*)(")')
+# 已归档帖子里形如 [报告 (1).pdf](报告 (1).pdf) 的附件链接：markdown2 接受地址中的空格，CommonMark 要求写成 <...>
+BARE_DESTINATION_RE = re.compile(r'\]\(((?:[^()<>\n"\\]|\([^()<>\n]*\))+)\)')
+
+
+def rewrite_url(url: str, topic_id) -> str:
+    """将帖子内的相对链接(图片、附件)改写为 <topic_id>/<文件名>，其余链接保持不变。"""
+    if not url or NON_RELATIVE_URL_RE.match(url):
+        return url
+    return f'{topic_id}/{url}'
+
+def quote_spaced_destinations(text: str) -> str:
+    """把含空格的链接地址改写为 CommonMark 的 <...> 形式，使两类后端对旧归档的渲染结果一致。"""
+    if '](' not in text:
+        return text
+    return BARE_DESTINATION_RE.sub(lambda m: f'](<{m.group(1)}>)' if ' ' in m.group(1) else m.group(0), text)
+
+def rewrite_rendered_links(content_html: str, topic_id) -> str:
+    """对渲染好的HTML中 <a>/<img> 的链接属性做一次改写，用于无法在渲染过程中挂钩的后端。"""
+    return LINK_ATTR_RE.sub(lambda m: m.group(1) + rewrite_url(m.group(2), topic_id) + m.group(3), content_html)
+
+
+class Renderer:
+    """
+    Markdown 渲染后端的基类。子类实现 render()，在渲染过程中把相对链接改写为帖子附件目录下的路径。
+    新后端通过 register_renderer() 注册后即可在 DEFAULT_BACKEND / 构建配置中按名称选用。
+    """
+
+    name = ''
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return True
+
+    @classmethod
+    def library_version(cls) -> str:
+        return ''
+
+    @property
+    def renderer_id(self) -> str:
+        """标识后端及其版本，作为渲染缓存键的一部分；库升级或渲染逻辑变化时缓存自动失效。"""
+        return f'{self.name}-{self.library_version()}-{RENDER_LOGIC_VERSION}'
+
+    def render(self, text: str, topic_id) -> str:
+        raise NotImplementedError
+
+
+class Markdown2Renderer(Renderer):
+    """原有的 markdown2 渲染方式，作为参考实现和兜底后端。"""
+
+    name = 'markdown2'
+
+    @classmethod
+    def library_version(cls) -> str:
+        return markdown2.__version__
+
+    def render(self, text: str, topic_id) -> str:
+        return rewrite_rendered_links(markdown2.markdown(text, extras=MARKDOWN2_EXTRAS), topic_id)
+
+
+class MarkdownItRenderer(Renderer):
+    """markdown-it-py：在 token 流上改写链接，真正做到渲染过程中一次完成。"""
+
+    name = 'markdown-it'
+
+    def __init__(self):
+        self.md = MarkdownIt('commonmark', {'breaks': True, 'html': True}).enable('table')
+        self.md.core.ruler.push('topic_links', self._rewrite_links)
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return MarkdownIt is not None
+
+    @classmethod
+    def library_version(cls) -> str:
+        import markdown_it
+        return markdown_it.__version__
+
+    @staticmethod
+    def _rewrite_links(state):
+        topic_id = state.env.get('topic_id')
+        for block in state.tokens:
+            for token in block.children or ():
+                if token.type == 'link_open':
+                    token.attrSet('href', rewrite_url(token.attrGet('href'), topic_id))
+                elif token.type == 'image':
+                    token.attrSet('src', rewrite_url(token.attrGet('src'), topic_id))
+
+    def render(self, text: str, topic_id) -> str:
+        return self.md.render(quote_spaced_destinations(text), {'topic_id': topic_id})
+
+
+class CmarkRenderer(Renderer):
+    """
+    cmarkgfm：C 实现，最快。其 Python 绑定没有暴露 AST 遍历接口，
+    因此链接改写在渲染输出上对 <a>/<img> 属性做一次扫描完成。
+    """
+
+    name = 'cmark'
+
+    def __init__(self):
+        self.options = CmarkOptions.CMARK_OPT_UNSAFE | CmarkOptions.CMARK_OPT_HARDBREAKS
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return cmarkgfm is not None
+
+    @classmethod
+    def library_version(cls) -> str:
+        return cmarkgfm.cmark.CMARK_VERSION
+
+    def render(self, text: str, topic_id) -> str:
+        content_html = cmarkgfm.markdown_to_html_with_extensions(quote_spaced_destinations(text), options=self.options, extensions=['table'])
+        return rewrite_rendered_links(content_html, topic_id)
+
+
+RENDERERS = {
+    CmarkRenderer.name: CmarkRenderer,
+    MarkdownItRenderer.name: MarkdownItRenderer,
+    Markdown2Renderer.name: Markdown2Renderer,
+}
+
+def register_renderer(renderer_class):
+    """注册自定义渲染后端（需继承 Renderer 并设置唯一的 name）。"""
+    RENDERERS[renderer_class.name] = renderer_class
+    return renderer_class
+
+@functools.lru_cache(maxsize=None)
+def get_renderer(name: str = DEFAULT_BACKEND) -> Renderer:
+    """
+    按名称获取渲染后端实例（每个进程内只创建一次）。
+
+    Args:
+        name (str): 'auto' 或已注册的后端名称。指定的后端不可用时抛出 ValueError。
+    """
+    if name == 'auto':
+        name = next(n for n in AUTO_ORDER if n in RENDERERS and RENDERERS[n].is_available())
+    renderer_class = RENDERERS.get(name)
+    if renderer_class is None or not renderer_class.is_available():
+        raise ValueError(f"Markdown 渲染后端 '{name}' 不存在或未安装对应的库")
+    return renderer_class()
+
+
+# --- 渲染缓存：按 (正文哈希, 后端版本) 缓存HTML，仅元数据变化(如AI打标签)时无需重新渲染 ---
+
+def render_key(renderer: Renderer, text: str, topic_id) -> str:
+    payload = f'{renderer.renderer_id}\0{topic_id}\0{text}'.encode('utf-8')
+    return hashlib.sha1(payload).hexdigest()
+
+def render_cache_path(cache_dir: str, key: str) -> str:
+    return os.path.join(cache_dir, key[:2], key + '.html')
+
+def render_cached(renderer: Renderer, text: str, topic_id, cache_dir: str):
+    """
+    渲染正文，命中缓存时直接读取。可在多个子进程中并发调用（写入使用临时文件+替换）。
+
+    Returns:
+        tuple: (HTML, 缓存键)
+    """
+    key = render_key(renderer, text, topic_id)
+    path = render_cache_path(cache_dir, key)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read(), key
+    except OSError:
+        pass
+    content_html = renderer.render(text, topic_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    atomic_write(path, content_html)
+    return content_html, key
+
+def prune_render_cache(cache_dir: str, live_keys: set) -> int:
+    """删除不再被任何帖子引用的渲染缓存，返回删除数量。"""
+    removed = 0
+    if not os.path.isdir(cache_dir):
+        return removed
+    for entry in os.scandir(cache_dir):
+        if not entry.is_dir():
+            continue
+        for item in os.scandir(entry.path):
+            if item.name[:-len('.html')] not in live_keys:
+                try:
+                    os.remove(item.path)
+                    removed += 1
+                except OSError:
+                    pass
+    return removed
+
+
+# --- 输出等价性检查 ---
+
+class _HTMLNormalizer(html.parser.HTMLParser):
+    """
+    把HTML规范化为事件序列，忽略不影响显示的差异：空白、属性顺序、自闭合写法、实体写法、
+    URL 百分号编码(CommonMark 会对中文文件名编码，浏览器解析结果相同)。
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.events = []
+
+    def handle_starttag(self, tag, attrs):
+        normalized = []
+        for key, value in attrs:
+            value = value or ''
+            if key in ('href', 'src'):
+                value = urllib.parse.unquote(value)
+            normalized.append((key, value))
+        self.events.append(('start', tag, tuple(sorted(normalized))))
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        self.events.append(('end', tag))
+
+    def handle_data(self, data):
+        text = ' '.join(data.split())
+        if text:
+            self.events.append(('text', text))
+
+def normalize_html(content_html: str) -> list:
+    parser = _HTMLNormalizer()
+    parser.feed(content_html)
+    parser.close()
+    return parser.events
+
+# 每条用例为 (名称, Markdown, 已知差异说明或 None)。用例覆盖爬虫生成的帖子结构：
+# 正文段落/换行、#话题#、@提及、加粗标题、外链、图片/附件列表、问答分隔线、评论引用、表格与代码块。
+EQUIVALENCE_CORPUS = [
+    ('段落与换行', "第一行\n第二行\n\n第二段", None),
+    ('加粗标题', "# 今日总结\n\n正文内容", None),
+    ('提及与话题', "感谢 @张三 的分享 #读书笔记#", None),
+    ('行首话题', "#读书笔记# 这是今天的内容",
+     "markdown2 把行首无空格的 # 视为标题，CommonMark 要求 # 后有空格，话题保持为普通文本"),
+    ('外链', "原文见 [知识星球](https://wx.zsxq.com/) 和 <https://example.com>", None),
+    ('邮件链接', "联系 [我](mailto:a@example.com)", None),
+    ('图片附件', "正文\n\n\n**图片附件:**\n\n![image](a.jpg)\n![image](b.png)", None),
+    ('中文文件名附件', "\n\n**文件附件:**\n\n- [笔记.zip](笔记.zip)\n- [report.pdf](report.pdf)", None),
+    ('含空格和括号的附件', "- [2024 年报.pdf](2024 年报.pdf)\n- [报告 (1).pdf](报告 (1).pdf)\n- [a(2).pdf](a(2).pdf)", None),
+    ('文章链接', "正文\n\n---\n🔗 [阅读原文](https://articles.zsxq.com/id_123.html)", None),
+    ('问答', "这个问题怎么看？\n\n\n---\n\n**回答 by 李四:**\n\n我的看法如下", None),
+    ('评论区', "正文\n\n\n---\n\n### 评论区\n\n\n> **张三**: 很好的内容\n\n> **李四** 回复 **张三**: 同意\n", None),
+    ('紧贴段落的列表', "要点如下：\n- 第一点\n- 第二点", None),
+    ('有序列表', "1. 第一步\n2. 第二步", None),
+    ('表格', "| 名称 | 数量 |\n|---|---|\n| 苹果 | 3 |", None),
+    ('代码块', "```python\nprint('[x](y)')\n```",
+     "markdown2 给代码块加 class=\"python\"，CommonMark 为 class=\"language-python\""),
+    ('代码中的链接语法', "`[a](b)` 不是链接", None),
+    ('行内HTML', "a<sub>2</sub> 与 <span>x</span>", None),
+    ('强调', "*斜体* 与 **加粗** 与 ***两者***", None),
+    ('页内锚点', "[跳到顶部](#top)", None),
+]
+
+def check_equivalence(backend: str, reference: str = 'markdown2', corpus=None, log_callback=print) -> bool:
+    """
+    比较两个后端在用例集上的规范化输出，打印差异。已知差异只提示，不计为失败。
+
+    Returns:
+        bool: 除已知差异外全部一致时为 True。
+    """
+    renderer = get_renderer(backend)
+    reference_renderer = get_renderer(reference)
+    corpus = EQUIVALENCE_CORPUS if corpus is None else corpus
+    failures = 0
+    for name, text, known_difference in corpus:
+        expected = reference_renderer.render(text, '123')
+        actual = renderer.render(text, '123')
+        if normalize_html(expected) == normalize_html(actual):
+            continue
+        if known_difference:
+            log_callback(f"  - [已知差异] {name}: {known_difference}")
+            continue
+        failures += 1
+        log_callback(f"  - [不一致] {name}\n      {reference}: {expected.strip()!r}\n      {renderer.name}: {actual.strip()!r}")
+    log_callback(f"{renderer.name} 对比 {reference_renderer.name}: {len(corpus)} 个用例，{failures} 个不一致。")
+    return failures == 0
+
+def load_corpus_dir(directory: str, limit: int = None) -> list:
+    """把一个 processed_md/raw_md 目录中的帖子正文作为额外的等价性用例。"""
+    try:
+        from .front_matter import loads
+    except ImportError:  # 作为独立脚本运行时
+        from front_matter import loads
+    corpus = []
+    names = sorted(n for n in os.listdir(directory) if n.endswith('.md'))
+    for name in names[:limit]:
+        with open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+            corpus.append((name, loads(f.read()).content, None))
+    return corpus
+
+def benchmark(corpus: list, repeat: int = 3, log_callback=print) -> dict:
+    """在用例集上测量各个可用后端的渲染耗时（毫秒，取多次中的最小值）。"""
+    texts = [text for _, text, _ in corpus]
+    results = {}
+    for name, renderer_class in RENDERERS.items():
+        if not renderer_class.is_available():
+            log_callback(f"  - {name}: 未安装")
+            continue
+        renderer = get_renderer(name)
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for text in texts:
+                renderer.render(text, '123')
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = best * 1000
+        log_callback(f"  - {name}: {best * 1000:.1f} ms / {len(texts)} 篇 ({best * 1e6 / max(1, len(texts)):.0f} us/篇)")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Markdown 渲染后端的等价性检查和基准测试")
+    parser.add_argument('--backend', default='auto', help="待检查的后端，默认 auto")
+    parser.add_argument('--corpus-dir', help="额外使用某个目录中的 .md 帖子作为用例，例如 Qt/output/processed_md")
+    parser.add_argument('--limit', type=int, default=None, help="从目录中最多读取的帖子数")
+    parser.add_argument('--benchmark', action='store_true', help="对所有可用后端进行基准测试")
+    args = parser.parse_args()
+
+    corpus = list(EQUIVALENCE_CORPUS)
+    if args.corpus_dir:
+        corpus += load_corpus_dir(args.corpus_dir, args.limit)
+    backend = get_renderer(args.backend).name
+    ok = True
+    if backend != 'markdown2':
+        ok = check_equivalence(backend, corpus=corpus)
+    if args.benchmark:
+        # 基准语料：用例集重复放大到与真实归档相近的规模
+        bench_corpus = corpus if args.corpus_dir else corpus * 50
+        print(json.dumps(benchmark(bench_corpus), ensure_ascii=False))
+    sys.exit(0 if ok else 1)
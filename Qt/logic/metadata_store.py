@@ -0,0 +1,225 @@
+import os
+import json
+import datetime
+import threading
+
+import yaml
+
+try:
+    from .atomic_io import atomic_open
+    from .front_matter import read_front_matter
+except ImportError:  # 作为独立脚本运行时
+    from atomic_io import atomic_open
+    from front_matter import read_front_matter
+
+try:
+    import pyarrow as pa  # 可选依赖：安装后以 Parquet 格式保存，并使用向量化排序/统计
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# --- 元数据表配置 ---
+PARQUET_FILENAME = '.posts_meta.parquet'   # 安装了 pyarrow 时使用
+JSON_FILENAME = '.posts_meta.json'         # 未安装 pyarrow 时使用的列式JSON
+STORE_VERSION = 1
+# 列名 -> 类型。每篇帖子一行，filename 为主键；mtime/size 用于判断文件是否变化
+SCHEMA = [
+    ('filename', 'string'),
+    ('topic_id', 'string'),
+    ('author', 'string'),
+    ('create_time', 'string'),
+    ('digested', 'bool'),
+    ('likes', 'int'),
+    ('comments_count', 'int'),
+    ('tags', 'list'),
+    ('topic', 'string'),
+    ('digest', 'string'),
+    ('mtime', 'int'),
+    ('size', 'int'),
+]
+COLUMN_NAMES = [name for name, _ in SCHEMA]
+
+
+def is_parquet_available() -> bool:
+    return pa is not None
+
+def _normalize(kind: str, value):
+    """把YAML中的值转换为列的类型（例如日期统一为爬虫写出的 'YYYY-MM-DD HH:MM:SS.fff' 字符串）。"""
+    if kind == 'string':
+        if isinstance(value, datetime.datetime):
+            return value.strftime('%Y-%m-%d %H:%M:%S.%f')[:23]
+        return '' if value is None else str(value)
+    if kind == 'bool':
+        return value is True or str(value).lower() == 'true'
+    if kind == 'int':
+        try:
+            return int(value or 0)
+        except (TypeError, ValueError):
+            return 0
+    return [str(item) for item in value] if isinstance(value, list) else []
+
+
+class MetadataStore:
+    """
+    列式的帖子元数据表，与某个 raw_/processed_ 目录一一对应，保存在该目录下的隐藏文件中。
+
+    爬虫和AI处理在写出 .md 文件时调用 upsert() 增量更新；sync() 按 mtime/size 找出
+    其他途径（手动编辑、旧版本程序）修改过的文件并只解析它们的YAML头部。
+    构建网站、调度AI任务和统计分析直接读取列数据，无需逐个打开 .md 文件。
+    """
+
+    def __init__(self, md_dir: str):
+        self.md_dir = md_dir
+        self.columns = {name: [] for name in COLUMN_NAMES}
+        self.row_of = {}          # filename -> 行号
+        self.dirty = False
+        self.lock = threading.Lock()
+        self.load()
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.md_dir, PARQUET_FILENAME if pa else JSON_FILENAME)
+
+    def __len__(self):
+        return len(self.columns['filename'])
+
+    def load(self):
+        """加载元数据表；格式版本不符或文件损坏时视为空表（下次 sync 会重建）。"""
+        columns = None
+        try:
+            if pa and os.path.exists(self.path):
+                table = pq.read_table(self.path)
+                if table.schema.metadata and table.schema.metadata.get(b'version') == str(STORE_VERSION).encode():
+                    columns = table.to_pydict()
+            else:
+                # 未安装 pyarrow，或刚安装 pyarrow 时沿用已有的JSON表（下次保存时转为 Parquet）
+                json_path = os.path.join(self.md_dir, JSON_FILENAME)
+                if os.path.exists(json_path):
+                    with open(json_path, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                    if data.get('version') == STORE_VERSION:
+                        columns = data['columns']
+                        self.dirty = pa is not None
+        except (OSError, ValueError, KeyError):
+            columns = None
+        if columns and all(name in columns for name in COLUMN_NAMES):
+            self.columns = {name: list(columns[name]) for name in COLUMN_NAMES}
+            self.row_of = {filename: row for row, filename in enumerate(self.columns['filename'])}
+
+    def save(self):
+        """有变化时原子写出元数据表。"""
+        with self.lock:
+            if not self.dirty:
+                return
+            os.makedirs(self.md_dir, exist_ok=True)
+            if pa:
+                with atomic_open(self.path, 'wb') as f:
+                    pq.write_table(self.table(), f)
+            else:
+                with atomic_open(self.path) as f:
+                    json.dump({'version': STORE_VERSION, 'columns': self.columns}, f, ensure_ascii=False, separators=(',', ':'))
+            json_path = os.path.join(self.md_dir, JSON_FILENAME)
+            if pa and os.path.exists(json_path):
+                os.remove(json_path)
+            self.dirty = False
+
+    def upsert(self, filename: str, metadata: dict, stat: os.stat_result):
+        """写入或更新一篇帖子的元数据（线程安全，供爬虫/AI处理在写出文件后调用）。"""
+        values = dict(metadata, filename=filename, mtime=stat.st_mtime_ns, size=stat.st_size)
+        with self.lock:
+            row = self.row_of.get(filename)
+            if row is None:
+                row = self.row_of[filename] = len(self.columns['filename'])
+                for name in COLUMN_NAMES:
+                    self.columns[name].append(None)
+            for name, kind in SCHEMA:
+                self.columns[name][row] = _normalize(kind, values.get(name))
+            self.dirty = True
+
+    def remove(self, filename: str):
+        """删除一行：用最后一行填补空位，避免移动整列数据。"""
+        with self.lock:
+            row = self.row_of.pop(filename, None)
+            if row is None:
+                return
+            last = len(self.columns['filename']) - 1
+            for column in self.columns.values():
+                column[row] = column[last]
+                column.pop()
+            if row != last:
+                self.row_of[self.columns['filename'][row]] = row
+            self.dirty = True
+
+    def sync(self, log_callback=None) -> tuple:
+        """
+        按目录中 .md 文件的 mtime/size 校正元数据表：新增或变化的文件重新读取YAML头部，已删除的文件移除。
+
+        Returns:
+            tuple: (更新的行数, 删除的行数)
+        """
+        seen = set()
+        updated = 0
+        for entry in os.scandir(self.md_dir):
+            if not entry.name.endswith('.md'):
+                continue
+            seen.add(entry.name)
+            stat = entry.stat()
+            row = self.row_of.get(entry.name)
+            if row is not None and self.columns['mtime'][row] == stat.st_mtime_ns and self.columns['size'][row] == stat.st_size:
+                continue
+            try:
+                self.upsert(entry.name, read_front_matter(entry.path), stat)
+                updated += 1
+            except (OSError, yaml.YAMLError, UnicodeDecodeError) as e:
+                if log_callback:
+                    log_callback(f"  - [警告] 读取 {entry.name} 的元数据失败: {e}")
+        removed = [filename for filename in self.row_of if filename not in seen]
+        for filename in removed:
+            self.remove(filename)
+        if log_callback and (updated or removed):
+            log_callback(f"  - [元数据] 更新了 {updated} 条、删除了 {len(removed)} 条帖子元数据。")
+        return updated, len(removed)
+
+    def get(self, filename: str) -> dict:
+        """取出一行元数据，不存在时返回 None。"""
+        row = self.row_of.get(filename)
+        if row is None:
+            return None
+        return {name: self.columns[name][row] for name in COLUMN_NAMES}
+
+    def column(self, name: str) -> list:
+        return self.columns[name]
+
+    def table(self):
+        """以 pyarrow.Table 形式返回整张表（未安装 pyarrow 时返回 None）。"""
+        if not pa:
+            return None
+        types = {'string': pa.string(), 'bool': pa.bool_(), 'int': pa.int64(), 'list': pa.list_(pa.string())}
+        schema = pa.schema([(name, types[kind]) for name, kind in SCHEMA], metadata={'version': str(STORE_VERSION)})
+        return pa.table(self.columns, schema=schema)
+
+    def order_by(self, keys: list, descending: bool = True) -> list:
+        """
+        按若干列排序，返回文件名列表。安装了 pyarrow 时使用向量化的 sort_indices，否则按行比较排序。
+
+        Args:
+            keys (list): 排序列，例如 ['digested', 'likes', 'create_time']。
+        """
+        if pa:
+            order = 'descending' if descending else 'ascending'
+            table = self.table()
+            indices = pc.sort_indices(table, sort_keys=[(key, order) for key in keys])
+            return table.column('filename').take(indices).to_pylist()
+        key_columns = [self.columns[key] for key in keys]
+        rows = sorted(range(len(self)), key=lambda row: tuple(column[row] for column in key_columns), reverse=descending)
+        filenames = self.columns['filename']
+        return [filenames[row] for row in rows]
+
+
+def open_store(md_dir: str, log_callback=None) -> MetadataStore:
+    """打开某个目录的元数据表并与目录中的文件同步，有变化时立即保存。"""
+    store = MetadataStore(md_dir)
+    store.sync(log_callback)
+    store.save()
+    return store
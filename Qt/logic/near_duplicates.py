@@ -0,0 +1,211 @@
+import os
+import re
+import json
+import time
+import base64
+import random
+import hashlib
+import argparse
+from array import array
+
+try:
+    from . import front_matter
+    from .atomic_io import atomic_open
+except ImportError:  # 作为独立脚本运行时
+    import front_matter
+    from atomic_io import atomic_open
+
+# --- 近似重复检测配置 ---
+CACHE_FILENAME = '.near_dups.json'   # raw目录下的签名缓存，按 mtime/size 判断文件是否变化
+CACHE_VERSION = 1
+SHINGLE_SIZE = 5                     # 字符级 shingle 长度（中文没有空格分词，按字符切分更稳定）
+NUM_BINS = 128                       # MinHash 签名长度
+BANDS = 16                           # LSH 分段数，BANDS * ROWS 必须等于 NUM_BINS
+ROWS = 8                             # 每段的行数；候选阈值约为 (1/BANDS)^(1/ROWS) ≈ 0.71
+DUPLICATE_THRESHOLD = 0.8            # 候选对的签名相似度达到此值才视为近似重复
+MIN_TEXT_CHARS = 10                  # 去掉链接和标点后少于此长度的帖子不参与检测
+
+TEXT_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff]+|[a-z0-9]+')   # 与 search_index 的分词字符集一致
+URL_RE = re.compile(r'https?://\S+|\]\([^)]*\)')                   # 链接地址和 Markdown 链接/图片目标
+DENSIFY_STEP = 0x9E3779B1            # 空桶借用相邻桶的值时加上的偏移，避免不同桶取值相同
+UINT32_MASK = 0xFFFFFFFF
+
+assert BANDS * ROWS == NUM_BINS
+
+
+def normalize_text(text: str) -> str:
+    """去掉链接、标点和空白，只保留中文、英文和数字（英文转小写）。"""
+    return ''.join(TEXT_RE.findall(URL_RE.sub(' ', text or '').lower()))
+
+def compute_signature(text: str):
+    """
+    计算文本的 MinHash 签名（array('I')，长度 NUM_BINS）；文本过短时返回 None。
+
+    使用单次哈希的 MinHash（one permutation hashing）：每个 shingle 只计算一次哈希，
+    按哈希值分到 NUM_BINS 个桶中各取最小值，空桶借用右侧最近的非空桶（rotation densification）。
+    估计的 Jaccard 相似度与传统的 NUM_BINS 次独立哈希相当，但计算量只有其 1/NUM_BINS，纯 Python 也足够快。
+    """
+    normalized = normalize_text(text)
+    if len(normalized) < MIN_TEXT_CHARS:
+        return None
+    shingles = {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+    bins = [None] * NUM_BINS
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little')
+        index = h % NUM_BINS
+        value = (h // NUM_BINS) & UINT32_MASK
+        if bins[index] is None or value < bins[index]:
+            bins[index] = value
+    signature = array('I', bytes(4 * NUM_BINS))
+    for index in range(NUM_BINS):
+        distance = 0
+        while bins[(index + distance) % NUM_BINS] is None:
+            distance += 1
+        signature[index] = (bins[(index + distance) % NUM_BINS] + distance * DENSIFY_STEP) & UINT32_MASK
+    return signature
+
+def estimate_similarity(a, b) -> float:
+    """由两个签名估计 Jaccard 相似度（相同位置取值相等的比例）。"""
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_BINS
+
+def _encode(signature) -> str:
+    return base64.b64encode(signature.tobytes()).decode('ascii')
+
+def _decode(text: str):
+    signature = array('I')
+    signature.frombytes(base64.b64decode(text))
+    return signature
+
+def load_signatures(md_dir: str, log_callback=print) -> dict:
+    """
+    计算目录中所有 .md 帖子正文的签名。签名缓存在目录下的 CACHE_FILENAME 中，
+    只有新增或变化的文件才会重新读取。
+
+    Returns:
+        dict: {文件名: 签名}，正文过短的帖子不包含在内。
+    """
+    cache_path = os.path.join(md_dir, CACHE_FILENAME)
+    entries = {}
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if cache.get('version') == CACHE_VERSION:
+            entries = cache.get('entries', {})
+    except (OSError, ValueError):
+        entries = {}
+
+    live = {}
+    computed = 0
+    for entry in os.scandir(md_dir):
+        if not entry.name.endswith('.md'):
+            continue
+        stat = entry.stat()
+        cached = entries.get(entry.name)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            live[entry.name] = cached
+            continue
+        try:
+            signature = compute_signature(front_matter.load(entry.path).content)
+        except Exception as e:
+            log_callback(f"  - [去重] 读取 {entry.name} 失败，跳过: {e}")
+            continue
+        live[entry.name] = [stat.st_mtime_ns, stat.st_size, _encode(signature) if signature else None]
+        computed += 1
+
+    if computed or len(live) != len(entries):
+        with atomic_open(cache_path) as f:
+            json.dump({'version': CACHE_VERSION, 'entries': live}, f, separators=(',', ':'))
+    return {name: _decode(encoded) for name, (_, _, encoded) in live.items() if encoded}
+
+def find_clusters(signatures: dict, threshold: float = DUPLICATE_THRESHOLD) -> list:
+    """
+    用 LSH 分段找出近似重复的帖子簇。
+
+    签名切成 BANDS 段，任意一段完全相同的帖子落入同一个桶成为候选；每个桶内只与桶中第一篇比较
+    并用并查集合并，因此总比较次数与帖子数近似线性，而不是两两比较的平方级。
+
+    Returns:
+        list: 帖子簇列表（每簇至少两篇），簇内和簇间均按文件名排序。
+    """
+    names = sorted(signatures)
+    parent = list(range(len(names)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    raw = [signatures[name].tobytes() for name in names]
+    width = ROWS * signatures[names[0]].itemsize if names else 0
+    for band in range(BANDS):
+        buckets = {}
+        for i, data in enumerate(raw):
+            buckets.setdefault(data[band * width:(band + 1) * width], []).append(i)
+        for members in buckets.values():
+            first = members[0]
+            for other in members[1:]:
+                root_a, root_b = find(first), find(other)
+                if root_a != root_b and estimate_similarity(signatures[names[first]], signatures[names[other]]) >= threshold:
+                    parent[root_b] = root_a
+
+    groups = {}
+    for i, name in enumerate(names):
+        groups.setdefault(find(i), []).append(name)
+    return sorted((group for group in groups.values() if len(group) > 1), key=lambda group: group[0])
+
+def find_near_duplicates(md_dir: str, log_callback=print) -> list:
+    """计算（或从缓存读取）目录中所有帖子的签名并返回近似重复簇。"""
+    start = time.perf_counter()
+    signatures = load_signatures(md_dir, log_callback)
+    clusters = find_clusters(signatures)
+    duplicates = sum(len(cluster) - 1 for cluster in clusters)
+    log_callback(f"  - [去重] 检查了 {len(signatures)} 篇帖子，发现 {len(clusters)} 组近似重复（可复用结果的帖子 {duplicates} 篇），"
+                 f"耗时 {time.perf_counter() - start:.2f} 秒。")
+    return clusters
+
+def pick_representative(cluster: list, processed: set, sort_key) -> str:
+    """选出簇的代表帖：优先选已经完成AI处理的帖子，其次按 sort_key 最小者（通常为最早发布）。"""
+    done = [name for name in cluster if name in processed]
+    return min(done or cluster, key=sort_key)
+
+def benchmark(num_posts: int = 20000, duplicate_ratio: float = 0.3, log_callback=print):
+    """在合成数据上测量签名计算和 LSH 聚类的耗时，并检查植入的近似重复是否被找回。"""
+    rng = random.Random(0)
+    vocabulary = [chr(c) for c in range(0x4e00, 0x4e00 + 3000)]
+    originals = [''.join(rng.choices(vocabulary, k=rng.randint(80, 400))) for _ in range(int(num_posts * (1 - duplicate_ratio)))]
+    texts = {f'{i}.md': text for i, text in enumerate(originals)}
+    planted = {}
+    for i in range(len(originals), num_posts):
+        source = rng.randrange(len(originals))
+        text = list(originals[source])
+        for _ in range(max(1, len(text) // 100)):    # 约 1% 的字符被替换，模拟转发时的少量改动
+            text[rng.randrange(len(text))] = rng.choice(vocabulary)
+        texts[f'{i}.md'] = ''.join(text)
+        planted[f'{i}.md'] = f'{source}.md'
+
+    start = time.perf_counter()
+    signatures = {name: compute_signature(text) for name, text in texts.items()}
+    signature_time = time.perf_counter() - start
+    start = time.perf_counter()
+    clusters = find_clusters(signatures)
+    cluster_time = time.perf_counter() - start
+
+    cluster_of = {name: i for i, cluster in enumerate(clusters) for name in cluster}
+    found = sum(1 for copy, source in planted.items() if copy in cluster_of and cluster_of[copy] == cluster_of.get(source))
+    log_callback(f"{num_posts} 篇帖子: 签名 {signature_time:.2f} 秒 ({signature_time / num_posts * 1e6:.0f} 微秒/篇)，"
+                 f"LSH 聚类 {cluster_time:.2f} 秒，找回植入的近似重复 {found}/{len(planted)}，共 {len(clusters)} 簇。")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='检测目录中近似重复的帖子，或在合成数据上进行基准测试。')
+    parser.add_argument('md_dir', nargs='?', help='包含 .md 帖子的目录，例如 Qt/output/raw_md')
+    parser.add_argument('--benchmark', type=int, metavar='N', help='在 N 篇合成帖子上测试')
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark(args.benchmark)
+    elif args.md_dir:
+        for cluster in find_near_duplicates(args.md_dir):
+            print(' '.join(cluster))
+    else:
+        parser.print_help()
@@ -0,0 +1,314 @@
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import socket
+import argparse
+import http.server
+import email.utils
+import functools
+import urllib.parse
+
+try:
+    from .archive_db import DB_FILENAME, ORDERS, ArchiveDB
+    from .compression import COMPRESSIBLE_SUFFIXES, ENCODING_SUFFIXES
+except ImportError:  # 作为独立脚本运行时
+    from archive_db import DB_FILENAME, ORDERS, ArchiveDB
+    from compression import COMPRESSIBLE_SUFFIXES, ENCODING_SUFFIXES
+
+# --- 预览服务器配置 ---
+DEFAULT_PORT = 8000
+COPY_CHUNK_SIZE = 256 * 1024
+# 页面、索引和分片的URL不变但内容会随构建变化，要求浏览器每次用 ETag 重新验证
+REVALIDATE_SUFFIXES = ('.html', '.json', '.js', '.css')
+ASSET_MAX_AGE = 86400          # 图片、附件等资源的缓存时间(秒)
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+SEARCH_API_PATH = '/api/search'   # 检索接口，由 SQLite 检索库提供（见 archive_db.py），未导出检索库时不启用
+SEARCH_API_MAX_LIMIT = 100        # 检索接口单次返回的最大结果数
+
+
+class PreviewRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """
+    静态站点请求处理器：在标准处理器基础上增加
+    预压缩文件(br/gzip)协商、ETag/Last-Modified 条件请求、Cache-Control 以及单段 Range 请求。
+    """
+
+    protocol_version = 'HTTP/1.1'   # 支持长连接，一个页面的多个分片请求可复用连接
+    log_callback = None             # 设置后访问日志/错误经由此回调输出，否则沿用默认的 stderr
+    search_db = None                # 检索库路径，设置后提供 SEARCH_API_PATH 接口
+
+    def log_message(self, format, *args):
+        if self.log_callback:
+            self.log_callback(f"[预览服务器] {self.address_string()} {format % args}")
+        else:
+            super().log_message(format, *args)
+
+    def log_request(self, code='-', size='-'):
+        # 只记录错误请求，避免大量分片请求刷屏
+        if isinstance(code, int) and code >= 400:
+            super().log_request(code, size)
+
+    def do_GET(self):
+        if self.search_db and urllib.parse.urlsplit(self.path).path == SEARCH_API_PATH:
+            self.serve_search()
+            return
+        self.serve(head_only=False)
+
+    def do_HEAD(self):
+        self.serve(head_only=True)
+
+    def send_json(self, code: int, data):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def serve_search(self):
+        """
+        检索接口：GET /api/search?q=关键词&tag=&topic=&author=&since=&until=&min_likes=&digested=1&order=rank|time|likes&limit=&offset=
+        返回 {"query", "results", "elapsed_ms"}，results 的格式见 ArchiveDB.search。
+        """
+        params = {key: values[-1] for key, values in urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query).items()}
+        try:
+            kwargs = {
+                'limit': max(1, min(int(params.get('limit', 20)), SEARCH_API_MAX_LIMIT)),
+                'offset': max(0, int(params.get('offset', 0))),
+                'min_likes': int(params.get('min_likes', 0)),
+                'order': params.get('order', 'rank'),
+            }
+        except ValueError:
+            self.send_json(400, {'error': 'limit、offset 和 min_likes 必须是整数'})
+            return
+        if kwargs['order'] not in ORDERS:
+            self.send_json(400, {'error': f"order 必须是 {', '.join(ORDERS)} 之一"})
+            return
+        for key in ('tag', 'topic', 'author', 'since', 'until'):
+            kwargs[key] = params.get(key) or None
+        if 'digested' in params:
+            kwargs['digested'] = params['digested'] not in ('0', 'false', '')
+        query = params.get('q', '')
+        start = time.perf_counter()
+        try:
+            with ArchiveDB(self.search_db, readonly=True) as db:   # 每个请求线程使用自己的只读连接
+                results = db.search(query, **kwargs)
+        except sqlite3.Error as e:
+            self.send_json(503, {'error': f"检索库不可用: {e}"})
+            return
+        self.send_json(200, {'query': query, 'results': results, 'elapsed_ms': round((time.perf_counter() - start) * 1000, 2)})
+
+    def resolve_path(self):
+        """将请求路径映射为本地文件路径；目录映射到 index.html。返回 None 表示已发送响应（重定向或 404）。"""
+        # 以 . 开头的文件和目录（构建缓存、预压缩清单、完成标记等）只供内部使用，不对外提供
+        url_path = urllib.parse.unquote(urllib.parse.urlsplit(self.path).path)
+        if any(part.startswith('.') for part in url_path.split('/')):
+            self.send_error(404, "File not found")
+            return None
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            parts = urllib.parse.urlsplit(self.path)
+            if not parts.path.endswith('/'):
+                location = urllib.parse.urlunsplit((parts[0], parts[1], parts[2] + '/', parts[3], parts[4]))
+                self.send_response(301)
+                self.send_header('Location', location)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return None
+            path = os.path.join(path, 'index.html')
+        return path
+
+    def choose_variant(self, path: str, source_stat: os.stat_result):
+        """按 Accept-Encoding 选择预压缩版本；压缩文件比源文件旧时不使用。"""
+        if not path.endswith(COMPRESSIBLE_SUFFIXES):
+            return None, path
+        accepted = {token.split(';')[0].strip().lower() for token in self.headers.get('Accept-Encoding', '').split(',')}
+        for encoding, suffix in ENCODING_SUFFIXES:
+            if encoding not in accepted:
+                continue
+            try:
+                if os.stat(path + suffix).st_mtime_ns >= source_stat.st_mtime_ns:
+                    return encoding, path + suffix
+            except OSError:
+                continue
+        return None, path
+
+    def is_not_modified(self, etag: str, mtime: float) -> bool:
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            return '*' in tags or etag in tags or ('W/' + etag) in tags
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(mtime) <= int(since)
+        return False
+
+    def parse_range(self, size: int, etag: str, mtime: float):
+        """
+        解析单段 Range 请求头。
+
+        Returns:
+            tuple 或 None 或 False: (start, end) 闭区间；None 表示返回完整内容；False 表示范围无法满足。
+        """
+        range_header = self.headers.get('Range')
+        if not range_header:
+            return None
+        if_range = self.headers.get('If-Range')
+        if if_range and if_range.strip() != etag and if_range.strip() != email.utils.formatdate(mtime, usegmt=True):
+            return None  # 资源已变化，按规范返回完整内容
+        match = RANGE_RE.match(range_header.strip())
+        if not match or match.groups() == ('', ''):
+            return None  # 多段范围等不支持的格式，退回完整内容
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            if last and int(last) < start:
+                return None  # 语法无效的范围（如 bytes=5-3），按 RFC 9110 忽略 Range，返回完整内容
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            if int(last) == 0:
+                return False  # bytes=-0 不包含任何字节
+            start = max(0, size - int(last))   # 后缀范围：最后N个字节
+            end = size - 1
+        if start >= size:
+            return False  # 范围有效，但超出了文件大小
+        return start, end
+
+    def serve(self, head_only: bool):
+        path = self.resolve_path()
+        if path is None:
+            return
+        try:
+            source_stat = os.stat(path)
+        except OSError:
+            self.send_error(404, "File not found")
+            return
+        if not os.path.isfile(path):
+            self.send_error(404, "File not found")
+            return
+
+        # Range 请求始终基于原始内容，不与压缩版本混用
+        encoding, variant_path = (None, path) if self.headers.get('Range') else self.choose_variant(path, source_stat)
+        stat = source_stat if variant_path == path else os.stat(variant_path)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+        last_modified = email.utils.formatdate(source_stat.st_mtime, usegmt=True)
+
+        def send_common_headers():
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', last_modified)
+            self.send_header('Accept-Ranges', 'bytes')
+            if path.endswith(REVALIDATE_SUFFIXES):
+                self.send_header('Cache-Control', 'no-cache')
+            else:
+                self.send_header('Cache-Control', f'public, max-age={ASSET_MAX_AGE}')
+            if path.endswith(COMPRESSIBLE_SUFFIXES):
+                self.send_header('Vary', 'Accept-Encoding')
+
+        if self.is_not_modified(etag, source_stat.st_mtime):
+            self.send_response(304)
+            send_common_headers()
+            self.end_headers()
+            return
+
+        byte_range = self.parse_range(stat.st_size, etag, source_stat.st_mtime)
+        if byte_range is False:
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{stat.st_size}')
+            self.send_header('Content-Length', '0')
+            send_common_headers()
+            self.end_headers()
+            return
+
+        start, end = byte_range if byte_range else (0, stat.st_size - 1)
+        length = end - start + 1 if stat.st_size else 0
+        try:
+            f = open(variant_path, 'rb')
+        except OSError:
+            self.send_error(404, "File not found")
+            return
+        with f:
+            self.send_response(206 if byte_range else 200)
+            self.send_header('Content-Type', self.guess_type(path))
+            self.send_header('Content-Length', str(length))
+            if byte_range:
+                self.send_header('Content-Range', f'bytes {start}-{end}/{stat.st_size}')
+            if encoding:
+                self.send_header('Content-Encoding', encoding)
+            send_common_headers()
+            self.end_headers()
+            if head_only or length == 0:
+                return
+            f.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = f.read(min(COPY_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+
+
+class PreviewServer(http.server.ThreadingHTTPServer):
+    """多线程预览服务器：每个连接一个线程，大文件下载不会阻塞其他请求。"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def find_search_db(directory: str):
+    """web_ 目录对应的 processed_ 目录中的检索库路径，尚未导出时返回 None。"""
+    directory = os.path.abspath(directory)
+    processed_dir = os.path.join(os.path.dirname(directory), os.path.basename(directory).replace('web_', 'processed_', 1))
+    path = os.path.join(processed_dir, DB_FILENAME)
+    return path if os.path.exists(path) else None
+
+def create_preview_server(directory: str, port: int = DEFAULT_PORT, bind: str = '', log_callback=None, search_db: str = None) -> PreviewServer:
+    """
+    创建（但不启动）指向 directory 的预览服务器。默认监听所有网卡，局域网内其他设备也可访问。
+    指定 search_db（检索库路径）时同时提供 SEARCH_API_PATH 检索接口。
+    调用方负责 serve_forever() / shutdown()。
+    """
+    handler_class = type('BoundPreviewRequestHandler', (PreviewRequestHandler,),
+                         {'log_callback': staticmethod(log_callback), 'search_db': search_db})
+    handler = functools.partial(handler_class, directory=directory)
+    return PreviewServer((bind, port), handler)
+
+def lan_addresses(port: int) -> list:
+    """返回本机可供局域网访问的URL列表（尽力而为，获取失败时返回空列表）。"""
+    addresses = set()
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.connect(('10.255.255.255', 1))  # 不会真正发送数据，仅用于确定出口网卡地址
+            addresses.add(s.getsockname()[0])
+    except OSError:
+        pass
+    return [f"http://{address}:{port}" for address in sorted(addresses) if not address.startswith('127.')]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="知识星球归档网站的本地预览服务器")
+    parser.add_argument('directory', help="web输出目录，例如 Qt/output/web_md")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--bind', default='', help="监听地址，默认监听所有网卡")
+    parser.add_argument('--search-db', help="检索库路径，默认使用对应 processed_ 目录中已导出的检索库")
+    args = parser.parse_args()
+    search_db = args.search_db or find_search_db(args.directory)
+    server = create_preview_server(os.path.abspath(args.directory), args.port, args.bind, search_db=search_db)
+    print(f"预览服务器已在 http://localhost:{args.port} 启动")
+    if search_db:
+        print(f"检索接口: http://localhost:{args.port}{SEARCH_API_PATH}?q=关键词")
+    for url in lan_addresses(args.port):
+        print(f"局域网访问地址: {url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        sys.exit(0)
@@ -1,13 +1,32 @@
 import os
-import frontmatter
 import openai
-import json
 import time
-import re
 import traceback
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import threading
+from collections import deque
+
+try:
+    from . import front_matter
+    from . import job_runner
+    from . import profiling
+    from .atomic_io import OutputWriter, atomic_write, atomic_copy
+    from .llm_pool import ProviderPool, RequestCancelled, load_endpoints, ENDPOINTS_FILENAME, TRANSIENT_ERRORS
+    from .local_classifier import LocalClassifier, LABEL_SOURCE_FIELD, LOCAL_LABEL
+    from .metadata_store import open_store
+    from .near_duplicates import find_near_duplicates, pick_representative
+    from .structured_output import StreamingJSONValidator, OffSchemaError, STRING, STRING_LIST
+except ImportError:  # 作为独立脚本运行时
+    import front_matter
+    import job_runner
+    import profiling
+    from atomic_io import OutputWriter, atomic_write, atomic_copy
+    from llm_pool import ProviderPool, RequestCancelled, load_endpoints, ENDPOINTS_FILENAME, TRANSIENT_ERRORS
+    from local_classifier import LocalClassifier, LABEL_SOURCE_FIELD, LOCAL_LABEL
+    from metadata_store import open_store
+    from near_duplicates import find_near_duplicates, pick_representative
+    from structured_output import StreamingJSONValidator, OffSchemaError, STRING, STRING_LIST
 
 # --- 配置 ---
 # API 配置现在从调用参数获取，这些作为后备或说明
@@ -71,6 +90,26 @@ OFFICIAL_TAGS_PRO = [
 
 OFFICIAL_TOPICS = OFFICIAL_TOPICS_PRO # 使用进阶版
 OFFICIAL_TAGS = OFFICIAL_TAGS_PRO # 使用进阶版标签
+# 4. 调度配置
+AI_STATE_FILENAME = '.ai_done' # 已处理完成的文件清单（每行一个文件名），用于廉价地预先过滤
+MAX_IN_FLIGHT_FACTOR = 2 # 同时在线程池中排队的任务数 = 并发数 * 此系数
+DEDUP_ENABLED = True # 近似重复的帖子（转发、公告、打卡等）只对代表帖调用AI，其余复制代表帖的结果
+AI_RESULT_FIELDS = ['tags', 'digest', 'topic'] # AI生成的字段，复用代表帖结果时复制这些字段
+STATS_FIELDS = ['likes', 'comments_count', 'digested'] # 抓取器刷新模式更新的互动数据字段（与 zsxq_crawler.STATS_FIELDS 一致）
+# 5. AI输出格式与重试
+AI_JSON_MODE = True # 请求服务商的JSON输出模式（response_format=json_object）；服务商不支持时自动改用普通模式
+AI_STREAM = True # 流式接收AI输出并逐段校验，一旦偏离约定的JSON结构立即中止、重试，不必等它生成完
+AI_MAX_ATTEMPTS = 3 # 每篇帖子最多请求AI的次数（结构不符、网络错误、限流都计入），仍失败的帖子下次运行时重新处理
+AI_RETRY_DELAY_SEC = 1 # 网络错误/限流后的重试等待时间，按已尝试次数递增；结构不符时立即重试
+CHARS_PER_TOKEN = 1.5 # 中止的请求拿不到用量统计时，按此估算提示词的词元数
+# AI结果的JSON结构。长度上限比提示词中的要求宽松，只用于尽早发现跑偏的输出
+AI_RESULT_SCHEMA = {
+    'tags': {'type': STRING_LIST, 'max_items': 10, 'max_length': 30},
+    'digest': {'type': STRING, 'max_length': 200},
+    'topic': {'type': STRING, 'max_length': 30},
+}
+LOCAL_CLASSIFIER_ENABLED = True # 本地分类器有把握时直接标注，跳过AI调用（阈值按验证集准确率自动确定，见 local_classifier.py）
+
 SIMILARITY_THRESHOLD = 2 # 主题相似度阈值，编辑距离小于等于此值则被标准化
 TAG_SIMILARITY_THRESHOLD = 1 # 标签相似度阈值，更严格
 AI_PROMPT_TEMPLATE = """
@@ -94,61 +133,172 @@ AI_PROMPT_TEMPLATE = """
 
 # --- 核心功能 ---
 
-def get_ai_analysis(content: str, base_url: str, api_key: str, log_callback=print) -> dict:
+class AICallStats:
+    """AI调用的请求次数、失败原因和浪费的词元数（被中止或结果无效的请求消耗的词元），多线程共享。"""
+
+    REASONS = {'off_schema': '输出结构不符', 'transient': '网络错误/限流', 'json_mode': '不支持JSON模式',
+               'stream_usage': '不支持流式用量统计', 'error': '其他错误', 'hedge': '对冲请求落选'}
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.posts = 0
+        self.requests = 0
+        self.failed_posts = 0
+        self.failed_requests = dict.fromkeys(self.REASONS, 0)
+        self.tokens = 0
+        self.wasted_tokens = 0
+
+    def record(self, tokens: int, reason: str = None):
+        """记录一次请求；reason 为 None 表示请求得到了有效结果，否则为 REASONS 中的失败原因。"""
+        with self.lock:
+            self.requests += 1
+            self.tokens += tokens
+            if reason is not None:
+                self.wasted_tokens += tokens
+                self.failed_requests[reason] += 1
+
+    def finish_post(self, succeeded: bool):
+        with self.lock:
+            self.posts += 1
+            self.failed_posts += not succeeded
+
+    def report(self, log_callback=print):
+        if not self.posts:
+            return
+        failures = '，'.join(f"{name} {self.failed_requests[reason]} 次" for reason, name in self.REASONS.items())
+        wasted_ratio = self.wasted_tokens / self.tokens if self.tokens else 0.0
+        log_callback(f"[AI调用] 帖子 {self.posts} 篇，请求 {self.requests} 次（平均每篇 {self.requests / self.posts:.2f} 次；{failures}），"
+                     f"最终失败 {self.failed_posts} 篇；浪费词元约 {self.wasted_tokens}（占 {wasted_ratio:.1%}）。")
+
+
+_json_mode_unsupported = set() # 不支持JSON输出模式的 base_url，同一进程内不再尝试
+_stream_usage_unsupported = set() # 不支持 stream_options（流式输出末尾附带用量）的 base_url，同一进程内不再尝试
+
+
+class JSONModeUnsupported(Exception):
+    """端点拒绝了 response_format 参数。"""
+
+
+class StreamUsageUnsupported(Exception):
+    """端点拒绝了 stream_options 参数。"""
+
+
+def request_completion(client, prompt: str, json_mode: bool, validator, attempt: dict, cancel=None, stream_usage: bool = True):
     """
-    调用 DeepSeek API 对给定内容进行分析，返回标签和主题。
-    返回一个包含'tags'和'theme'的字典，失败则返回空字典。
+    发送一次补全请求，把输出逐段交给 validator 检查；偏离结构时抛出 OffSchemaError 并立即断开连接。
+    attempt 中记录这次请求的输出片段数和服务端返回的用量（如果有），请求中途失败时也可据此统计词元。
+    cancel（threading.Event）被设置时（对冲的另一个请求已先完成）抛出 RequestCancelled。
+    stream_usage 为 False 时不请求流式用量，由调用方按输出片段数估算词元。
     """
-    start_time = time.time()
-    if not api_key or "sk-" not in api_key:
-        log_callback("  - [错误] API密钥未配置或格式不正确。")
-        return {}
+    kwargs = {'model': AI_MODEL, 'messages': [{"role": "user", "content": prompt}], 'temperature': 0.2}
+    if json_mode:
+        kwargs['response_format'] = {'type': 'json_object'}
+    if not AI_STREAM:
+        response = client.chat.completions.create(**kwargs)
+        attempt['usage'] = response.usage
+        validator.feed(response.choices[0].message.content or '')
+        return
+    if stream_usage:
+        kwargs['stream_options'] = {'include_usage': True}
+    stream = client.chat.completions.create(stream=True, **kwargs)
+    try:
+        for chunk in stream:
+            if cancel is not None and cancel.is_set():
+                raise RequestCancelled()
+            if chunk.usage:
+                attempt['usage'] = chunk.usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                attempt['chunks'] += 1   # 流式输出每个片段约为一个词元
+                if validator.feed(chunk.choices[0].delta.content):
+                    break   # 对象已完整，之后的输出（说明文字、代码块结束标记）不再需要
+    finally:
+        stream.close()
+
+def get_ai_analysis(content: str, llm_pool, log_callback=print, call_stats=None) -> dict:
+    """
+    通过端点池（见 llm_pool.py）调用AI对给定内容进行分析，返回包含 'tags'、'digest'、'topic' 的字典，失败则返回空字典。
 
-    client = openai.OpenAI(
-        api_key=api_key,
-        base_url=base_url
-    )
+    优先使用服务商的JSON输出模式，并流式校验输出：出现语法错误、未知字段、类型不符或超长时立即中止并重试。
+    结构不符立即重试，网络错误和限流等待后重试（端点池会避开失败的端点），最多 AI_MAX_ATTEMPTS 次。
+    提供 call_stats 时记录请求次数和浪费的词元（包括落选的对冲请求）。
+    """
+    start_time = time.time()
     prompt = AI_PROMPT_TEMPLATE.format(
         topics_list=OFFICIAL_TOPICS,
         content=content
     )
-    
-    retry_count = 0
-    while True:
+    call_stats = call_stats or AICallStats()
+
+    for attempt_number in range(1, AI_MAX_ATTEMPTS + 1):
+        attempts = [] # 本轮发出的请求（对冲时有两个）
+
+        def run_request(endpoint, cancel):
+            json_mode = AI_JSON_MODE and endpoint.base_url not in _json_mode_unsupported
+            stream_usage = endpoint.base_url not in _stream_usage_unsupported
+            validator = StreamingJSONValidator(AI_RESULT_SCHEMA)
+            attempt = {'chunks': 0, 'usage': None}
+            attempts.append(attempt)
+            try:
+                request_completion(endpoint.client, prompt, json_mode, validator, attempt, cancel, stream_usage)
+            except (openai.BadRequestError, openai.UnprocessableEntityError) as e:
+                if json_mode and 'response_format' in str(e):
+                    _json_mode_unsupported.add(endpoint.base_url)
+                    raise JSONModeUnsupported(endpoint.name) from e
+                if AI_STREAM and stream_usage and ('stream_options' in str(e) or 'include_usage' in str(e)):
+                    _stream_usage_unsupported.add(endpoint.base_url)
+                    raise StreamUsageUnsupported(endpoint.name) from e
+                raise
+            attempt['result'] = validator.result()
+            attempt['text'] = validator.text
+            return attempt
+
+        winner = None
+        retry_reason = None
+        retry_delay = 0
         try:
-            log_callback(f"  - [{datetime.now().strftime('%H:%M:%S')}] 正在调用DeepSeek AI进行分析...")
-            response = client.chat.completions.create(
-                model=AI_MODEL,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2,
-            )
-            
-            result_text = response.choices[0].message.content
-            log_callback(f"  - [{datetime.now().strftime('%H:%M:%S')}] AI返回原始结果: {result_text}")
-            
-            # 1. 增强JSON解析：使用正则表达式从返回文本中提取JSON对象
-            json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
-            if not json_match:
-                log_callback(f"  - [{datetime.now().strftime('%H:%M:%S')}] [警告] AI返回的内容中找不到JSON对象，正在重试...")
-                time.sleep(2)
-                continue
-
-            json_string = json_match.group(0)
-            analysis_data = json.loads(json_string)
-            
-            # --- 核心修复：放宽对AI返回结果的校验 ---
-            # 不再要求所有字段必须存在。只要返回的是合法JSON，就接受。
-            # 主循环中的 .get() 会优雅地处理可能缺失的字段。
+            log_callback(f"  - [{datetime.now().strftime('%H:%M:%S')}] 正在调用AI进行分析...")
+            with profiling.phase('llm_wait'):
+                winner, endpoint = llm_pool.execute(run_request)
+            log_callback(f"  - [{datetime.now().strftime('%H:%M:%S')}] AI返回原始结果 ({endpoint.name}): {winner['text']}")
+        except OffSchemaError as e:
+            retry_reason = 'off_schema'
+            log_callback(f"  - [{datetime.now().strftime('%H:%M:%S')}] [警告] AI输出偏离约定的JSON结构，已中止: {e}")
+        except TRANSIENT_ERRORS as e:
+            retry_reason = 'transient'
+            retry_delay = AI_RETRY_DELAY_SEC * attempt_number
+            log_callback(f"  - [{datetime.now().strftime('%H:%M:%S')}] [警告] 调用AI接口时发生暂时性错误: {e}")
+        except JSONModeUnsupported as e:
+            retry_reason = 'json_mode'
+            log_callback(f"  - [{datetime.now().strftime('%H:%M:%S')}] [警告] 端点 {e} 不支持JSON输出模式，改用普通模式。")
+        except StreamUsageUnsupported as e:
+            retry_reason = 'stream_usage'
+            log_callback(f"  - [{datetime.now().strftime('%H:%M:%S')}] [警告] 端点 {e} 不支持 stream_options，改为不请求用量（词元数按输出估算）。")
+        except Exception as e:
+            retry_reason = 'error'
+            log_callback(f"  - [{datetime.now().strftime('%H:%M:%S')}] [错误] 调用AI接口时发生错误: {e}")
+
+        for attempt in attempts:
+            usage = attempt['usage']
+            if usage is not None:
+                tokens = usage.total_tokens
+            else:
+                tokens = int(len(prompt) / CHARS_PER_TOKEN) + attempt['chunks']
+            call_stats.record(tokens, None if attempt is winner else (retry_reason or 'hedge'))
+        if winner is not None:
             elapsed_time = time.time() - start_time
             log_callback(f"  - [{datetime.now().strftime('%H:%M:%S')}] AI分析完成，已解析JSON。耗时: {elapsed_time:.2f}秒")
-            return analysis_data
-
-        except json.JSONDecodeError:
-            log_callback(f"  - [{datetime.now().strftime('%H:%M:%S')}] [警告] AI返回的不是有效的JSON，正在重试...")
-            time.sleep(2)
-        except Exception as e:
-            log_callback(f"  - [{datetime.now().strftime('%H:%M:%S')}] [错误] 调用DeepSeek API时发生错误: {e}")
+            call_stats.finish_post(True)
+            return winner['result']
+        if retry_reason == 'error':   # 其他错误（如密钥无效、模型不存在）重试也无济于事
+            call_stats.finish_post(False)
             return {}
+        if attempt_number < AI_MAX_ATTEMPTS:
+            log_callback(f"  - [{datetime.now().strftime('%H:%M:%S')}] 正在重试 ({attempt_number + 1}/{AI_MAX_ATTEMPTS})...")
+            time.sleep(retry_delay)
+
+    log_callback(f"  - [{datetime.now().strftime('%H:%M:%S')}] [错误] 已请求 {AI_MAX_ATTEMPTS} 次仍未得到有效结果，放弃。")
+    call_stats.finish_post(False)
+    return {}
 
 def levenshtein_distance(s1, s2):
     if len(s1) < len(s2):
@@ -220,8 +370,20 @@ def normalize_tags(ai_tags: list, log_callback=print) -> list:
             
     return list(normalized_tags)
 
-def process_single_file(raw_filepath, processed_md_dir, base_url, api_key, log_callback):
-    """处理单个Markdown文件的完整逻辑"""
+def write_processed_file(processed_md_dir, filename, text, output_writer=None):
+    """原子写出处理后的文件；提供 output_writer 时同时记录完成标记。"""
+    if output_writer is not None:
+        return output_writer.write(filename, text)
+    path = os.path.join(processed_md_dir, filename)
+    atomic_write(path, text)
+    return path
+
+def process_single_file(raw_filepath, processed_md_dir, llm_pool, log_callback, metadata_store=None, output_writer=None, classifier=None, call_stats=None):
+    """
+    处理单个Markdown文件的完整逻辑。写出结果后同步更新 processed 目录的元数据表（如果提供）。
+    提供 output_writer 时，只有带完成标记的已处理文件才会被跳过，崩溃时写了一半的文件会重新处理。
+    提供 classifier 时，本地分类器有把握的帖子直接使用其预测结果，不再调用AI。
+    """
     filename = os.path.basename(raw_filepath)
     processed_filepath = os.path.join(processed_md_dir, filename)
     
@@ -230,11 +392,12 @@ def process_single_file(raw_filepath, processed_md_dir, base_url, api_key, log_c
     log_prefix = f"[线程-{thread_id_suffix:02d}]"
 
     # --- 核心修复：先检查目标目录中是否已存在处理好的文件 ---
-    if os.path.exists(processed_filepath):
+    already_written = output_writer.is_complete(filename) if output_writer is not None else os.path.exists(processed_filepath)
+    if already_written:
         try:
-            # 加载已处理的文件并检查元数据
-            processed_post = frontmatter.load(processed_filepath)
-            if all(k in processed_post.metadata for k in ['tags', 'digest', 'topic']) and processed_post.metadata.get('topic'):
+            # 只读取已处理文件的YAML头部检查元数据，不解析正文
+            processed_metadata = front_matter.read_front_matter(processed_filepath)
+            if all(k in processed_metadata for k in AI_RESULT_FIELDS) and processed_metadata.get('topic'):
                 log_callback(f"{log_prefix} [跳过] {filename} 在目标目录中已存在且已处理。")
                 return f"[跳过] {filename}"
         except Exception as e:
@@ -246,22 +409,44 @@ def process_single_file(raw_filepath, processed_md_dir, base_url, api_key, log_c
 
     try:
         # 加载原始文件进行处理
-        post = frontmatter.load(raw_filepath)
+        with profiling.phase('read'):
+            post = front_matter.load(raw_filepath)
         
+        prediction = None
+        if classifier is not None:
+            with profiling.phase('local_classifier'):
+                prediction = classifier.predict(post.content)
+            if classifier.should_skip_ai(filename, prediction):
+                post.metadata['tags'] = prediction['tags']
+                post.metadata['digest'] = prediction['digest']
+                post.metadata['topic'] = prediction['topic']
+                post.metadata[LABEL_SOURCE_FIELD] = LOCAL_LABEL
+                if 'theme' in post.metadata:
+                    del post.metadata['theme']
+                with profiling.phase('write'):
+                    write_processed_file(processed_md_dir, filename, front_matter.dumps(post), output_writer)
+                    if metadata_store is not None:
+                        metadata_store.upsert(filename, post.metadata, os.stat(processed_filepath))
+                return f"[本地] {filename} (主题: {prediction['topic']}, 置信度: {prediction['confidence']:.3f})"
+
         # 调用AI进行分析
         threaded_log_callback = lambda msg: log_callback(f"{log_prefix} {msg}")
-        analysis_result = get_ai_analysis(post.content, base_url, api_key, threaded_log_callback)
+        analysis_result = get_ai_analysis(post.content, llm_pool, threaded_log_callback, call_stats)
 
         if analysis_result:
-            ai_tags = analysis_result.get('tags', [])
-            normalized_tags = normalize_tags(ai_tags, threaded_log_callback)
+            with profiling.phase('normalize'):
+                ai_tags = analysis_result.get('tags', [])
+                normalized_tags = normalize_tags(ai_tags, threaded_log_callback)
 
-            ai_topic = analysis_result.get('topic', '未分类')
-            normalized_topic = normalize_topic(ai_topic, threaded_log_callback)
+                ai_topic = analysis_result.get('topic', '未分类')
+                normalized_topic = normalize_topic(ai_topic, threaded_log_callback)
 
             post.metadata['tags'] = normalized_tags
             post.metadata['digest'] = analysis_result.get('digest', '')
             post.metadata['topic'] = normalized_topic
+            post.metadata.pop(LABEL_SOURCE_FIELD, None)
+            if classifier is not None:
+                classifier.record_ai_result(filename, prediction, normalized_topic)
             
             # 兼容旧的'theme'字段，如果存在则移除
             if 'theme' in post.metadata:
@@ -269,11 +454,16 @@ def process_single_file(raw_filepath, processed_md_dir, base_url, api_key, log_c
         else:
             log_callback(f"{log_prefix} [失败] {filename} 未能从AI获取有效分析结果。")
 
-        # 将处理后的文件写入目标目录
-        with open(processed_filepath, 'w', encoding='utf-8') as f:
-            f.write(frontmatter.dumps(post))
+        # 将处理后的文件原子写入目标目录
+        with profiling.phase('write'):
+            write_processed_file(processed_md_dir, filename, front_matter.dumps(post), output_writer)
+            if metadata_store is not None:
+                metadata_store.upsert(filename, post.metadata, os.stat(processed_filepath))
 
         file_elapsed_time = time.time() - file_start_time
+        if not analysis_result:
+            # 文件虽已写出，但缺少AI字段，不能记为已完成，下次运行时会重新处理
+            return f"[失败] {filename} (AI未返回有效结果)"
         return f"[成功] {filename} (耗时: {file_elapsed_time:.2f}s)"
 
     except Exception as e:
@@ -282,18 +472,97 @@ def process_single_file(raw_filepath, processed_md_dir, base_url, api_key, log_c
         try:
             output_filepath = os.path.join(processed_md_dir, filename)
             if not os.path.exists(output_filepath):
-                import shutil
-                shutil.copy(raw_filepath, output_filepath)
+                if output_writer is not None:
+                    output_writer.copy(raw_filepath, filename)
+                else:
+                    atomic_copy(raw_filepath, output_filepath)
                 log_callback(f"{log_prefix} [补救] 已将原始文件 {filename} 复制到目标目录。")
         except Exception as copy_e:
             log_callback(f"{log_prefix} [严重错误] 复制原始文件 {filename} 时也失败: {copy_e}")
         
         return f"[失败] {filename} ({e})"
 
+def copy_ai_result(raw_filepath, representative_filepath, processed_md_dir, log_callback, metadata_store=None, output_writer=None):
+    """
+    近似重复的帖子直接复用代表帖的AI结果，不再调用AI。
+    写出的文件带有 'duplicate_of' 字段记录代表帖的 topic_id，构建网站时可据此折叠重复帖子。
+    """
+    filename = os.path.basename(raw_filepath)
+    processed_filepath = os.path.join(processed_md_dir, filename)
+    try:
+        representative = front_matter.read_front_matter(representative_filepath)
+        if not representative.get('topic'):
+            return f"[失败] {filename} (代表帖缺少AI结果)"
+        post = front_matter.load(raw_filepath)
+        for field in AI_RESULT_FIELDS:
+            post.metadata[field] = representative.get(field)
+        post.metadata['duplicate_of'] = str(representative.get('topic_id', ''))
+        if representative.get(LABEL_SOURCE_FIELD):
+            post.metadata[LABEL_SOURCE_FIELD] = representative[LABEL_SOURCE_FIELD]
+        else:
+            post.metadata.pop(LABEL_SOURCE_FIELD, None)
+        if 'theme' in post.metadata:
+            del post.metadata['theme']
+        write_processed_file(processed_md_dir, filename, front_matter.dumps(post), output_writer)
+        if metadata_store is not None:
+            metadata_store.upsert(filename, post.metadata, os.stat(processed_filepath))
+    except Exception as e:
+        log_callback(f"  - [警告] 复用 {filename} 的代表帖结果失败: {e}")
+        return f"[失败] {filename} ({e})"
+    return f"[复用] {filename} (与 {os.path.basename(representative_filepath)} 近似重复)"
 
-def run_ai_processing(source_folder_name: str, base_url: str, api_key: str, concurrency: int, log_callback=print):
+def load_done_state(processed_md_dir: str) -> set:
+    """读取已处理完成的文件名集合。状态文件不存在时返回空集合。"""
+    state_path = os.path.join(processed_md_dir, AI_STATE_FILENAME)
+    if not os.path.exists(state_path):
+        return set()
+    with open(state_path, 'r', encoding='utf-8') as f:
+        return {line.strip() for line in f if line.strip()}
+
+def sync_refreshed_stats(raw_md_dir, processed_md_dir, done_files, raw_store, processed_store, output_writer, log_callback):
+    """
+    抓取器的刷新模式遇到 processed_ 目录正被AI处理任务写入时只更新 raw_ 目录，由这里补上：
+    已处理帖子的互动数据与 raw_ 不一致时，用 raw_ 中的正文（含评论区）和互动数据重写，AI生成的字段保持不变。
+    比对只使用两个目录的元数据表，无需逐个读取文件。
     """
-    使用线程池并发处理指定目录中的所有原始MD文件。
+    synced = 0
+    for filename in done_files:
+        raw_row, processed_row = raw_store.get(filename), processed_store.get(filename)
+        if not raw_row or not processed_row or all(raw_row[field] == processed_row[field] for field in STATS_FIELDS):
+            continue
+        try:
+            metadata = front_matter.read_front_matter(os.path.join(processed_md_dir, filename))
+            post = front_matter.load(os.path.join(raw_md_dir, filename))
+            metadata.update({field: post.metadata.get(field) for field in STATS_FIELDS})
+            post.metadata = metadata
+            path = write_processed_file(processed_md_dir, filename, front_matter.dumps(post), output_writer)
+            processed_store.upsert(filename, post.metadata, os.stat(path))
+            synced += 1
+        except Exception as e:
+            log_callback(f"  - [警告] 同步 {filename} 的互动数据失败: {e}")
+    if synced:
+        log_callback(f"已将 {synced} 个已处理帖子的互动数据同步为 raw_ 目录中的最新值。")
+
+def schedule_files(raw_store, filepaths: list) -> list:
+    """
+    按价值对待处理文件排序：精华帖优先，其次点赞多的，再其次发布时间新的。
+    这样即使任务中途被中断，最有价值的内容也已经先完成了AI增强。
+    排序字段直接取自raw目录的列式元数据表，无需逐个读取文件。
+    """
+    by_name = {os.path.basename(path): path for path in filepaths}
+    return [by_name[name] for name in raw_store.order_by(['digested', 'likes', 'create_time']) if name in by_name]
+
+@profiling.profiled('ai')
+def run_ai_processing(source_folder_name: str, base_url: str, api_key: str, concurrency: int, log_callback=print, endpoints=None):
+    """
+    使用有界工作队列并发处理指定目录中的原始MD文件。
+
+    已完成的文件通过状态文件预先过滤，其余文件按优先级排序后逐个提交，
+    线程池中同时排队的任务数不超过 并发数 * MAX_IN_FLIGHT_FACTOR，结果完成即输出。
+    传入 profile=True 时开启性能分析，结束时写出报告（见 profiling.py）。
+
+    AI请求通过端点池发送：endpoints 为端点配置列表（见 llm_pool.load_endpoints）；未提供时使用 Qt 目录下的
+    ENDPOINTS_FILENAME（如果存在），否则只使用 base_url/api_key 这一个端点。
     """
     # 路径配置
     qt_dir = os.path.dirname(os.path.abspath(__file__))
@@ -317,41 +586,166 @@ def run_ai_processing(source_folder_name: str, base_url: str, api_key: str, conc
 
     start_time = time.time()
     
-    all_md_files_in_raw = [os.path.join(raw_md_dir, f) for f in os.listdir(raw_md_dir) if f.endswith('.md')]
-    total_files = len(all_md_files_in_raw)
+    all_md_files_in_raw = [entry.path for entry in os.scandir(raw_md_dir) if entry.name.endswith('.md')]
     
-    if total_files == 0:
+    if not all_md_files_in_raw:
         log_callback(f"目录 '{source_folder_name}' 中没有找到 .md 文件。")
         return
 
-    log_callback(f"开始检查 {total_files} 个文件的处理状态...")
-
-    processed_count = 0
-    
-    with ThreadPoolExecutor(max_workers=concurrency) as executor:
-        # 创建一个futures到文件名的映射
-        future_to_file = {executor.submit(process_single_file, filepath, processed_md_dir, base_url, api_key, log_callback): os.path.basename(filepath) for filepath in all_md_files_in_raw}
-        
-        for future in as_completed(future_to_file):
-            filepath = future_to_file[future]
-            try:
-                result_message = future.result()
+    # 先获取 processed_ 目录的写入锁：另一个任务（如刷新模式的抓取）正在写入时直接结束，不创建端点池
+    try:
+        processed_writer = OutputWriter(processed_md_dir, log_callback=log_callback)
+    except RuntimeError as e:
+        log_callback(f"错误：{e}")
+        return
+    llm_pool = None
+    try:
+        endpoints_path = os.path.join(project_root, ENDPOINTS_FILENAME)
+        if endpoints is None and os.path.exists(endpoints_path):
+            endpoints = load_endpoints(endpoints_path)
+            log_callback(f"使用端点配置 {endpoints_path}（界面中的 API Base URL 和密钥不再使用）")
+        if endpoints is None:
+            endpoints = [{'name': 'default', 'base_url': base_url, 'api_key': api_key}]
+        try:
+            llm_pool = ProviderPool.from_config(endpoints, log_callback=log_callback)
+        except ValueError as e:
+            log_callback(f"错误：{e}。请检查 API Base URL 和密钥。")
+            return
+        log_callback(f"AI端点: {', '.join(endpoint.name for endpoint in llm_pool.endpoints)}")
+
+        # --- 预过滤：状态文件中记录为已完成、且输出文件有完成标记的文件不再占用工作线程 ---
+        done_files = {name for name in load_done_state(processed_md_dir) if processed_writer.is_complete(name)}
+        pending_files = [path for path in all_md_files_in_raw if os.path.basename(path) not in done_files]
+        log_callback(f"共 {len(all_md_files_in_raw)} 个文件，其中 {len(all_md_files_in_raw) - len(pending_files)} 个已处理，跳过。")
+
+        profiling.begin_phase('metadata_sync')
+        raw_store = open_store(raw_md_dir, log_callback)
+        processed_store = open_store(processed_md_dir, log_callback)
+        sync_refreshed_stats(raw_md_dir, processed_md_dir, done_files, raw_store, processed_store, processed_writer, log_callback)
+
+        total_files = len(pending_files)
+        if total_files == 0:
+            processed_store.save()
+            log_callback("没有需要处理的文件。")
+            return
+
+        log_callback(f"正在按优先级(精华 > 点赞 > 最新)排列 {total_files} 个待处理文件...")
+
+        # --- 近似重复检测：同一簇中只有代表帖进入AI队列，其余帖子等代表帖完成后复制其结果 ---
+        profiling.begin_phase('dedup')
+        followers_of = {} # 代表帖文件名 -> 待复用结果的重复帖路径列表
+        if DEDUP_ENABLED:
+            pending_names = {os.path.basename(path) for path in pending_files}
+            create_time_of = lambda name: (raw_store.get(name) or {}).get('create_time') or ''
+            for cluster in find_near_duplicates(raw_md_dir, log_callback):
+                representative = pick_representative(cluster, done_files, lambda name: (create_time_of(name), name))
+                followers = [os.path.join(raw_md_dir, name) for name in cluster if name != representative and name in pending_names]
+                if followers:
+                    followers_of[representative] = followers
+        follower_paths = {path for followers in followers_of.values() for path in followers}
+
+        # --- 本地分类器：用已由AI标注的帖子增量训练，在验证集上确定可以跳过AI调用的置信度阈值 ---
+        profiling.begin_phase('local_classifier')
+        classifier = None
+        if LOCAL_CLASSIFIER_ENABLED:
+            classifier = LocalClassifier.load(processed_md_dir)
+            classifier.prepare(processed_store, log_callback)
+        work_queue = deque(path for path in schedule_files(raw_store, pending_files) if path not in follower_paths)
+        max_in_flight = max(1, concurrency * MAX_IN_FLIGHT_FACTOR)
+        call_stats = AICallStats()
+
+        processed_count = 0
+        state_path = os.path.join(processed_md_dir, AI_STATE_FILENAME)
+
+        profiling.begin_phase('worker_pool')   # 主线程在此等待工作线程，各线程内部的耗时另见 llm_wait/normalize/write
+        with ThreadPoolExecutor(max_workers=concurrency) as executor, open(state_path, 'a', encoding='utf-8') as state_file:
+            future_to_file = {}
+
+            def submit_next():
+                """从工作队列中取出下一个文件提交给线程池，队列为空时返回False。"""
+                if not work_queue:
+                    return False
+                filepath = work_queue.popleft()
+                future = executor.submit(process_single_file, filepath, processed_md_dir, llm_pool, log_callback, processed_store, processed_writer, classifier, call_stats)
+                future_to_file[future] = os.path.basename(filepath)
+                return True
+
+            def record_result(filename, result_message):
+                """输出处理结果并更新进度；成功、跳过或复用的文件立即落盘，任务中断后下次运行可直接跳过。"""
+                nonlocal processed_count
                 log_callback(f"  -> [处理结果] {result_message}")
-            except Exception as exc:
-                filename = os.path.basename(filepath)
-                log_callback(f"  -> [严重错误] 文件 {filename} 在执行期间产生致命异常: {exc}")
-                traceback.print_exc()
-            
-            processed_count += 1
-            # 实时更新本次任务的进度
-            log_callback(f"--- [本次任务进度: {processed_count}/{total_files}] ---")
-
-    total_elapsed_time = time.time() - start_time
-    log_callback(f"\n[{datetime.now().strftime('%H:%M:%S')}] 所有文件处理完成！")
-    log_callback(f"总耗时: {total_elapsed_time:.2f}秒")
-    if total_files > 0:
-        log_callback(f"平均每个文件耗时: {total_elapsed_time/total_files:.2f}秒")
+                succeeded = result_message.startswith(('[成功]', '[跳过]', '[复用]', '[本地]'))
+                if succeeded:
+                    state_file.write(filename + '\n')
+                    state_file.flush()
+                processed_count += 1
+                # 实时更新本次任务的进度
+                log_callback(f"--- [本次任务进度: {processed_count}/{total_files}] ---")
+                job_runner.report_progress(processed_count, total_files, filename)
+                return succeeded
+
+            def release_followers(representative, succeeded):
+                """代表帖完成后复制其结果给重复帖；代表帖失败时重复帖改为各自调用AI。"""
+                followers = followers_of.pop(representative, [])
+                if not succeeded:
+                    work_queue.extend(followers)
+                    return
+                representative_filepath = os.path.join(processed_md_dir, representative)
+                for follower in followers:
+                    result_message = copy_ai_result(follower, representative_filepath, processed_md_dir, log_callback, processed_store, processed_writer)
+                    if result_message.startswith('[复用]'):
+                        record_result(os.path.basename(follower), result_message)
+                    else:
+                        work_queue.append(follower)
+
+            # 代表帖此前已处理完成的簇，直接复用结果
+            for representative in [name for name in followers_of if name in done_files]:
+                release_followers(representative, True)
+
+            while len(future_to_file) < max_in_flight and submit_next():
+                pass
+
+            while future_to_file:
+                done, _ = wait(future_to_file, return_when=FIRST_COMPLETED)
+                for future in done:
+                    filename = future_to_file.pop(future)
+                    succeeded = False
+                    try:
+                        succeeded = record_result(filename, future.result())
+                    except Exception as exc:
+                        log_callback(f"  -> [严重错误] 文件 {filename} 在执行期间产生致命异常: {exc}")
+                        traceback.print_exc()
+                        processed_count += 1
+                        log_callback(f"--- [本次任务进度: {processed_count}/{total_files}] ---")
+                    release_followers(filename, succeeded)
+                    while len(future_to_file) < max_in_flight and submit_next():
+                        pass
+
+        processed_store.save()
+        total_elapsed_time = time.time() - start_time
+        log_callback(f"\n[{datetime.now().strftime('%H:%M:%S')}] 所有文件处理完成！")
+        log_callback(f"总耗时: {total_elapsed_time:.2f}秒")
+        if total_files > 0:
+            log_callback(f"平均每个文件耗时: {total_elapsed_time/total_files:.2f}秒")
+        call_stats.report(log_callback)
+        llm_pool.report(log_callback)
+        if classifier is not None:
+            classifier.report(log_callback)
+    finally:
+        # 提前返回或出错时同样关闭端点池的线程，并为最后一批文件写出完成标记
+        if llm_pool is not None:
+            llm_pool.close()
+        processed_writer.close()
 
 if __name__ == '__main__':
-    # 当独立运行时，提供一个默认的文件夹名进行测试
-    run_ai_processing('raw_md', DEEPSEEK_BASE_URL_FALLBACK, DEEPSEEK_API_KEY_FALLBACK, concurrency=50, log_callback=print) 
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description='对抓取的原始Markdown文件进行AI处理。')
+    parser.add_argument('source_folder', nargs='?', default='raw_md', help="output 下的原始数据目录名，默认 raw_md")
+    parser.add_argument('--base-url', default=DEEPSEEK_BASE_URL_FALLBACK)
+    parser.add_argument('--api-key', default=DEEPSEEK_API_KEY_FALLBACK)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--endpoints', help=f"端点配置文件（JSON，见 llm_pool.py），默认使用 Qt/{ENDPOINTS_FILENAME}（如果存在）")
+    parser.add_argument('--profile', action='store_true', help="开启性能分析，报告写入 output/profiles")
+    args = parser.parse_args()
+    endpoints = load_endpoints(args.endpoints) if args.endpoints else None
+    run_ai_processing(args.source_folder, args.base_url, args.api_key, concurrency=args.concurrency, log_callback=print, endpoints=endpoints, profile=args.profile)
\ No newline at end of file
@@ -0,0 +1,274 @@
+import os
+import io
+import sys
+import json
+import time
+import pstats
+import cProfile
+import argparse
+import datetime
+import functools
+import inspect
+import threading
+import tracemalloc
+from contextlib import nullcontext
+
+# --- 性能分析配置 ---
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'output', 'profiles')
+SAMPLE_INTERVAL = 0.005     # 采样分析器的采样间隔（秒），覆盖所有线程
+TRACEMALLOC_FRAMES = 10     # tracemalloc 为每次分配记录的调用栈深度
+TOP_N = 30                  # 报告中每类排行保留的条目数
+
+_session = None              # 当前正在进行的分析会话，同一时间只允许一个（cProfile/tracemalloc 都是进程全局的）
+_session_lock = threading.Lock()
+
+
+class _PhaseTimer:
+    """统计一个阶段的累计耗时。多个线程同时处于同一阶段时各自计时后累加，因此总和可能超过任务的实际耗时。"""
+
+    __slots__ = ('session', 'name', 'start')
+
+    def __init__(self, session, name):
+        self.session = session
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.session.add_phase(self.name, time.perf_counter() - self.start)
+
+
+def phase(name: str):
+    """
+    标记一段代码属于某个阶段（如 fetch、download、llm_wait），用于 with 语句。
+    未开启性能分析时返回空的上下文管理器，开销可以忽略。
+    """
+    session = _session
+    if session is None:
+        return nullcontext()
+    return _PhaseTimer(session, name)
+
+
+def begin_phase(name: str):
+    """
+    在顺序执行的流水线中标记下一个阶段的开始，同时结束本线程的上一个阶段；name 为 None 时只结束上一个阶段。
+    会话结束时自动结束调用线程中仍未结束的阶段。未开启性能分析时不做任何事。
+    """
+    session = _session
+    if session is None:
+        return
+    now = time.perf_counter()
+    current = session.sequence
+    if getattr(current, 'name', None):
+        session.add_phase(current.name, now - current.start)
+    current.name = name
+    current.start = now
+
+
+class _Sampler(threading.Thread):
+    """采样分析器：定期读取所有线程的调用栈，统计各函数处于栈顶（自身耗时）和栈中（累计耗时）的次数。"""
+
+    def __init__(self, interval: float):
+        super().__init__(name='profiling-sampler', daemon=True)
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.samples = 0
+        self.own = {}
+        self.cumulative = {}
+
+    @staticmethod
+    def _label(code) -> str:
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def run(self):
+        own_ident = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                self.samples += 1
+                leaf = self._label(frame.f_code)
+                self.own[leaf] = self.own.get(leaf, 0) + 1
+                seen = set()
+                while frame is not None:
+                    label = self._label(frame.f_code)
+                    if label not in seen:
+                        seen.add(label)
+                        self.cumulative[label] = self.cumulative.get(label, 0) + 1
+                    frame = frame.f_back
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+
+    def report(self) -> dict:
+        def top(counts):
+            ranked = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:TOP_N]
+            return [{'function': label, 'samples': count, 'share': round(count / self.samples, 4)} for label, count in ranked]
+        return {'interval': self.interval, 'samples': self.samples, 'own': top(self.own), 'cumulative': top(self.cumulative)}
+
+
+class ProfileSession:
+    """
+    一次任务（抓取、AI处理或网站构建）的性能分析会话，用于 with 语句。
+
+    会话期间收集：
+      - cProfile：调用线程（即任务的主线程）的精确函数调用统计，另存为 .prof 文件，可用 snakeviz 等工具查看；
+      - 采样分析：所有线程（包括抓取/AI的工作线程）的调用栈采样；
+      - tracemalloc：内存峰值和分配最多的代码位置；
+      - 各阶段的累计耗时（由代码中的 phase()/begin_phase() 标记）。
+    结束时写出 JSON 报告到 PROFILE_DIR，报告之间可用 compare_reports 对比。
+    """
+
+    def __init__(self, stage: str, log_callback=print, profile_dir: str = PROFILE_DIR):
+        self.stage = stage
+        self.log_callback = log_callback
+        self.profile_dir = profile_dir
+        self.phases = {}
+        self.phase_lock = threading.Lock()
+        self.sequence = threading.local()   # begin_phase 标记的当前阶段（按线程区分）
+        self.report_path = None
+
+    def add_phase(self, name: str, elapsed: float):
+        with self.phase_lock:
+            stats = self.phases.get(name)
+            if stats is None:
+                self.phases[name] = [elapsed, 1, elapsed]
+            else:
+                stats[0] += elapsed
+                stats[1] += 1
+                stats[2] = max(stats[2], elapsed)
+
+    def __enter__(self):
+        global _session
+        with _session_lock:
+            if _session is not None:
+                raise RuntimeError(f"已有正在进行的性能分析（{_session.stage}），同一时间只能分析一个任务。")
+            _session = self
+        self.started = datetime.datetime.now()
+        self.owns_tracemalloc = not tracemalloc.is_tracing()
+        if self.owns_tracemalloc:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        tracemalloc.reset_peak()
+        self.sampler = _Sampler(SAMPLE_INTERVAL)
+        self.sampler.start()
+        self.profiler = cProfile.Profile()
+        self.start_time = time.perf_counter()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        global _session
+        self.profiler.disable()
+        begin_phase(None)
+        elapsed = time.perf_counter() - self.start_time
+        self.sampler.stop()
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        ])
+        if self.owns_tracemalloc:
+            tracemalloc.stop()
+        with _session_lock:
+            _session = None
+        try:
+            self._write_report(elapsed, current, peak, snapshot)
+        except Exception as e:
+            self.log_callback(f"[性能分析] 写出报告失败: {e}")
+
+    def _write_report(self, elapsed, current, peak, snapshot):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        base_name = f"{self.stage}_{self.started.strftime('%Y%m%d_%H%M%S')}"
+        prof_path = os.path.join(self.profile_dir, base_name + '.prof')
+        self.profiler.dump_stats(prof_path)
+
+        stats = pstats.Stats(self.profiler, stream=io.StringIO())
+        functions = []
+        for (filename, line, name), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+            functions.append({'function': f"{name} ({os.path.basename(filename)}:{line})", 'ncalls': ncalls,
+                              'tottime': round(tottime, 6), 'cumtime': round(cumtime, 6)})
+        allocations = [{'where': f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+                        'size_kb': round(stat.size / 1024, 1), 'count': stat.count}
+                       for stat in snapshot.statistics('lineno')[:TOP_N]]
+
+        report = {
+            'stage': self.stage,
+            'started': self.started.isoformat(timespec='seconds'),
+            'elapsed': round(elapsed, 4),
+            'python': sys.version.split()[0],
+            'phases': {name: {'total': round(total, 4), 'count': count, 'max': round(longest, 4)}
+                       for name, (total, count, longest) in sorted(self.phases.items(), key=lambda item: item[1][0], reverse=True)},
+            'memory': {'peak_kb': round(peak / 1024, 1), 'end_kb': round(current / 1024, 1), 'top_allocations': allocations},
+            'cprofile': {
+                'prof_file': os.path.basename(prof_path),
+                'by_tottime': sorted(functions, key=lambda item: item['tottime'], reverse=True)[:TOP_N],
+                'by_cumtime': sorted(functions, key=lambda item: item['cumtime'], reverse=True)[:TOP_N],
+            },
+            'sampling': self.sampler.report(),
+        }
+        self.report_path = os.path.join(self.profile_dir, base_name + '.json')
+        with open(self.report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+
+        self.log_callback(f"[性能分析] 总耗时 {elapsed:.2f} 秒，内存峰值 {peak / 1024 / 1024:.1f} MB。")
+        for name, stats in list(report['phases'].items())[:10]:
+            self.log_callback(f"  - {name:<18} {stats['total']:9.3f} 秒  {stats['count']:7d} 次  最长 {stats['max']:.3f} 秒")
+        self.log_callback(f"[性能分析] 报告已写入: {self.report_path}")
+
+
+def profiled(stage: str):
+    """
+    为任务入口函数增加 profile 关键字参数：profile=True 时在性能分析会话中运行，并把摘要输出到函数的 log_callback。
+    已有其他任务在分析时，本次任务照常运行但不做分析。
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, profile=False, **kwargs):
+            if not profile:
+                return func(*args, **kwargs)
+            log_callback = signature.bind_partial(*args, **kwargs).arguments.get('log_callback', print)
+            try:
+                session = ProfileSession(stage, log_callback)
+                session.__enter__()
+            except RuntimeError as e:
+                log_callback(f"[性能分析] {e} 本次任务不做分析。")
+                return func(*args, **kwargs)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                session.__exit__(*sys.exc_info())
+        return wrapper
+    return decorator
+
+def compare_reports(old_path: str, new_path: str, log_callback=print):
+    """对比两份性能报告的总耗时、内存峰值和各阶段耗时。"""
+    with open(old_path, 'r', encoding='utf-8') as f:
+        old = json.load(f)
+    with open(new_path, 'r', encoding='utf-8') as f:
+        new = json.load(f)
+
+    def delta(a, b):
+        return f"{(b - a) / a * 100:+.1f}%" if a else '  n/a'
+
+    log_callback(f"{'':<20}{'旧':>12}{'新':>12}{'变化':>10}")
+    log_callback(f"{'总耗时(秒)':<20}{old['elapsed']:>12.3f}{new['elapsed']:>12.3f}{delta(old['elapsed'], new['elapsed']):>10}")
+    old_peak, new_peak = old['memory']['peak_kb'] / 1024, new['memory']['peak_kb'] / 1024
+    log_callback(f"{'内存峰值(MB)':<20}{old_peak:>12.1f}{new_peak:>12.1f}{delta(old_peak, new_peak):>10}")
+    for name in list(dict.fromkeys(list(new['phases']) + list(old['phases']))):
+        a = old['phases'].get(name, {}).get('total', 0.0)
+        b = new['phases'].get(name, {}).get('total', 0.0)
+        log_callback(f"{name:<20}{a:>12.3f}{b:>12.3f}{delta(a, b):>10}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='对比两份性能分析报告（由 --profile 或界面中的"性能分析"选项生成）。')
+    parser.add_argument('old', help='旧报告的 JSON 文件')
+    parser.add_argument('new', help='新报告的 JSON 文件')
+    args = parser.parse_args()
+    compare_reports(args.old, args.new)
@@ -0,0 +1,111 @@
+import os
+import re
+import math
+import html
+from collections import Counter
+
+try:
+    from .site_data import DATA_DIR_NAME, dump_compact, write_if_changed
+except ImportError:  # 作为独立脚本运行时
+    from site_data import DATA_DIR_NAME, dump_compact, write_if_changed
+
+# --- 全文检索配置 ---
+SEARCH_DIR_NAME = 'search'     # data目录下存放检索分片的子目录
+SEARCH_SHARDS = 64             # 按词项首字符分片的数量，前端使用相同规则定位分片
+BM25_K1 = 1.2
+BM25_B = 0.75
+SCORE_SCALE = 100              # 相关度分数放大后取整，减小索引体积
+FIELD_BOOST = 3                # 标签、主题、摘要中出现的词项权重
+MAX_WORD_LEN = 32              # 过长的英文/数字串截断，避免异常数据撑大索引
+
+# 中日韩统一表意文字连续片段 或 英文/数字单词。前端 app.js 中的分词规则必须与此保持一致。
+TOKEN_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff]+|[a-z0-9]+')
+TAG_RE = re.compile(r'<[^>]+>')
+
+
+def tokenize(text: str) -> list:
+    """
+    将文本切分为检索词项：中文按相邻二字（bigram）切分，单个汉字的片段保留原字；
+    英文和数字按单词切分并转为小写，丢弃单个字母。
+    """
+    tokens = []
+    for match in TOKEN_RE.finditer(text.lower()):
+        run = match.group(0)
+        if run[0] <= 'z':
+            if len(run) >= 2:
+                tokens.append(run[:MAX_WORD_LEN])
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+def shard_of(term: str) -> int:
+    """词项所在的分片编号：按首字符的码位取模，同一首字符的词项总在同一分片，便于前缀查询。"""
+    return ord(term[0]) % SEARCH_SHARDS
+
+def html_to_text(content_html: str) -> str:
+    """去掉HTML标签并反转义实体，得到用于索引的纯文本。"""
+    return html.unescape(TAG_RE.sub(' ', content_html or ''))
+
+
+class SearchIndexBuilder:
+    """
+    倒排索引构建器。按文档顺序逐篇 add()，最后 write() 时统一计算BM25分数并按分片写出。
+
+    文档编号即帖子在元数据索引 posts_index.json 中的下标，前端据此直接取得帖子元数据。
+    """
+
+    def __init__(self):
+        self.postings = {}     # term -> [(doc_id, weighted_tf), ...]
+        self.doc_lengths = []
+
+    def add(self, doc_id: int, post: dict, content: str = None):
+        """
+        将一篇帖子加入索引，标签/主题/摘要中的词项按 FIELD_BOOST 加权。
+        content 为正文HTML，省略时使用 post['content']（流式构建时正文不随元数据保存在内存中）。
+        """
+        counts = Counter(tokenize(html_to_text(post.get('content', '') if content is None else content)))
+        counts.update(tokenize(str(post.get('author') or '')))
+        boosted = ' '.join([str(post.get('topic') or ''), str(post.get('digest') or '')] + [str(t) for t in post.get('tags') or []])
+        for term in tokenize(boosted):
+            counts[term] += FIELD_BOOST
+        while len(self.doc_lengths) <= doc_id:
+            self.doc_lengths.append(0)
+        self.doc_lengths[doc_id] = sum(counts.values())
+        for term, tf in counts.items():
+            self.postings.setdefault(term, []).append((doc_id, tf))
+
+    def write(self, web_output_dir: str, log_callback=print) -> dict:
+        """
+        计算BM25分数并写出分片文件 data/search/<n>.json。
+        每个分片为 {term: [doc_id, score, doc_id, score, ...]}，分数为放大取整后的BM25值。
+
+        Returns:
+            dict: 包含 'search_path'（相对web目录）、'search_shards' 和 'term_count'。
+        """
+        search_dir = os.path.join(web_output_dir, DATA_DIR_NAME, SEARCH_DIR_NAME)
+        os.makedirs(search_dir, exist_ok=True)
+
+        doc_count = len(self.doc_lengths) or 1
+        avg_len = (sum(self.doc_lengths) / doc_count) or 1
+        shards = [{} for _ in range(SEARCH_SHARDS)]
+        for term, entries in self.postings.items():
+            idf = math.log(1 + (doc_count - len(entries) + 0.5) / (len(entries) + 0.5))
+            flat = []
+            for doc_id, tf in entries:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[doc_id] / avg_len)
+                score = idf * tf * (BM25_K1 + 1) / (tf + norm)
+                flat.extend((doc_id, max(1, round(score * SCORE_SCALE))))
+            shards[shard_of(term)][term] = flat
+
+        written = 0
+        for shard_id, shard in enumerate(shards):
+            if write_if_changed(os.path.join(search_dir, f'{shard_id}.json'), dump_compact(shard)):
+                written += 1
+        log_callback(f"  - [检索] 已生成 {len(self.postings)} 个词项的全文索引（{SEARCH_SHARDS} 个分片，其中 {written} 个有变化）。")
+        return {
+            'search_path': f'{DATA_DIR_NAME}/{SEARCH_DIR_NAME}/',
+            'search_shards': SEARCH_SHARDS,
+            'term_count': len(self.postings),
+        }
@@ -0,0 +1,147 @@
+import os
+import json
+
+try:
+    from .atomic_io import atomic_open, atomic_write
+except ImportError:  # 作为独立脚本运行时
+    from atomic_io import atomic_open, atomic_write
+
+# --- 站点数据配置 ---
+DATA_DIR_NAME = 'data'                  # web输出目录下存放数据文件的子目录
+INDEX_FILENAME = 'posts_index.json'     # 精简的帖子元数据索引（不含正文）
+CONTENT_DIR_NAME = 'content'            # 帖子正文分片目录
+POSTS_PER_SHARD = 100                   # 每个正文分片包含的帖子数
+# 写入索引的元数据字段，正文和本地文件路径等大字段不进入索引
+INDEX_FIELDS = ['topic_id', 'author', 'create_time', 'digested', 'likes', 'comments_count', 'tags', 'topic', 'digest']
+OPTIONAL_INDEX_FIELDS = ['duplicates']   # 只在帖子带有该字段时写入索引（折叠的近似重复帖子数量）
+STREAM_BUFFER_SIZE = 1024 * 1024        # 流式写出大文件时的缓冲区大小
+
+COMPACT_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+def dump_compact(data) -> str:
+    """输出紧凑的JSON字符串（无多余空白）。"""
+    return COMPACT_ENCODER.encode(data)
+
+def write_if_changed(path: str, text: str) -> bool:
+    """
+    仅当内容发生变化时才写文件，保持未变化文件的修改时间不变，
+    便于浏览器缓存和预览服务器的条件请求继续生效。
+
+    Returns:
+        bool: 是否实际写入了文件。
+    """
+    data = text.encode('utf-8')
+    try:
+        if os.path.getsize(path) == len(data):
+            with open(path, 'rb') as f:
+                if f.read() == data:
+                    return False
+    except OSError:
+        pass
+    atomic_write(path, data)
+    return True
+
+def write_chunks_if_changed(path: str, chunks) -> bool:
+    """
+    流式版本的 write_if_changed：边生成边与旧文件逐块比较，无需在内存中拼出完整内容；
+    内容相同则保留旧文件（及其修改时间）。出现第一处不同时才开始原子写出，
+    已比较过的相同前缀直接从旧文件复制。
+
+    Args:
+        chunks (iterable): 字符串片段，例如 JSONEncoder.iterencode() 或 Jinja2 Template.generate() 的输出。
+
+    Returns:
+        bool: 文件内容是否发生了变化。
+    """
+    chunks = (chunk.encode('utf-8') for chunk in chunks)
+    try:
+        old = open(path, 'rb', buffering=STREAM_BUFFER_SIZE)
+    except OSError:
+        old = None
+    try:
+        matched = 0         # 与旧文件相同的前缀字节数
+        first_diff = b''
+        if old is not None:
+            for data in chunks:
+                if old.read(len(data)) != data:
+                    first_diff = data
+                    break
+                matched += len(data)
+            else:
+                if not old.read(1):
+                    return False
+            old.seek(0)
+        with atomic_open(path, 'wb', buffering=STREAM_BUFFER_SIZE) as f:
+            while matched:
+                block = old.read(min(matched, STREAM_BUFFER_SIZE))
+                f.write(block)
+                matched -= len(block)
+            f.write(first_diff)
+            for data in chunks:
+                f.write(data)
+    finally:
+        if old is not None:
+            old.close()
+    return True
+
+def sort_posts_newest_first(posts: list) -> list:
+    """按发布时间从新到旧排序（create_time 为 'YYYY-MM-DD HH:MM:SS.fff' 格式，可直接按字符串比较）。"""
+    return sorted(posts, key=lambda p: str(p.get('create_time') or ''), reverse=True)
+
+def write_site_data(posts: list, web_output_dir: str, log_callback=print, contents=None) -> dict:
+    """
+    将帖子数据拆分为元数据索引和按固定大小分片的正文文件，供前端按页懒加载。
+
+    索引保持传入的帖子顺序（调用方应先用 sort_posts_newest_first 排序），
+    每条记录带有 'shard' 字段指明正文所在分片；分片文件为 {topic_id: html} 的映射。
+    正文逐篇从 contents 中取出，写完一个分片即释放，内存中最多只有一个分片的正文。
+
+    Args:
+        posts (list): 已排序的帖子元数据列表。
+        web_output_dir (str): web输出目录。
+        log_callback (function): 日志回调函数。
+        contents (iterable): 与 posts 一一对应的正文HTML（可以是惰性生成器）；省略时使用各帖子的 'content' 字段。
+
+    Returns:
+        dict: 包含 'post_count'、'shard_count'、'index_path' 和 'content_path'（均相对web目录）的统计信息。
+    """
+    data_dir = os.path.join(web_output_dir, DATA_DIR_NAME)
+    content_dir = os.path.join(data_dir, CONTENT_DIR_NAME)
+    os.makedirs(content_dir, exist_ok=True)
+
+    if contents is None:
+        contents = (post.get('content', '') for post in posts)
+    contents = iter(contents)
+
+    index = []
+    written = 0
+    shard_count = 0
+    for start in range(0, len(posts), POSTS_PER_SHARD):
+        shard_id = start // POSTS_PER_SHARD
+        shard = {}
+        for post in posts[start:start + POSTS_PER_SHARD]:
+            entry = {field: post.get(field) for field in INDEX_FIELDS}
+            entry.update((field, post[field]) for field in OPTIONAL_INDEX_FIELDS if post.get(field))
+            entry['topic_id'] = str(entry['topic_id'])
+            entry['shard'] = shard_id
+            index.append(entry)
+            shard[entry['topic_id']] = next(contents)
+        if write_if_changed(os.path.join(content_dir, f'{shard_id}.json'), dump_compact(shard)):
+            written += 1
+        shard_count += 1
+
+    # 清理帖子减少后多余的旧分片
+    for entry in os.scandir(content_dir):
+        stem, ext = os.path.splitext(entry.name)
+        if ext == '.json' and stem.isdigit() and int(stem) >= shard_count:
+            os.remove(entry.path)
+
+    write_chunks_if_changed(os.path.join(data_dir, INDEX_FILENAME), COMPACT_ENCODER.iterencode(index))
+    log_callback(f"  - [数据] 已生成元数据索引和 {shard_count} 个正文分片（其中 {written} 个有变化）。")
+    return {
+        'post_count': len(index),
+        'shard_count': shard_count,
+        'index_path': f'{DATA_DIR_NAME}/{INDEX_FILENAME}',
+        'content_path': f'{DATA_DIR_NAME}/{CONTENT_DIR_NAME}/',
+    }
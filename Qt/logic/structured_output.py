@@ -0,0 +1,277 @@
+import json
+import time
+import argparse
+
+# --- 结构化输出配置 ---
+MAX_LEADING_CHARS = 200     # 未使用JSON模式时，允许JSON对象前出现的说明文字/代码块标记的最大长度
+WHITESPACE = ' \t\r\n'
+ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+HEX_DIGITS = '0123456789abcdefABCDEF'
+
+# 字段类型
+STRING = 'string'
+STRING_LIST = 'string_list'
+
+
+class OffSchemaError(ValueError):
+    """模型输出偏离了约定的JSON结构（语法错误、未知字段、类型不符或超长）。"""
+
+
+def validate(data, schema: dict) -> dict:
+    """
+    按 schema 校验解析后的JSON对象，通过时原样返回，否则抛出 OffSchemaError。
+
+    Args:
+        data: json.loads 的结果。
+        schema: 字段名 -> {'type': STRING | STRING_LIST, 'max_length': 字符串最大长度, 'max_items': 列表最大项数}。
+    """
+    if not isinstance(data, dict):
+        raise OffSchemaError(f"顶层不是JSON对象: {type(data).__name__}")
+    for field, spec in schema.items():
+        if field not in data:
+            raise OffSchemaError(f"缺少字段 '{field}'")
+        value = data[field]
+        values = value if spec['type'] == STRING_LIST else [value]
+        if spec['type'] == STRING_LIST:
+            if not isinstance(value, list):
+                raise OffSchemaError(f"字段 '{field}' 应为字符串列表")
+            if len(value) > spec.get('max_items', len(value)):
+                raise OffSchemaError(f"字段 '{field}' 超过 {spec['max_items']} 项")
+        for item in values:
+            if not isinstance(item, str):
+                raise OffSchemaError(f"字段 '{field}' 应为字符串")
+            if len(item) > spec.get('max_length', len(item)):
+                raise OffSchemaError(f"字段 '{field}' 超过 {spec['max_length']} 字")
+    unknown = set(data) - set(schema)
+    if unknown:
+        raise OffSchemaError(f"未知字段: {', '.join(sorted(unknown))}")
+    return data
+
+
+class StreamingJSONValidator:
+    """
+    边接收流式输出边检查的JSON解析器，适用于只含字符串和字符串列表字段的扁平对象。
+
+    每收到一段文本调用一次 feed()：一旦出现语法错误、未知字段、类型不符或字符串/列表超长，立即抛出
+    OffSchemaError，调用方可以马上中止这次请求并重试，而不必等模型把错误的内容全部生成完。
+    对象的右花括号一出现 feed() 就返回 True，之后的输出（如代码块结束标记）不再需要。
+    """
+
+    def __init__(self, schema: dict, max_leading_chars: int = MAX_LEADING_CHARS):
+        self.schema = schema
+        self.max_leading_chars = max_leading_chars
+        self.buffer = []
+        self.chars = 0            # 已接收的字符数
+        self.start = None         # '{' 在已接收文本中的位置
+        self.end = None
+        self.state = 'before'
+        self.escape = False
+        self.unicode = None       # 正在读取的 \uXXXX 转义的十六进制数字
+        self.high_surrogate = False   # 上一个字符是否为 \u 转义的高位代理（与随后的低位代理合计一个字符）
+        self.token = []           # 正在读取的键名
+        self.key = None
+        self.length = 0           # 当前字符串值的长度
+        self.items = 0            # 当前列表的项数
+        self.keys = set()
+
+    @property
+    def done(self) -> bool:
+        return self.state == 'done'
+
+    def feed(self, chunk: str) -> bool:
+        for char in chunk:
+            if self.state == 'done':
+                break
+            self._step(char)
+            self.chars += 1
+        self.buffer.append(chunk)
+        return self.done
+
+    def _fail(self, message: str):
+        raise OffSchemaError(f"{message}（第 {self.chars + 1} 个字符）")
+
+    def _step(self, char: str):
+        state = self.state
+        if state in ('key', 'string', 'item'):
+            if self.unicode is not None:
+                if char not in HEX_DIGITS:
+                    self._fail(f"\\u 转义后应为4位十六进制数，实际为 {char!r}")
+                self.unicode.append(char)
+                if len(self.unicode) == 4:
+                    self._end_unicode()
+                return
+            if self.escape:
+                self.escape = False
+                if char == 'u':
+                    self.unicode = []
+                elif char in ESCAPES:
+                    self._string_char(ESCAPES[char])
+                else:
+                    self._fail(f"无效的转义字符 {char!r}")
+                return
+            if char == '\\':
+                self.escape = True
+            elif char == '"':
+                self.high_surrogate = False
+                if state == 'key':
+                    self._end_key(''.join(self.token))
+                else:
+                    self.state = 'after_value' if state == 'string' else 'after_item'
+            elif char in '\r\n':
+                self._fail("字符串中出现未转义的换行")
+            else:
+                self._string_char(char)
+            return
+        if char in WHITESPACE:
+            return
+        if state == 'before':
+            if char == '{':
+                self.start = self.chars
+                self.state = 'key_or_end'
+            elif self.chars >= self.max_leading_chars:
+                self._fail("输出开头找不到JSON对象")
+        elif state in ('key_or_end', 'key_start'):
+            if char == '"':
+                self.token = []
+                self.state = 'key'
+            elif char == '}' and state == 'key_or_end':
+                self._end_object()
+            else:
+                self._fail(f"此处应为字段名，实际为 {char!r}")
+        elif state == 'colon':
+            if char != ':':
+                self._fail(f"字段名后应为冒号，实际为 {char!r}")
+            self.state = 'value'
+        elif state == 'value':
+            expected = '[' if self.schema[self.key]['type'] == STRING_LIST else '"'
+            if char != expected:
+                self._fail(f"字段 '{self.key}' 的值应以 {expected!r} 开头，实际为 {char!r}")
+            self.length = 0
+            self.items = 0
+            self.state = 'item_or_end' if expected == '[' else 'string'
+        elif state in ('item_or_end', 'item_start'):
+            if char == '"':
+                self.items += 1
+                max_items = self.schema[self.key].get('max_items')
+                if max_items is not None and self.items > max_items:
+                    self._fail(f"字段 '{self.key}' 超过 {max_items} 项")
+                self.length = 0
+                self.state = 'item'
+            elif char == ']' and state == 'item_or_end':
+                self.state = 'after_value'
+            else:
+                self._fail(f"字段 '{self.key}' 的列表项应为字符串，实际为 {char!r}")
+        elif state == 'after_item':
+            if char == ',':
+                self.state = 'item_start'
+            elif char == ']':
+                self.state = 'after_value'
+            else:
+                self._fail(f"列表项之后应为 ',' 或 ']'，实际为 {char!r}")
+        elif state == 'after_value':
+            if char == ',':
+                self.state = 'key_start'
+            elif char == '}':
+                self._end_object()
+            else:
+                self._fail(f"字段值之后应为 ',' 或 '}}'，实际为 {char!r}")
+
+    def _string_char(self, char: str, counted: bool = True):
+        """字符串中解码后的一个字符：键名中的字符记入键名，值中的字符计入长度（与 json.loads 后的 len() 一致）。"""
+        self.high_surrogate = False
+        if self.state == 'key':
+            self.token.append(char)
+            return
+        if not counted:
+            return
+        self.length += 1
+        max_length = self.schema[self.key].get('max_length')
+        if max_length is not None and self.length > max_length:
+            self._fail(f"字段 '{self.key}' 超过 {max_length} 字")
+
+    def _end_unicode(self):
+        code = int(''.join(self.unicode), 16)
+        self.unicode = None
+        # 代理对（如 \ud83d\ude00）解码后只是一个字符，低位代理不再计数
+        is_low = self.high_surrogate and 0xDC00 <= code <= 0xDFFF
+        self._string_char(chr(code), counted=not is_low)
+        self.high_surrogate = 0xD800 <= code <= 0xDBFF
+
+    def _end_key(self, key: str):
+        if key not in self.schema:
+            self._fail(f"未知字段 '{key}'")
+        if key in self.keys:
+            self._fail(f"字段 '{key}' 重复")
+        self.keys.add(key)
+        self.key = key
+        self.state = 'colon'
+
+    def _end_object(self):
+        missing = set(self.schema) - self.keys
+        if missing:
+            self._fail(f"缺少字段: {', '.join(sorted(missing))}")
+        self.end = self.chars
+        self.state = 'done'
+
+    @property
+    def text(self) -> str:
+        return ''.join(self.buffer)
+
+    def result(self) -> dict:
+        """输出结束后调用：返回解析并校验过的对象；对象不完整时抛出 OffSchemaError。"""
+        if not self.done:
+            raise OffSchemaError("输出在JSON对象结束前中断")
+        try:
+            data = json.loads(self.text[self.start:self.end + 1])
+        except json.JSONDecodeError as e:
+            raise OffSchemaError(f"JSON解析失败: {e}") from e
+        return validate(data, self.schema)
+
+
+def parse_complete(text: str, schema: dict) -> dict:
+    """对完整的（非流式）输出做同样的检查。"""
+    validator = StreamingJSONValidator(schema)
+    validator.feed(text)
+    return validator.result()
+
+
+def benchmark(num_responses: int = 20000, log_callback=print):
+    """比较流式校验与“等待完整输出后 json.loads”的解析开销，并统计偏离结构的输出平均在第几个字符被发现。"""
+    schema = {'tags': {'type': STRING_LIST, 'max_items': 8, 'max_length': 20},
+              'digest': {'type': STRING, 'max_length': 120},
+              'topic': {'type': STRING, 'max_length': 20}}
+    good = json.dumps({'tags': ['人工智能', '大模型', '产品'], 'digest': '这是一段关于大模型落地经验的摘要，' * 3, 'topic': '技术分享'},
+                      ensure_ascii=False, indent=4)
+    bad = ['好的，下面是分析结果：' * 30 + good, good.replace('"topic"', '"theme"'), good.replace('"技术分享"', '["技术分享"]'),
+           good.replace('摘要，', '摘要，' * 40)]
+    start = time.perf_counter()
+    for _ in range(num_responses):
+        parse_complete(good, schema)
+    streaming_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(num_responses):
+        validate(json.loads(good), schema)
+    loads_time = time.perf_counter() - start
+    log_callback(f"{num_responses} 条 {len(good)} 字符的输出: 逐字符校验 {streaming_time / num_responses * 1e6:.0f} 微秒/条，"
+                 f"json.loads {loads_time / num_responses * 1e6:.0f} 微秒/条（均远小于模型生成这些字符的时间）。")
+    # 回归检查：长度按解码后的字符计算，ASCII转义（\uXXXX、代理对、\n 等）不应让合法输出超长
+    escaped = json.dumps({'tags': ['人工智能', '😀' * 20, '换行\n制表\t引号"'], 'digest': '摘要' * 60, 'topic': '技术分享'},
+                         ensure_ascii=True)
+    parse_complete(escaped, schema)
+    log_callback(f"  ASCII转义的输出（{len(escaped)} 字符）校验通过")
+    for text in bad:
+        validator = StreamingJSONValidator(schema)
+        try:
+            for i in range(0, len(text), 4):   # 模拟每次收到约一个词元
+                validator.feed(text[i:i + 4])
+            validator.result()
+            log_callback("  未发现偏离")
+        except OffSchemaError as e:
+            log_callback(f"  第 {validator.chars + 1}/{len(text)} 个字符处中止: {e}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='流式JSON校验器的基准测试。')
+    parser.add_argument('--benchmark', type=int, metavar='N', default=20000, help='解析 N 条合成输出')
+    args = parser.parse_args()
+    benchmark(args.benchmark)
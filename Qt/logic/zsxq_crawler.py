@@ -11,12 +11,26 @@ from urllib.parse import quote
 from urllib.parse import unquote
 import base64
 import time
+import threading
 import frontmatter
 import pprint
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from PySide6.QtCore import QObject, Signal, QThread
 
+try:
+    from . import front_matter
+    from . import job_runner
+    from . import profiling
+    from .atomic_io import MARKER_FILENAME, OutputWriter, atomic_copy, atomic_open, atomic_write
+    from .metadata_store import MetadataStore
+except ImportError:  # 作为独立脚本运行时
+    import front_matter
+    import job_runner
+    import profiling
+    from atomic_io import MARKER_FILENAME, OutputWriter, atomic_copy, atomic_open, atomic_write
+    from metadata_store import MetadataStore
+
 # ===============================================================
 # 全局配置 - 这些现在作为后备，优先使用GUI传入的值
 # ===============================================================
@@ -34,11 +48,33 @@ DOWLOAD_COMMENTS = True     # 是否下载评论
 COUNTS_PER_TIME = 20        # 每次API请求获取的帖子数量
 SLEEP_FLAG = True           # 是否在每次API请求后暂停
 SLEEP_SEC = 1               # 暂停秒数
+
+# --- 分片抓取设置 (crawl_mode='sharded') ---
+SHARD_COUNT = 8                 # 将星球的全部历史按时间切成的窗口数
+SHARD_WORKERS = 4               # 同时抓取的窗口数
+SHARD_REQUESTS_PER_SEC = 2.0    # 所有窗口共享的API请求速率上限（次/秒），取代逐页的固定暂停
+SHARD_FALLBACK_YEARS = 5        # 无法获取星球创建时间时，向前覆盖的年数（最早的窗口本身不设下界）
+
+# --- 多关键词搜索设置 (crawl_mode='search') ---
+SEARCH_WORKERS = 4                      # 同时翻页的关键词数
+SEARCH_REQUESTS_PER_SEC = 2.0           # 所有关键词共享的API请求速率上限（次/秒）
+SEARCH_HITS_FILENAME = '.search_hits.json'   # 搜索目录下的命中索引：{关键词: [topic_id, ...]}，多次搜索累积合并
+
+# --- 互动数据刷新设置 (crawl_mode='refresh') ---
+STATS_FIELDS = ['likes', 'comments_count', 'digested']   # 已归档帖子中需要与API比对、更新的元数据字段
+COMMENTS_HEADER = "\n\n---\n\n### 评论区\n\n"            # 正文中评论区的开头，刷新时整段替换
 # ===============================================================
 
 # 全局变量
 num = 0             # 已处理的帖子计数器
 g_debug_num = None  # 用于调试，限制抓取的帖子总数，由GUI传入
+g_metadata_store = None  # 输出目录的列式元数据表，每保存一篇帖子增量更新一行
+g_output_writer = None   # 输出目录的原子写入器，记录每个帖子文件的完成标记
+g_processed_writer = None  # 刷新模式下对应 processed_ 目录的写入器；该目录不存在或正被AI处理任务占用时为 None
+g_num_lock = threading.Lock()  # 分片抓取时多个线程共用计数器
+g_rate_limiter = None    # 分片抓取时所有线程共享的请求限速器
+g_refresh_stats = False  # 刷新模式：已归档的帖子不再跳过，而是比对并更新互动数据
+g_refresh_counts = {'updated': 0, 'unchanged': 0}  # 刷新模式的统计
 
 
 def save_as_markdown(topic_data, output_dir, log_callback=print):
@@ -92,7 +128,7 @@ def save_as_markdown(topic_data, output_dir, log_callback=print):
 
     # 添加评论区
     if topic_data.get('comments'):
-        content_parts.append("\n\n---\n\n### 评论区\n\n")
+        content_parts.append(COMMENTS_HEADER)
         for comment in topic_data.get('comments'):
             content_parts.append(comment)
 
@@ -102,9 +138,16 @@ def save_as_markdown(topic_data, output_dir, log_callback=print):
     # 构造最终文件路径
     filepath = os.path.join(output_dir, f"{topic_data.get('topic_id')}.md")
     try:
-        # 使用 frontmatter 库将元数据和内容写入文件
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(frontmatter.dumps(post, allow_unicode=True, sort_keys=False, width=10000))
+        # 使用 frontmatter 库序列化元数据和内容，原子写出（先写临时文件再改名）并记录完成标记
+        with profiling.phase('write'):
+            text = front_matter.dumps(post, allow_unicode=True, sort_keys=False, width=10000)
+            if g_output_writer is not None:
+                g_output_writer.write(os.path.basename(filepath), text)
+            else:
+                with atomic_open(filepath) as f:
+                    f.write(text)
+            if g_metadata_store is not None:
+                g_metadata_store.upsert(os.path.basename(filepath), post.metadata, os.stat(filepath))
         log_callback(f"  - [成功] 已保存帖子: {filepath}")
     except Exception as e:
         log_callback(f"  - [失败] 保存帖子失败: {filepath}, 错误: {e}")
@@ -156,32 +199,29 @@ def handle_link_to_md(text):
             a.unwrap() # 如果没有href，则移除a标签，保留内部文本
     return soup.get_text()
 
-def get_data(url, output_dir, log_callback, token, is_single_post=False):
+def fetch_api_json(url, token, log_callback):
     """
-    核心函数：通过API获取帖子数据，处理并保存。支持分页递归调用。
+    请求知识星球API，遇到可重试的错误（内部错误1059、网络错误、JSON解析失败）时重试。
+    设置了共享限速器（分片抓取模式）时，每次请求前先等待限速器放行。
 
-    Args:
-        url (str): 要请求的API URL。
-        output_dir (str): 保存文件的目录。
-        log_callback (function): 日志回调函数。
-        token (str): 知识星球的access_token。
-        is_single_post (bool): 标记当前是否为抓取单个帖子模式。
+    Returns:
+        dict or None: 成功时返回响应JSON，遇到无法重试的错误时返回None。
     """
-    global num, g_debug_num # 使用全局变量来计数和控制总数
     headers = {
         'Cookie': 'zsxq_access_token=' + token,
         'User-Agent': USER_AGENT
     }
-    log_callback("正在请求URL: " + url)
-
-    # 请求重试逻辑
     retry_count = 0
     while True:
+        if g_rate_limiter is not None:
+            g_rate_limiter.acquire()
         try:
-            rsp = requests.get(url, headers=headers, timeout=30)
-            response_json = rsp.json()
+            with profiling.phase('fetch'):
+                rsp = requests.get(url, headers=headers, timeout=30)
+            with profiling.phase('parse'):
+                response_json = rsp.json()
             if response_json.get('succeeded'):
-                break # 请求成功，跳出重试循环
+                return response_json # 请求成功
             if response_json.get('code') == 1059: # 知识星球API的一个常见内部错误码
                 retry_count += 1
                 log_callback(f"API返回内部错误(1059)，将在 {SLEEP_SEC} 秒后进行第 {retry_count} 次重试...")
@@ -190,7 +230,7 @@ def get_data(url, output_dir, log_callback, token, is_single_post=False):
                 continue # 继续下一次重试
             else:
                 log_callback(f"错误: API逻辑失败，无法重试. 响应: {response_json}")
-                return # 无法处理的错误，函数返回
+                return None # 无法处理的错误
 
         except requests.exceptions.RequestException as e:
             retry_count += 1
@@ -205,27 +245,246 @@ def get_data(url, output_dir, log_callback, token, is_single_post=False):
                 time.sleep(SLEEP_SEC)
             continue
 
-    try:
-        resp_data = response_json.get('resp_data', {})
-        
-        topics = []
-        # 根据是否是单帖模式，从不同的JSON结构中提取帖子列表
-        if is_single_post:
-            if 'topic' in resp_data:
-                topics = [resp_data['topic']]
+def extract_topics(resp_data, is_single_post=False):
+    """从API响应的 resp_data 中取出帖子列表。"""
+    # 根据是否是单帖模式，从不同的JSON结构中提取帖子列表
+    if is_single_post:
+        return [resp_data['topic']] if 'topic' in resp_data else []
+    raw_items = resp_data.get('topics', [])
+    # API在不同端点返回的topics列表结构可能不一致：
+    # - /groups/.../topics 直接返回 topic 对象列表 [topic, topic, ...]
+    # - /search/topics 可能返回包装过的对象列表 [{'topic': {...}}, ...]
+    # 此处进行兼容性处理
+    if raw_items and 'topic' in raw_items[0]:
+        # 兼容包装过的列表（例如搜索结果）
+        return [item.get('topic') for item in raw_items if item.get('topic')]
+    # 兼容直接的topic对象列表
+    return raw_items
+
+def topic_stats(topic) -> dict:
+    """从API返回的帖子中取出会随时间变化的互动数据（字段与 STATS_FIELDS 对应）。"""
+    return {
+        'digested': topic.get('digested', False), # 是否为精华帖
+        'likes': topic.get('likes_count', 0),
+        'comments_count': topic.get('comments_count', 0),
+    }
+
+def format_comments(topic) -> list:
+    """将帖子的评论格式化为Markdown引用行列表。"""
+    comments = []
+    for comment in topic.get('show_comments') or []:
+        author_name = comment.get('owner', {}).get('name', '未知用户')
+        comment_text = handle_link_to_md(comment.get('text', ''))
+        repliee = comment.get('repliee') # 被回复的人
+        if repliee:
+            repliee_name = repliee.get('name', '未知用户')
+            # 格式化为 "A 回复 B: ..."
+            comments.append(f"> **{author_name}** 回复 **{repliee_name}**: {comment_text}\n")
         else:
-            raw_items = resp_data.get('topics', [])
-            # API在不同端点返回的topics列表结构可能不一致：
-            # - /groups/.../topics 直接返回 topic 对象列表 [topic, topic, ...]
-            # - /search/topics 可能返回包装过的对象列表 [{'topic': {...}}, ...]
-            # 此处进行兼容性处理
-            if raw_items and 'topic' in raw_items[0]:
-                # 兼容包装过的列表（例如搜索结果）
-                topics = [item.get('topic') for item in raw_items if item.get('topic')]
+            # 格式化为 "A: ..."
+            comments.append(f"> **{author_name}**: {comment_text}\n")
+    return comments
+
+def replace_comment_section(content: str, comments: list) -> str:
+    """替换正文末尾的评论区（与 save_as_markdown 的拼接方式一致）；原来没有评论区时追加，没有评论时删除。"""
+    index = content.rfind(COMMENTS_HEADER)
+    if index != -1:
+        content = content[:index]
+        if content.endswith("\n"):
+            content = content[:-1] # 去掉拼接时加在评论区前的换行
+    if not comments:
+        return content
+    return content + "\n" + "\n".join([COMMENTS_HEADER] + comments)
+
+def update_archived_file(filepath: str, stats: dict, comments, write_text) -> list:
+    """
+    比对已归档文件的互动数据和评论区，只在有变化时改写这些字段（其余元数据、正文和图片/附件保持不变）。
+
+    Args:
+        filepath (str): 已归档的Markdown文件。
+        stats (dict): 最新的互动数据。
+        comments (list or None): 最新的评论列表，None 表示不比对评论区。
+        write_text (function): 写出新文件内容的函数。
+
+    Returns:
+        list: 发生变化的字段名（评论区变化时包含 'comments'），无变化时为空列表。
+    """
+    post = front_matter.load(filepath)
+    changed = [field for field in STATS_FIELDS if post.metadata.get(field) != stats[field]]
+    new_content = post.content
+    if comments is not None:
+        new_content = replace_comment_section(post.content, comments)
+        if new_content.strip() != post.content.strip():
+            changed.append('comments')
+    if not changed:
+        return []
+    for field in STATS_FIELDS:
+        post.metadata[field] = stats[field]
+    post.content = new_content
+    write_text(front_matter.dumps(post, allow_unicode=True, sort_keys=False, width=10000))
+    return changed
+
+def refresh_topic_stats(topic, output_filepath, log_callback):
+    """
+    刷新模式：用API返回的最新点赞数、评论数、精华状态和评论区更新已归档的帖子，不重新下载图片/附件。
+    对应的AI处理结果（processed_ 目录）存在时一并更新，AI生成的字段保持不变。
+    """
+    filename = os.path.basename(output_filepath)
+    stats = topic_stats(topic)
+    comments = format_comments(topic) if DOWLOAD_COMMENTS else None
+    try:
+        def write_raw(text):
+            if g_output_writer is not None:
+                g_output_writer.write(filename, text)
             else:
-                # 兼容直接的topic对象列表
-                topics = raw_items
-        
+                with atomic_open(output_filepath) as f:
+                    f.write(text)
+            if g_metadata_store is not None:
+                g_metadata_store.upsert(filename, front_matter.loads(text).metadata, os.stat(output_filepath))
+        with profiling.phase('write'):
+            changed = update_archived_file(output_filepath, stats, comments, write_raw)
+
+        # processed_ 目录的元数据表会在下次打开时按 mtime 自动同步；该目录被AI处理任务占用时不写入，
+        # 由下次AI处理按 raw_ 中的最新数据补上（见 process_with_ai.sync_refreshed_stats）
+        if changed and g_processed_writer is not None:
+            processed_filepath = os.path.join(g_processed_writer.directory, filename)
+            if os.path.exists(processed_filepath):
+                update_archived_file(processed_filepath, stats, comments, lambda text: g_processed_writer.write(filename, text))
+    except Exception as e:
+        log_callback(f"  - [失败] 刷新帖子 {filename} 失败: {e}")
+        return
+
+    with g_num_lock:
+        g_refresh_counts['updated' if changed else 'unchanged'] += 1
+    if changed:
+        log_callback(f"  - [刷新] 帖子 {filename} 已更新: {', '.join(changed)}")
+
+def limit_reached() -> bool:
+    """已处理的帖子数是否达到抓取数量上限（在 g_num_lock 下读取，与各线程的计数保持一致）。"""
+    with g_num_lock:
+        return g_debug_num is not None and num >= g_debug_num
+
+def process_topic(topic, output_dir, log_callback, token):
+    """处理单个帖子：跳过已完整下载的帖子，否则下载图片/附件、整理评论并保存为Markdown文件。"""
+    global num
+    topic_id = topic.get('topic_id')
+    if not topic_id:
+        log_callback("  - [警告] 帖子缺少topic_id，已跳过。")
+        return
+
+    # 检查帖子是否已经完整下载过（有完成标记），是则跳过；崩溃时写了一半的文件没有标记，会重新抓取
+    output_filepath = os.path.join(output_dir, f"{topic_id}.md")
+    if g_output_writer.is_complete(os.path.basename(output_filepath)) if g_output_writer is not None else os.path.exists(output_filepath):
+        if g_refresh_stats:
+            refresh_topic_stats(topic, output_filepath, log_callback)
+        else:
+            log_callback(f"  - [跳过] 帖子 {topic_id} 已存在。")
+        return
+
+    # 在锁内检查上限并占用序号，分片/多关键词并行抓取时不会超出 g_debug_num
+    with g_num_lock:
+        if g_debug_num is not None and num >= g_debug_num:
+            return
+        num += 1
+        current_num = num
+    log_callback(f"正在处理第 {current_num} 个帖子 (ID: {topic_id})...")
+    job_runner.report_progress(current_num, g_debug_num, f"帖子 {topic_id}")
+
+    # 帖子内容可能在不同的字段中（talk, question, task, solution）
+    content = topic.get('question', topic.get('talk', topic.get('task', topic.get('solution'))))
+    if not content:
+        log_callback("  - [警告] 帖子内容为空，已跳过。")
+        return
+
+    # 处理帖子正文中的富文本
+    with profiling.phase('parse'):
+        parsed_text = handle_link_to_md(content.get('text', ''))
+    # 处理文章链接（如果存在）
+    if content.get('article'):
+        article_title = content.get('article', {}).get('title', '阅读原文')
+        article_url = content.get('article', {}).get('article_url', '')
+        if article_url:
+            parsed_text += f"\n\n---\n🔗 [{article_title}]({article_url})"
+
+    # 准备要保存的帖子数据字典
+    topic_data = {
+        'topic_id': str(topic_id),
+        'author': content.get('owner', {}).get('name', '匿名用户') if not content.get('anonymous') else '匿名用户',
+        'create_time': (topic.get('create_time')[:23]).replace('T', ' '), # 格式化时间
+        **topic_stats(topic),
+        'text': parsed_text,
+        'image_urls': [],
+        'file_paths': [],
+    }
+
+    # 下载图片
+    if DOWLOAD_PICS and content.get('images'):
+        # 为每个帖子创建一个独立的子目录存放图片和附件
+        image_dir = os.path.join(output_dir, str(topic_id))
+        os.makedirs(image_dir, exist_ok=True)
+        # 使用线程池并发下载图片
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            future_to_url = {executor.submit(download_image, img.get('large', {}).get('url'), os.path.join(image_dir, os.path.basename(img.get('large', {}).get('url').split('?')[0])), log_callback): img.get('large', {}).get('url') for img in content.get('images') if img.get('large', {}).get('url')}
+            for future in as_completed(future_to_url):
+                img_url = future_to_url[future]
+                try:
+                    img_local_path = future.result()
+                    if img_local_path:
+                        # 将下载成功的图片本地路径添加到数据中
+                        topic_data['image_urls'].append(img_local_path)
+                except Exception as exc:
+                    log_callback(f'    - [图片] 下载生成异常: {img_url}, 错误: {exc}')
+
+    # 下载附件
+    if DOWLOAD_FILES and content.get('files'):
+        file_dir = os.path.join(output_dir, str(topic_id))
+        os.makedirs(file_dir, exist_ok=True)
+        # 使用线程池并发下载附件
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            future_to_file = {executor.submit(download_file, f.get('file_id'), os.path.join(file_dir, f.get('name')), token, log_callback): f.get('name') for f in content.get('files') if f.get('file_id') and f.get('name')}
+            for future in as_completed(future_to_file):
+                file_name = future_to_file[future]
+                try:
+                    file_local_path = future.result()
+                    if file_local_path:
+                        # 将下载成功的附件本地路径添加到数据中
+                        topic_data['file_paths'].append(file_local_path)
+                except Exception as exc:
+                    log_callback(f'    - [附件] 下载生成异常: {file_name}, 错误: {exc}')
+
+    # 如果是问答帖，提取回答内容
+    if topic.get('question'):
+        topic_data['answer_author'] = topic.get('answer', {}).get('owner',{}).get('name', '')
+        topic_data['answer'] = handle_link_to_md(topic.get('answer', {}).get('text', ""))
+
+    # 处理评论
+    with profiling.phase('parse'):
+        topic_data['comments'] = format_comments(topic) if DOWLOAD_COMMENTS else []
+
+    # 所有数据处理完毕，保存为Markdown文件
+    save_as_markdown(topic_data, output_dir, log_callback)
+
+def get_data(url, output_dir, log_callback, token, is_single_post=False):
+    """
+    核心函数：通过API获取帖子数据，处理并保存。支持分页递归调用。
+
+    Args:
+        url (str): 要请求的API URL。
+        output_dir (str): 保存文件的目录。
+        log_callback (function): 日志回调函数。
+        token (str): 知识星球的access_token。
+        is_single_post (bool): 标记当前是否为抓取单个帖子模式。
+    """
+    global num, g_debug_num # 使用全局变量来计数和控制总数
+    log_callback("正在请求URL: " + url)
+
+    # 请求重试逻辑
+    response_json = fetch_api_json(url, token, log_callback)
+    if response_json is None:
+        return
+
+    try:
+        topics = extract_topics(response_json.get('resp_data', {}), is_single_post)
         if not topics:
             log_callback("未找到更多帖子。")
             return
@@ -233,108 +492,9 @@ def get_data(url, output_dir, log_callback, token, is_single_post=False):
         # 遍历获取到的每一个帖子
         for topic in topics:
             # 检查是否达到了调试设置的抓取数量上限
-            if g_debug_num is not None and num >= g_debug_num:
+            if limit_reached():
                 break
-            
-            topic_id = topic.get('topic_id')
-            if not topic_id:
-                log_callback("  - [警告] 帖子缺少topic_id，已跳过。")
-                continue
-                
-            # 检查帖子是否已经下载过，如果存在则跳过
-            output_filepath = os.path.join(output_dir, f"{topic_id}.md")
-            if os.path.exists(output_filepath):
-                log_callback(f"  - [跳过] 帖子 {topic_id} 已存在。")
-                continue
-
-            num += 1
-            log_callback(f"正在处理第 {num} 个帖子 (ID: {topic_id})...")
-            
-            # 帖子内容可能在不同的字段中（talk, question, task, solution）
-            content = topic.get('question', topic.get('talk', topic.get('task', topic.get('solution'))))
-            if not content:
-                log_callback("  - [警告] 帖子内容为空，已跳过。")
-                continue
-
-            # 处理帖子正文中的富文本
-            parsed_text = handle_link_to_md(content.get('text', ''))
-            # 处理文章链接（如果存在）
-            if content.get('article'):
-                article_title = content.get('article', {}).get('title', '阅读原文')
-                article_url = content.get('article', {}).get('article_url', '')
-                if article_url:
-                    parsed_text += f"\n\n---\n🔗 [{article_title}]({article_url})"
-
-            # 准备要保存的帖子数据字典
-            topic_data = {
-                'topic_id': str(topic_id),
-                'author': content.get('owner', {}).get('name', '匿名用户') if not content.get('anonymous') else '匿名用户',
-                'create_time': (topic.get('create_time')[:23]).replace('T', ' '), # 格式化时间
-                'digested': topic.get('digested', False),
-                'likes': topic.get('likes_count', 0),
-                'comments_count': topic.get('comments_count', 0),
-                'text': parsed_text,
-                'image_urls': [],
-                'file_paths': [],
-            }
-
-            # 下载图片
-            if DOWLOAD_PICS and content.get('images'):
-                # 为每个帖子创建一个独立的子目录存放图片和附件
-                image_dir = os.path.join(output_dir, str(topic_id))
-                os.makedirs(image_dir, exist_ok=True)
-                # 使用线程池并发下载图片
-                with ThreadPoolExecutor(max_workers=5) as executor:
-                    future_to_url = {executor.submit(download_image, img.get('large', {}).get('url'), os.path.join(image_dir, os.path.basename(img.get('large', {}).get('url').split('?')[0])), log_callback): img.get('large', {}).get('url') for img in content.get('images') if img.get('large', {}).get('url')}
-                    for future in as_completed(future_to_url):
-                        img_url = future_to_url[future]
-                        try:
-                            img_local_path = future.result()
-                            if img_local_path:
-                                # 将下载成功的图片本地路径添加到数据中
-                                topic_data['image_urls'].append(img_local_path)
-                        except Exception as exc:
-                            log_callback(f'    - [图片] 下载生成异常: {img_url}, 错误: {exc}')
-            
-            # 下载附件
-            if DOWLOAD_FILES and content.get('files'):
-                file_dir = os.path.join(output_dir, str(topic_id))
-                os.makedirs(file_dir, exist_ok=True)
-                # 使用线程池并发下载附件
-                with ThreadPoolExecutor(max_workers=3) as executor:
-                    future_to_file = {executor.submit(download_file, f.get('file_id'), os.path.join(file_dir, f.get('name')), token, log_callback): f.get('name') for f in content.get('files') if f.get('file_id') and f.get('name')}
-                    for future in as_completed(future_to_file):
-                        file_name = future_to_file[future]
-                        try:
-                            file_local_path = future.result()
-                            if file_local_path:
-                                # 将下载成功的附件本地路径添加到数据中
-                                topic_data['file_paths'].append(file_local_path)
-                        except Exception as exc:
-                            log_callback(f'    - [附件] 下载生成异常: {file_name}, 错误: {exc}')
-
-            # 如果是问答帖，提取回答内容
-            if topic.get('question'):
-                topic_data['answer_author'] = topic.get('answer', {}).get('owner',{}).get('name', '')
-                topic_data['answer'] = handle_link_to_md(topic.get('answer', {}).get('text', ""))
-
-            # 处理评论
-            topic_data['comments'] = []
-            if DOWLOAD_COMMENTS and topic.get('show_comments'):
-                for comment in topic.get('show_comments'):
-                    author_name = comment.get('owner', {}).get('name', '未知用户')
-                    comment_text = handle_link_to_md(comment.get('text', ''))
-                    repliee = comment.get('repliee') # 被回复的人
-                    if repliee:
-                        repliee_name = repliee.get('name', '未知用户')
-                        # 格式化为 "A 回复 B: ..."
-                        topic_data['comments'].append(f"> **{author_name}** 回复 **{repliee_name}**: {comment_text}\n")
-                    else:
-                        # 格式化为 "A: ..."
-                        topic_data['comments'].append(f"> **{author_name}**: {comment_text}\n")
-            
-            # 所有数据处理完毕，保存为Markdown文件
-            save_as_markdown(topic_data, output_dir, log_callback)
+            process_topic(topic, output_dir, log_callback, token)
 
     except Exception as e:
         import traceback
@@ -343,7 +503,7 @@ def get_data(url, output_dir, log_callback, token, is_single_post=False):
         return
 
     # 检查是否达到调试数量限制
-    if g_debug_num is not None and num >= g_debug_num:
+    if limit_reached():
         log_callback(f"已达到设定的抓取数量上限 ({g_debug_num})，任务完成。")
         return
 
@@ -395,6 +555,286 @@ def get_data(url, output_dir, log_callback, token, is_single_post=False):
     else:
         log_callback("所有帖子处理完毕 (API未返回更多topics)。")
 
+class RateLimiter:
+    """线程安全的请求限速器：多个线程共享同一个实例，保证合计的请求速率不超过 rate 次/秒。"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_time = time.monotonic()
+
+    def acquire(self):
+        """预约下一个请求时间片并等待到该时刻（在锁外等待，不阻塞其他线程预约）。"""
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+def parse_topic_time(create_time: str) -> datetime.datetime:
+    """解析API返回的帖子时间，例如 '2023-05-01T10:00:00.123+0800'。"""
+    return datetime.datetime.strptime(create_time, '%Y-%m-%dT%H:%M:%S.%f%z')
+
+def format_end_time(moment: datetime.datetime) -> str:
+    """将时间格式化为分页参数 end_time 所需的格式（毫秒固定三位）并进行URL编码。"""
+    text = moment.strftime('%Y-%m-%dT%H:%M:%S.') + f'{moment.microsecond // 1000:03d}' + moment.strftime('%z')
+    return quote(text)
+
+def get_group_create_time(group_id, token, log_callback):
+    """获取星球的创建时间，作为分片的起点；失败时返回None。"""
+    response_json = fetch_api_json(f"https://api.zsxq.com/v2/groups/{group_id}", token, log_callback)
+    try:
+        return parse_topic_time(response_json['resp_data']['group']['create_time'])
+    except (TypeError, KeyError, ValueError):
+        return None
+
+def split_time_windows(start, end, count):
+    """
+    将 [start, end) 均分为 count 个时间窗口，按从新到旧排列。
+    最新的窗口不设上界（None），最早的窗口不设下界（None），以免遗漏边界之外的帖子。
+    """
+    count = max(1, count)
+    step = (end - start) / count
+    bounds = [start + step * i for i in range(count + 1)]
+    bounds[0] = None
+    bounds[-1] = None
+    return [(bounds[i], bounds[i + 1]) for i in reversed(range(count))]
+
+def iter_topic_pages(base_url, end_time, token, log_callback):
+    """
+    从 end_time（None 表示从最新的帖子）开始向前翻页，逐页产出 [(帖子, 创建时间), ...]，调用方决定何时停止。
+    下一页的游标取本页最早的帖子时间；API返回的边界帖子可能与上一页重复，需要调用方去重。
+    """
+    cursor = end_time
+    while True:
+        url = base_url if cursor is None else f"{base_url}&end_time={format_end_time(cursor)}"
+        response_json = fetch_api_json(url, token, log_callback)
+        if response_json is None:
+            return
+        page = []
+        for topic in extract_topics(response_json.get('resp_data', {})):
+            try:
+                page.append((topic, parse_topic_time(topic.get('create_time'))))
+            except (TypeError, ValueError):
+                log_callback(f"  - [警告] 无法解析帖子 {topic.get('topic_id')} 的时间，已跳过。")
+        if not page:
+            return
+        yield page
+        oldest = min(topic_time for _, topic_time in page)
+        # 同一毫秒内的帖子超过一页时游标不会前进，此时向前推 1 毫秒，避免死循环
+        if cursor is not None and oldest >= cursor:
+            oldest = cursor - datetime.timedelta(milliseconds=1)
+        cursor = oldest
+
+def crawl_time_window(shard_index, window_start, window_end, group_id, output_dir, log_callback, token, seen, seen_lock):
+    """
+    抓取一个时间窗口 [window_start, window_end) 内的全部帖子：从窗口上界开始向前翻页，越过下界即停止。
+
+    恰好落在窗口上界的帖子属于更新的窗口，此处跳过；各窗口共享 seen 集合，翻页边界重复返回的帖子只处理一次。
+
+    Returns:
+        tuple: (本窗口新处理的帖子数, 重复返回而跳过的帖子数)
+    """
+    base_url = f"https://api.zsxq.com/v2/groups/{group_id}/topics?count={COUNTS_PER_TIME}"
+    processed = 0
+    duplicates = 0
+    for page in iter_topic_pages(base_url, window_end, token, log_callback):
+        reached_end = False
+        for topic, topic_time in page:
+            if window_end is not None and topic_time >= window_end:
+                continue
+            if window_start is not None and topic_time < window_start:
+                reached_end = True
+                break
+            with seen_lock:
+                if topic.get('topic_id') in seen:
+                    duplicates += 1
+                    continue
+                seen.add(topic.get('topic_id'))
+            if limit_reached():
+                reached_end = True
+                break
+            process_topic(topic, output_dir, log_callback, token)
+            processed += 1
+        if reached_end:
+            break
+    return processed, duplicates
+
+def run_sharded_crawl(group_id, output_dir, log_callback, token):
+    """
+    将星球的全部历史按时间切成 SHARD_COUNT 个窗口，用 SHARD_WORKERS 个线程并行抓取。
+    所有请求经过共享的限速器，总请求速率与串行抓取时相当可控。
+    """
+    end = datetime.datetime.now(datetime.timezone(datetime.timedelta(hours=8)))
+    start = get_group_create_time(group_id, token, log_callback)
+    if start is None or start >= end:
+        start = end - datetime.timedelta(days=365 * SHARD_FALLBACK_YEARS)
+        log_callback(f"警告: 无法获取星球创建时间，按最近 {SHARD_FALLBACK_YEARS} 年切分（最早的窗口不设下界）。")
+    windows = split_time_windows(start, end, SHARD_COUNT)
+    log_callback(f"分片抓取: {len(windows)} 个时间窗口，{SHARD_WORKERS} 个并行线程，限速 {SHARD_REQUESTS_PER_SEC} 次/秒。")
+
+    seen = set()
+    seen_lock = threading.Lock()
+    total_duplicates = 0
+    with ThreadPoolExecutor(max_workers=SHARD_WORKERS) as executor:
+        future_to_shard = {
+            executor.submit(crawl_time_window, i, window_start, window_end, group_id, output_dir, log_callback, token, seen, seen_lock): (i, window_start, window_end)
+            for i, (window_start, window_end) in enumerate(windows)
+        }
+        for future in as_completed(future_to_shard):
+            i, window_start, window_end = future_to_shard[future]
+            label = f"{window_start.strftime('%Y-%m-%d') if window_start else '最早'} ~ {window_end.strftime('%Y-%m-%d') if window_end else '现在'}"
+            try:
+                processed, duplicates = future.result()
+            except Exception as exc:
+                import traceback
+                log_callback(f"[分片 {i}] {label} 抓取异常: {exc}")
+                log_callback(traceback.format_exc())
+                continue
+            total_duplicates += duplicates
+            log_callback(f"[分片 {i}] {label} 完成: 新处理 {processed} 个帖子，跳过重复返回 {duplicates} 个。")
+    log_callback(f"分片抓取完成: 共检查 {len(seen)} 个帖子，翻页边界重复 {total_duplicates} 个。")
+
+def parse_keywords(search_keyword: str) -> list:
+    """拆分以逗号或分号分隔的多个关键词，去掉空白和重复，保持输入顺序。"""
+    return list(dict.fromkeys(keyword.strip() for keyword in re.split(r'[,，;；]', search_keyword or '') if keyword.strip()))
+
+def search_url(keyword, group_id):
+    """构造某个关键词的搜索API地址（按创建时间排序，可用 end_time 翻页）。"""
+    return f"https://api.zsxq.com/v2/search/topics?keyword={quote(keyword)}&group_id={group_id}&count={COUNTS_PER_TIME}&sort=create_time"
+
+def find_archived_topics(output_dir_base, exclude_dir) -> dict:
+    """
+    扫描 output 下其他 raw_md 开头的数据集，返回 {topic_id: 已归档的 .md 路径}。
+    有完成标记的目录只认可标记中的文件；同一帖子出现在多个数据集时优先取目录名排序靠前的（即主抓取目录 raw_md）。
+    """
+    archived = {}
+    if not os.path.isdir(output_dir_base):
+        return archived
+    for entry in sorted(os.scandir(output_dir_base), key=lambda e: e.name):
+        if not entry.is_dir() or not entry.name.startswith('raw_md') or os.path.abspath(entry.path) == os.path.abspath(exclude_dir):
+            continue
+        completed = None
+        marker_path = os.path.join(entry.path, MARKER_FILENAME)
+        if os.path.exists(marker_path):
+            with open(marker_path, 'r', encoding='utf-8') as f:
+                completed = {line.strip() for line in f}
+        for file_entry in os.scandir(entry.path):
+            if file_entry.name.endswith('.md') and (completed is None or file_entry.name in completed):
+                archived.setdefault(file_entry.name[:-3], file_entry.path)
+    return archived
+
+def link_or_copy(src_path, dest_path):
+    """优先创建硬链接（不占用额外空间），文件系统不支持时退回原子复制。目标已存在时跳过。"""
+    if os.path.exists(dest_path):
+        return
+    try:
+        os.link(src_path, dest_path)
+    except OSError:
+        atomic_copy(src_path, dest_path)
+
+def link_archived_topic(topic_id, source_path, output_dir, log_callback):
+    """把其他数据集中已归档的帖子（Markdown文件和图片/附件目录）链接到当前目录，不再重新请求和下载。"""
+    asset_src = os.path.join(os.path.dirname(source_path), topic_id)
+    if os.path.isdir(asset_src):
+        asset_dest = os.path.join(output_dir, topic_id)
+        os.makedirs(asset_dest, exist_ok=True)
+        for entry in os.scandir(asset_src):
+            if entry.is_file():
+                link_or_copy(entry.path, os.path.join(asset_dest, entry.name))
+    # 最后写出Markdown文件，完成标记意味着图片/附件也已就位
+    filename = f"{topic_id}.md"
+    filepath = os.path.join(output_dir, filename)
+    if g_output_writer is not None:
+        g_output_writer.copy(source_path, filename)
+    else:
+        atomic_copy(source_path, filepath)
+    if g_metadata_store is not None:
+        g_metadata_store.upsert(filename, front_matter.read_front_matter(filepath), os.stat(filepath))
+    log_callback(f"  - [链接] 帖子 {topic_id} 已在 {os.path.basename(os.path.dirname(source_path))} 中归档，直接复用。")
+
+def crawl_search_keyword(keyword, group_id, output_dir, log_callback, token, archived, claimed, claimed_lock):
+    """
+    翻页抓取一个关键词的全部搜索结果。多个关键词共享 claimed 集合，同一帖子只由最先命中的关键词处理；
+    已在其他数据集中归档的帖子直接链接过来。
+
+    Returns:
+        tuple: (命中的 topic_id 列表（按结果顺序，已去重）, 统计字典)
+    """
+    hits = {}
+    counts = {'fetched': 0, 'linked': 0, 'shared': 0}
+    for page in iter_topic_pages(search_url(keyword, group_id), None, token, log_callback):
+        stop = False
+        for topic, _ in page:
+            topic_id = str(topic.get('topic_id') or '')
+            if not topic_id or topic_id in hits:
+                continue # 翻页边界重复返回的帖子
+            hits[topic_id] = True
+            with claimed_lock:
+                if topic_id in claimed:
+                    counts['shared'] += 1
+                    continue
+                claimed.add(topic_id)
+            if limit_reached():
+                stop = True
+                break
+            already_here = g_output_writer.is_complete(f"{topic_id}.md") if g_output_writer is not None else os.path.exists(os.path.join(output_dir, f"{topic_id}.md"))
+            if topic_id in archived and not already_here:
+                try:
+                    link_archived_topic(topic_id, archived[topic_id], output_dir, log_callback)
+                    counts['linked'] += 1
+                    continue
+                except OSError as e:
+                    log_callback(f"  - [警告] 链接已归档的帖子 {topic_id} 失败，改为重新抓取: {e}")
+            process_topic(topic, output_dir, log_callback, token)
+            counts['fetched'] += 1
+        if stop:
+            break
+    return list(hits), counts
+
+def update_search_hits(output_dir, keyword_hits: dict):
+    """将本次各关键词的命中结果合并进目录下的命中索引文件。"""
+    hits_path = os.path.join(output_dir, SEARCH_HITS_FILENAME)
+    try:
+        with open(hits_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {}
+    for keyword, topic_ids in keyword_hits.items():
+        index[keyword] = list(dict.fromkeys(index.get(keyword, []) + topic_ids))
+    atomic_write(hits_path, json.dumps(index, ensure_ascii=False, indent=1))
+
+def run_multi_search(keywords, group_id, output_dir, log_callback, token):
+    """
+    并行抓取多个关键词的搜索结果并按 topic_id 合并到同一目录，命中关系记录在 SEARCH_HITS_FILENAME 中。
+    所有关键词共享请求限速器；其他数据集中已归档的帖子直接链接，不重复下载图片/附件。
+    """
+    archived = find_archived_topics(os.path.dirname(output_dir), output_dir)
+    log_callback(f"多关键词搜索: {len(keywords)} 个关键词，{min(len(keywords), SEARCH_WORKERS)} 个并行线程；其他数据集中已归档 {len(archived)} 个帖子可直接复用。")
+    claimed = set()
+    claimed_lock = threading.Lock()
+    keyword_hits = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(len(keywords), SEARCH_WORKERS))) as executor:
+        future_to_keyword = {
+            executor.submit(crawl_search_keyword, keyword, group_id, output_dir, log_callback, token, archived, claimed, claimed_lock): keyword
+            for keyword in keywords
+        }
+        for future in as_completed(future_to_keyword):
+            keyword = future_to_keyword[future]
+            try:
+                hits, counts = future.result()
+            except Exception as exc:
+                import traceback
+                log_callback(f"[搜索 '{keyword}'] 抓取异常: {exc}")
+                log_callback(traceback.format_exc())
+                continue
+            keyword_hits[keyword] = hits
+            log_callback(f"[搜索 '{keyword}'] 命中 {len(hits)} 个帖子: 抓取 {counts['fetched']} 个，"
+                         f"链接已归档 {counts['linked']} 个，与其他关键词重复 {counts['shared']} 个。")
+    update_search_hits(output_dir, keyword_hits)
+    log_callback(f"多关键词搜索完成: 合并后共 {len(claimed)} 个帖子，命中索引已写入 {SEARCH_HITS_FILENAME}。")
+
 def download_image(url, local_path, log_callback):
     """
     下载单个图片。
@@ -408,11 +848,12 @@ def download_image(url, local_path, log_callback):
         str or None: 成功则返回本地路径，失败则返回None。
     """
     try:
-        r = requests.get(url, stream=True, timeout=20)
-        r.raise_for_status() # 如果请求失败（非2xx状态码），则抛出异常
-        with open(local_path, 'wb') as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                f.write(chunk)
+        with profiling.phase('download'):
+            r = requests.get(url, stream=True, timeout=20)
+            r.raise_for_status() # 如果请求失败（非2xx状态码），则抛出异常
+            with atomic_open(local_path, 'wb') as f:
+                for chunk in r.iter_content(chunk_size=8192):
+                    f.write(chunk)
         log_callback(f"    - [图片] 已下载: {local_path}")
         return local_path
     except Exception as e:
@@ -436,8 +877,11 @@ def download_file(file_id, local_path, token, log_callback):
     download_url_api = f"https://api.zsxq.com/v2/files/{file_id}/download_url"
     headers = {'Cookie': f'zsxq_access_token={token}', 'User-Agent': USER_AGENT}
     try:
-        # 第一步：请求API获取真实下载链接
-        r = requests.get(download_url_api, headers=headers, timeout=20)
+        # 第一步：请求API获取真实下载链接（分片抓取时同样计入共享限速）
+        if g_rate_limiter is not None:
+            g_rate_limiter.acquire()
+        with profiling.phase('fetch'):
+            r = requests.get(download_url_api, headers=headers, timeout=20)
         r.raise_for_status()
         resp_json = r.json()
         if not resp_json.get('succeeded'):
@@ -450,31 +894,36 @@ def download_file(file_id, local_path, token, log_callback):
             return None
 
         # 第二步：使用获取到的链接下载文件
-        r_file = requests.get(real_download_url, stream=True, timeout=60)
-        r_file.raise_for_status()
-        with open(local_path, 'wb') as f:
-            for chunk in r_file.iter_content(chunk_size=8192):
-                f.write(chunk)
+        with profiling.phase('download'):
+            r_file = requests.get(real_download_url, stream=True, timeout=60)
+            r_file.raise_for_status()
+            with atomic_open(local_path, 'wb') as f:
+                for chunk in r_file.iter_content(chunk_size=8192):
+                    f.write(chunk)
         log_callback(f"    - [附件] 已下载: {local_path}")
         return local_path
     except Exception as e:
         log_callback(f"    - [附件] 下载文件失败: ID={file_id}, 错误={e}")
         return None
 
+@profiling.profiled('crawl')
 def run_crawler(crawl_mode, group_id, token, search_keyword="", post_id="", debug_num=None, log_callback=print):
     """
     爬虫主入口函数，由GUI调用。
 
     Args:
-        crawl_mode (str): 抓取模式 ('all', 'digests', 'search', 'single_post')。
+        crawl_mode (str): 抓取模式 ('all', 'sharded', 'digests', 'search', 'single_post')。
+            'sharded' 按时间窗口并行抓取全部帖子，输出目录与 'all' 相同。
+            'refresh' 重新翻页全部帖子，只更新已归档帖子的互动数据和评论区，新帖子照常下载。
         group_id (str): 星球ID。
         token (str): 用户access_token。
-        search_keyword (str, optional): 搜索模式下的关键词。
+        search_keyword (str, optional): 搜索模式下的关键词，多个关键词用逗号或分号分隔，并行搜索并合并到同一目录。
         post_id (str, optional): 单帖模式下的帖子ID。
         debug_num (int, optional): 限制抓取的帖子数量。
         log_callback (function, optional): 日志回调函数。
+        profile (bool, optional): 开启性能分析，结束时写出报告（见 profiling.py）。
     """
-    global num, g_debug_num
+    global num, g_debug_num, g_metadata_store, g_output_writer, g_processed_writer, g_rate_limiter, g_refresh_stats
     num = 0 # 重置全局计数器
     
     # 优先使用GUI传入的参数，如果为空则使用文件顶部的后备值
@@ -501,18 +950,22 @@ def run_crawler(crawl_mode, group_id, token, search_keyword="", post_id="", debu
     if crawl_mode == 'digests':
         output_dir = os.path.join(output_dir_base, 'raw_md_digests')
     elif crawl_mode == 'search':
-        # 清理关键词中的非法字符，用作目录名
-        sanitized_keyword = re.sub(r'[\s\\/*?:"<>|]+', "_", search_keyword).strip('_')
+        # 清理关键词中的非法字符，用作目录名（多个关键词以下划线连接）
+        keywords = parse_keywords(search_keyword)
+        if not keywords:
+            log_callback("错误：搜索模式需要至少一个关键词。")
+            return
+        sanitized_keyword = '_'.join(re.sub(r'[\s\\/*?:"<>|]+', "_", keyword).strip('_') for keyword in keywords)
         output_dir = os.path.join(output_dir_base, f'raw_md_search_{sanitized_keyword}')
     elif crawl_mode == 'single_post':
         output_dir = os.path.join(output_dir_base, f'raw_md_post_{post_id}')
-    else: # 'all'
+    else: # 'all' / 'sharded' / 'refresh'
         output_dir = os.path.join(output_dir_base, 'raw_md')
     
     # 打印任务信息
     log_callback("-" * 50)
     log_callback(f"抓取模式: '{crawl_mode}'")
-    if crawl_mode == 'search': log_callback(f"搜索关键词: '{search_keyword}'")
+    if crawl_mode == 'search': log_callback(f"搜索关键词: {', '.join(repr(keyword) for keyword in keywords)}")
     if crawl_mode == 'single_post': log_callback(f"帖子ID: '{post_id}'")
     if debug_num is not None: log_callback(f"抓取数量: {debug_num}")
     log_callback(f"文件将保存到: {output_dir}")
@@ -529,20 +982,64 @@ def run_crawler(crawl_mode, group_id, token, search_keyword="", post_id="", debu
         # 获取精华帖的URL
         start_url = f"{base_url}/topics?scope=digests&count={COUNTS_PER_TIME}"
     elif crawl_mode == 'search':
-        # 获取搜索结果的URL
-        keyword_encoded = quote(search_keyword)
-        start_url = f"https://api.zsxq.com/v2/search/topics?keyword={keyword_encoded}&group_id={group_id}&count={COUNTS_PER_TIME}&sort=create_time"
+        # 获取搜索结果的URL（多个关键词时为第一个关键词的URL）
+        start_url = search_url(keywords[0], group_id)
     elif crawl_mode == 'single_post':
         # 获取单个帖子的URL
         start_url = f"https://api.zsxq.com/v2/topics/{post_id}"
-    else: # 'all'
-        # 获取全部帖子的URL
+    else: # 'all' / 'sharded' / 'refresh'
+        # 获取全部帖子的URL（分片模式下各时间窗口在此基础上附加各自的 end_time）
         start_url = f"{base_url}/topics?count={COUNTS_PER_TIME}"
 
     log_callback("开始抓取帖子...")
     log_callback(f"起始URL: {start_url}")
     
-    # 调用核心函数开始抓取
-    get_data(start_url, output_dir, log_callback, token, is_single_post=(crawl_mode == 'single_post'))
+    # 调用核心函数开始抓取，抓取结束（包括中途出错）后保存元数据表
+    g_metadata_store = MetadataStore(output_dir)
+    g_output_writer = OutputWriter(output_dir, log_callback=log_callback)
+    g_refresh_stats = crawl_mode == 'refresh'
+    g_refresh_counts.update(updated=0, unchanged=0)
+    processed_dir = os.path.join(output_dir_base, os.path.basename(output_dir).replace('raw_', 'processed_', 1))
+    if g_refresh_stats and processed_dir != output_dir and os.path.isdir(processed_dir):
+        try:
+            g_processed_writer = OutputWriter(processed_dir, log_callback=log_callback)
+        except RuntimeError as e:
+            log_callback(f"[提示] {e} 本次只刷新 {os.path.basename(output_dir)} 目录，AI处理结果中的互动数据将在下次AI处理时同步。")
+    try:
+        if crawl_mode == 'sharded':
+            g_rate_limiter = RateLimiter(SHARD_REQUESTS_PER_SEC)
+            run_sharded_crawl(group_id, output_dir, log_callback, token)
+        elif crawl_mode == 'search':
+            g_rate_limiter = RateLimiter(SEARCH_REQUESTS_PER_SEC)
+            run_multi_search(keywords, group_id, output_dir, log_callback, token)
+        else:
+            get_data(start_url, output_dir, log_callback, token, is_single_post=(crawl_mode == 'single_post'))
+    finally:
+        g_rate_limiter = None
+        g_refresh_stats = False
+        g_output_writer.close()
+        g_output_writer = None
+        if g_processed_writer is not None:
+            g_processed_writer.close()
+            g_processed_writer = None
+        g_metadata_store.save()
+        g_metadata_store = None
 
+    if crawl_mode == 'refresh':
+        log_callback(f"互动数据刷新: 更新了 {g_refresh_counts['updated']} 个已归档帖子，{g_refresh_counts['unchanged']} 个无变化。")
     log_callback("抓取完成！")
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='抓取知识星球帖子并保存为Markdown文件。')
+    parser.add_argument('mode', nargs='?', default='all', choices=['all', 'sharded', 'refresh', 'digests', 'search', 'single_post'])
+    parser.add_argument('--group-id', default=GROUP_ID_FALLBACK)
+    parser.add_argument('--token', default=ZSXQ_ACCESS_TOKEN_FALLBACK)
+    parser.add_argument('--keyword', default='', help="搜索模式的关键词，多个关键词用逗号分隔")
+    parser.add_argument('--post-id', default='', help="单帖模式的帖子ID")
+    parser.add_argument('--count', type=int, default=None, help="最多抓取的帖子数，默认全部")
+    parser.add_argument('--profile', action='store_true', help="开启性能分析，报告写入 output/profiles")
+    args = parser.parse_args()
+    run_crawler(args.mode, args.group_id, args.token, search_keyword=args.keyword, post_id=args.post_id,
+                debug_num=args.count, log_callback=print, profile=args.profile)